@@ -0,0 +1,82 @@
+"""
+Benchmark of the import time of the PerunIdentity micro_service.
+
+Imports the module in `--runs` fresh interpreters under `python -X importtime`
+and reports the median cumulative import time, the slowest imported modules and
+which backend libraries got loaded. Exits with status 1 when the median exceeds
+`--max-ms` or a backend library is loaded by the import, so it can guard
+against startup regressions.
+
+Usage: PYTHONPATH=src python benchmarks/bench_import_time.py [--runs N] [--max-ms MS] [--top N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULE = 'perun.micro_services.perun_identity'
+# loaded only when an adapter of the configured interface is created
+LAZY_MODULES = ['ldap3', 'pycurl', 'yaml', 'asyncio', 'sqlite3', 'http.server']
+
+
+def import_once(module):
+    """
+    Returns cumulative import time of `module` in microseconds, self times of all
+    imported modules and names of the loaded LAZY_MODULES.
+    """
+    code = f'import sys, {module}; print(" ".join(m for m in {LAZY_MODULES!r} if m in sys.modules))'
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                            capture_output=True, text=True, check=True)
+
+    total = None
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        self_times[name] = int(self_time)
+        if name == module:
+            total = int(cumulative)
+
+    return total, self_times, result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None, help='fail when the median import time is higher')
+    parser.add_argument('--top', type=int, default=10, help='number of the slowest modules listed')
+    args = parser.parse_args()
+
+    totals = []
+    self_times = {}
+    loaded = set()
+    for _ in range(args.runs):
+        total, times, lazy = import_once(MODULE)
+        totals.append(total / 1000)
+        loaded.update(lazy)
+        for name, self_time in times.items():
+            self_times.setdefault(name, []).append(self_time / 1000)
+
+    median = statistics.median(totals)
+    print(f'import {MODULE} ({args.runs} runs)')
+    print(f'median:             {median:10.2f} ms')
+    print(f'min / max:          {min(totals):10.2f} / {max(totals):.2f} ms')
+    print(f'lazy modules:       {", ".join(sorted(loaded)) or "none"}')
+    print('slowest modules (median self time):')
+    slowest = sorted(self_times.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, times in slowest[:args.top]:
+        print(f'  {statistics.median(times):8.2f} ms  {name}')
+
+    failed = bool(loaded)
+    if args.max_ms is not None and median > args.max_ms:
+        print(f'median import time exceeds {args.max_ms} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
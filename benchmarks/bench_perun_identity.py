@@ -0,0 +1,204 @@
+"""
+Benchmark of PerunIdentity.process against local stand-ins of Perun LDAP and RPC.
+
+Drives the micro_service from `--concurrency` threads and reports throughput,
+latency percentiles and memory allocated per request, so pooling, caching
+and concurrency changes can be compared. Latency and failures of the stand-ins
+are injected as configured.
+
+Usage: PYTHONPATH=src python benchmarks/bench_perun_identity.py [--interface ldap|rpc|multi] [--asyncio]
+           [--requests N] [--concurrency N] [--users N] [--hot-users N] [--unknown-ratio R]
+           [--latency MS] [--jitter MS] [--failure-rate R] [--cache] [--circuit-breaker]
+           [--single-flight] [--metrics]
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from perun.micro_services.adapters.AdapterRegistry import AdapterRegistry
+from perun.micro_services.metrics.Metrics import Metrics
+from perun.micro_services.perun_identity import PerunIdentity
+from satosa.internal import AuthenticationInformation, InternalData
+
+from perun_stand_ins import (FakePerunLdapServer, FakePerunRpcServer, FaultInjector, LDAP_BASE, LDAP_PASSWORD,
+                             LDAP_USER, user_login)
+
+IDP_ENTITY_ID = 'https://idp.example.com/idp/shibboleth'
+IDENTIFIER = 'edupersonprincipalname'
+
+
+def write_perun_configuration(directory, ldap_url, rpc_url, args):
+    path = os.path.join(directory, 'perun_configuration.yml')
+    with open(path, 'w') as f:
+        yaml.safe_dump({
+            'ldap.hostnames': [ldap_url],
+            'ldap.user': LDAP_USER,
+            'ldap.password': LDAP_PASSWORD,
+            'ldap.base': LDAP_BASE,
+            'ldap.pool_size': args.pool_size,
+            'rpc.hostname': rpc_url,
+            'rpc.user': 'user',
+            'rpc.password': 'password',
+            'rpc.pool_size': args.pool_size,
+        }, f)
+    return path
+
+
+def create_service(config_file, args):
+    config = {
+        'interface': args.interface,
+        'asyncio': args.asyncio,
+        'perun_config_file_name': config_file,
+        'uids_identifiers': [IDENTIFIER],
+    }
+    if args.cache:
+        config['cache'] = {'backend': 'memory', 'ttl': 3600, 'negative_ttl': 60}
+    if args.circuit_breaker:
+        config['circuit_breaker'] = {}
+    if args.single_flight:
+        config['single_flight'] = True
+    if args.metrics:
+        config['metrics'] = {}
+
+    service = PerunIdentity(config=config, name='PerunIdentity', base_url='https://satosa.example.com')
+    service.next = lambda context, data: data
+    return service
+
+
+class Workload:
+    """
+    Produces uids of requests, `hot_users` of `users` are asked for
+    and `unknown_ratio` of requests ask for a user unknown to Perun.
+    """
+
+    def __init__(self, users, hot_users, unknown_ratio, seed):
+        self.users = users
+        self.hot_users = hot_users
+        self.unknown_ratio = unknown_ratio
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_uid(self):
+        with self._lock:
+            if self._random.random() < self.unknown_ratio:
+                return user_login(self.users + self._random.randrange(self.hot_users))
+            return user_login(self._random.randrange(self.hot_users))
+
+
+def process(service, uid):
+    data = InternalData(auth_info=AuthenticationInformation(issuer=IDP_ENTITY_ID))
+    data.attributes = {IDENTIFIER: [uid]}
+
+    start_time = time.perf_counter()
+    data = service.process(None, data)
+    return time.perf_counter() - start_time, 'perun_id' in data.attributes
+
+
+def run(service, workload, requests, concurrency):
+    def call(_):
+        return process(service, workload.next_uid())
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    return time.perf_counter() - start_time, results
+
+
+def measure_allocations(service, workload, requests):
+    """
+    Runs `requests` sequentially under tracemalloc, returns peak and retained KiB per request.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(requests):
+            process(service, workload.next_uid())
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return (peak - before) / 1024, (current - before) / 1024 / requests
+
+
+def percentile(sorted_values, p):
+    index = max(0, math.ceil(len(sorted_values) * p / 100) - 1)
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--interface', choices=['ldap', 'rpc', 'multi'], default='ldap')
+    parser.add_argument('--asyncio', action='store_true', help='use the asyncio adapter (ldap/rpc)')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=1000, help='number of users known to the stand-ins')
+    parser.add_argument('--hot-users', type=int, default=None, help='number of distinct users asked for')
+    parser.add_argument('--unknown-ratio', type=float, default=0.0, help='ratio of lookups of unknown users')
+    parser.add_argument('--latency', type=float, default=5.0, help='injected latency in ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='injected latency jitter in ms')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='ratio of failing backend calls')
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--cache', action='store_true', help='cache lookups in memory')
+    parser.add_argument('--circuit-breaker', action='store_true')
+    parser.add_argument('--single-flight', action='store_true', help='coalesce concurrent identical lookups')
+    parser.add_argument('--metrics', action='store_true', help='collect metrics of the lookups')
+    parser.add_argument('--alloc-requests', type=int, default=200, help='requests measured under tracemalloc')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-level', default='ERROR')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.asyncio and args.interface == 'multi':
+        parser.error('--asyncio is supported only with the ldap and rpc interfaces')
+
+    hot_users = min(args.hot_users or args.users, args.users)
+    faults = FaultInjector(args.latency / 1000, args.jitter / 1000, args.failure_rate, args.seed)
+    ldap_server = FakePerunLdapServer(args.users, faults).start()
+    rpc_server = FakePerunRpcServer(args.users, faults).start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = create_service(write_perun_configuration(directory, ldap_server.url, rpc_server.url, args), args)
+
+        workload = Workload(args.users, hot_users, args.unknown_ratio, args.seed)
+        try:
+            run(service, workload, args.warmup, args.concurrency)
+            faults.failures = 0
+            elapsed, results = run(service, workload, args.requests, args.concurrency)
+            injected_failures = faults.failures
+            alloc_peak, alloc_retained = measure_allocations(service, workload, args.alloc_requests)
+        finally:
+            AdapterRegistry.close_adapter(service.adapter)
+            ldap_server.stop()
+            rpc_server.stop()
+            Metrics.disable()
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    found = sum(1 for _, is_found in results if is_found)
+
+    print(f'interface: {args.interface}{" (asyncio)" if args.asyncio else ""}, '
+          f'concurrency: {args.concurrency}, requests: {args.requests}, cache: {args.cache}')
+    print(f'injected latency: {args.latency} +- {args.jitter} ms, failure rate: {args.failure_rate}')
+    print(f'found users:        {found}/{args.requests} ({injected_failures} injected failures)')
+    print(f'throughput:         {args.requests / elapsed:10.1f} req/s')
+    print(f'latency p50:        {percentile(latencies, 50):10.2f} ms')
+    print(f'latency p95:        {percentile(latencies, 95):10.2f} ms')
+    print(f'latency p99:        {percentile(latencies, 99):10.2f} ms')
+    print(f'latency max:        {latencies[-1]:10.2f} ms')
+    print(f'allocations peak:   {alloc_peak:10.1f} KiB ({args.alloc_requests} sequential requests)')
+    print(f'allocations kept:   {alloc_retained:10.2f} KiB/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of converting LDAP search results to simplified entries.
+
+Compares the former conversion through ldap3 Entry objects and a JSON round trip
+with LdapConnector.get_simplified_entries working on the raw response.
+
+Usage: PYTHONPATH=src python benchmarks/bench_simplified_entries.py [--entries N] [--repeat N]
+"""
+import argparse
+import json
+import timeit
+
+from ldap3 import Connection, MOCK_SYNC, Server
+from perun.micro_services.adapters.LdapConnector import LdapConnector
+
+BASE = 'ou=People,dc=perun'
+ATTRIBUTES = ['perunUserId', 'displayName', 'cn', 'eduPersonPrincipalNames']
+
+
+def create_connection(entries):
+    conn = Connection(Server('perun.example.com'), user='cn=admin,dc=perun', password='password',
+                      client_strategy=MOCK_SYNC)
+    conn.strategy.add_entry('cn=admin,dc=perun', {'userPassword': 'password', 'sn': 'admin'})
+    for id in range(entries):
+        conn.strategy.add_entry(f'perunUserId={id},{BASE}', {
+            'perunUserId': str(id),
+            'displayName': f'User {id}',
+            'cn': f'User {id}',
+            'eduPersonPrincipalNames': [f'user{id}@example.com', f'user{id}@other.example.com'],
+            'objectClass': 'perunUser',
+        })
+    conn.bind()
+    conn.search(BASE, '(objectClass=perunUser)', attributes=ATTRIBUTES)
+    return conn
+
+
+def json_round_trip(conn):
+    # ldap3 caches entries of the last search, drop them to build them as after every new search
+    conn._entries = []
+    data = []
+    for entry in conn.entries:
+        entry_dict = json.loads(entry.entry_to_json())['attributes']
+        x = {}
+        for key in entry_dict.keys():
+            x.update({key: entry_dict[key]})
+        data.append(x)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = create_connection(args.entries)
+    assert json_round_trip(conn) == LdapConnector.get_simplified_entries(conn.response)
+
+    before = min(timeit.repeat(lambda: json_round_trip(conn), number=1, repeat=args.repeat))
+    after = min(timeit.repeat(lambda: LdapConnector.get_simplified_entries(conn.response), number=1,
+                              repeat=args.repeat))
+
+    print(f'{args.entries} entries')
+    print(f'entry_to_json + json.loads: {before * 1000:8.2f} ms')
+    print(f'get_simplified_entries:     {after * 1000:8.2f} ms')
+    print(f'speedup:                    {before / after:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
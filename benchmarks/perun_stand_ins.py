@@ -0,0 +1,256 @@
+"""
+Local stand-ins of Perun interfaces used by the benchmarks.
+
+FakePerunRpcServer answers getUserByExtSourceNameAndExtLogin over HTTP/1.1 keep-alive,
+FakePerunLdapServer answers LDAP searches of the same users by eduPersonPrincipalNames.
+Both delay their responses and fail randomly as configured in a FaultInjector.
+"""
+import json
+import random
+import re
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ldap3.protocol.rfc4511 import (AttributeDescription, AttributeValue, BindResponse, ExtendedResponse, LDAPDN,
+                                    PartialAttribute, PartialAttributeList, ResultCode, SearchResultDone,
+                                    SearchResultEntry, Vals)
+from ldap3.strategy.base import BaseStrategy
+from ldap3.utils.asn1 import encode
+
+LDAP_BASE = 'dc=perun'
+LDAP_USER = 'cn=admin,dc=perun'
+LDAP_PASSWORD = 'password'
+LOGIN_PATTERN = re.compile(rb'user\d+@example\.com')
+
+
+def user_login(id):
+    return f'user{id}@example.com'
+
+
+def ber_length(length):
+    if length < 0x80:
+        return bytes([length])
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(encoded)]) + encoded
+
+
+class FaultInjector:
+    """
+    Delays every response by `latency` +- `jitter` seconds and fails
+    `failure_rate` of them.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failures = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def inject(self):
+        """
+        Sleeps for the injected latency, returns True when the response should fail.
+        """
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+
+class FakePerunRpcHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, avoids Nagle/delayed ACK stalls of the client
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.server.faults.inject():
+            # connection dropped without a response, curl reports an error
+            self.close_connection = True
+            return
+
+        url = urllib.parse.urlparse(self.path)
+        if not url.path.endswith('/usersManager/getUserByExtSourceNameAndExtLogin'):
+            self.send_json({'errorId': 1, 'name': 'RpcException', 'message': f'Unknown method {url.path}'})
+            return
+
+        login = urllib.parse.parse_qs(url.query).get('extLogin', [''])[0]
+        id = self.server.users.get(login)
+        if id is None:
+            self.send_json({'errorId': 2, 'name': 'UserExtSourceNotExistsException',
+                            'message': f'User with login {login} not found'})
+            return
+
+        self.send_json({'id': id, 'titleBefore': None, 'firstName': 'User', 'middleName': None,
+                        'lastName': str(id), 'titleAfter': None})
+
+    def send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePerunRpcServer(ThreadingHTTPServer):
+
+    request_queue_size = 256
+    daemon_threads = True
+
+    def __init__(self, users, faults):
+        super().__init__(('127.0.0.1', 0), FakePerunRpcHandler)
+        self.users = {user_login(id): id for id in range(users)}
+        self.faults = faults
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-perun-rpc', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakePerunLdapHandler(socketserver.BaseRequestHandler):
+
+    BIND_REQUEST = 0x60
+    UNBIND_REQUEST = 0x42
+    SEARCH_REQUEST = 0x63
+    EXTENDED_REQUEST = 0x77
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.lock = threading.Lock()
+
+    def handle(self):
+        data = b''
+        while True:
+            length = BaseStrategy.compute_ldap_message_size(data)
+            if length == -1 or len(data) < length:
+                chunk = self.request.recv(65536)
+                if not chunk:
+                    return
+                data += chunk
+                continue
+
+            message, data = data[:length], data[length:]
+            message_id, operation = self.parse(message)
+            if operation == self.UNBIND_REQUEST:
+                return
+            if operation == self.BIND_REQUEST:
+                self.send(message_id, [self.server.bind_success if LDAP_PASSWORD.encode() in message
+                                       else self.server.bind_failure])
+            elif operation == self.EXTENDED_REQUEST:
+                self.send(message_id, [self.server.extended_success])
+            elif operation == self.SEARCH_REQUEST:
+                # searches multiplexed over one connection are answered concurrently
+                threading.Thread(target=self.search, args=(message_id, message), daemon=True).start()
+
+    def search(self, message_id, message):
+        if self.server.faults.inject():
+            # connection dropped without a response, ldap3 reports a communication error
+            self.request.shutdown(socket.SHUT_RDWR)
+            return
+
+        entries = [self.server.entries.get(login) for login in LOGIN_PATTERN.findall(message)]
+        self.send(message_id, [entry for entry in entries if entry is not None] + [self.server.search_done])
+
+    def send(self, message_id, operations):
+        id = message_id.to_bytes(max(1, (message_id.bit_length() + 8) // 8), 'big')
+        messages = []
+        for operation in operations:
+            content = b'\x02' + ber_length(len(id)) + id + operation
+            messages.append(b'\x30' + ber_length(len(content)) + content)
+        with self.lock:
+            self.request.sendall(b''.join(messages))
+
+    @staticmethod
+    def parse(message):
+        position = 2 + (message[1] & 0x7f if message[1] & 0x80 else 0)
+        id_length = message[position + 1]
+        message_id = int.from_bytes(message[position + 2:position + 2 + id_length], 'big')
+        return message_id, message[position + 2 + id_length]
+
+
+class FakePerunLdapServer(socketserver.ThreadingTCPServer):
+    """
+    Answers simple binds, searches for users by eduPersonPrincipalNames and the WhoAmI
+    extended operation. Encoded responses are prepared up front.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, users, faults):
+        super().__init__(('127.0.0.1', 0), FakePerunLdapHandler)
+        self.faults = faults
+
+        self.bind_success = encode(self.result(BindResponse(), 0))
+        self.bind_failure = encode(self.result(BindResponse(), 49))
+        self.extended_success = encode(self.result(ExtendedResponse(), 0))
+        self.search_done = encode(self.result(SearchResultDone(), 0))
+        self.entries = {
+            user_login(id).encode(): encode(self.search_entry(f'perunUserId={id},ou=People,{LDAP_BASE}', {
+                'perunUserId': [str(id)],
+                'displayName': [f'User {id}'],
+                'cn': [f'User {id}'],
+                'eduPersonPrincipalNames': [user_login(id)],
+            }))
+            for id in range(users)
+        }
+
+    @property
+    def url(self):
+        return f'ldap://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-perun-ldap', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    @staticmethod
+    def result(operation, code):
+        operation['resultCode'] = ResultCode(code)
+        operation['matchedDN'] = ''
+        operation['diagnosticMessage'] = ''
+        return operation
+
+    @staticmethod
+    def search_entry(dn, attributes):
+        entry = SearchResultEntry()
+        entry['object'] = LDAPDN(dn)
+        attribute_list = PartialAttributeList()
+        for index, (name, values) in enumerate(attributes.items()):
+            attribute = PartialAttribute()
+            attribute['type'] = AttributeDescription(name)
+            vals = Vals()
+            for value_index, value in enumerate(values):
+                vals.setComponentByPosition(value_index, AttributeValue(value))
+            attribute['vals'] = vals
+            attribute_list.setComponentByPosition(index, attribute)
+        entry['attributes'] = attribute_list
+        return entry
@@ -21,4 +21,9 @@ setup(
         "pycurl"
     ],
     python_requires='>=3.7',
+    entry_points={
+        'console_scripts': [
+            'perun-cache-snapshot=perun.micro_services.cache.SnapshotBuilder:main',
+        ],
+    },
 )
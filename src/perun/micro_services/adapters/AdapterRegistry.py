@@ -0,0 +1,74 @@
+"""
+Class AdapterRegistry
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AdapterRegistry:
+    """
+    Process wide registry of adapters.
+
+    Micro_services configured with the same perun configuration file,
+    interface and options get the same adapter, so they share its
+    connection pools, cache and circuit breaker instead of creating their own.
+    """
+
+    _adapters = {}
+    _key_locks = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_instance(config_file, options, factory):
+        """
+        Returns adapter of `config_file` and `options` (JSON serializable),
+        created by `factory` when there is none yet. Only lookups of the same key
+        wait while the adapter is created.
+        """
+        key = AdapterRegistry.get_key(config_file, options)
+        with AdapterRegistry._lock:
+            adapter = AdapterRegistry._adapters.get(key)
+            if adapter is not None:
+                return adapter
+            key_lock = AdapterRegistry._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with AdapterRegistry._lock:
+                adapter = AdapterRegistry._adapters.get(key)
+            if adapter is None:
+                adapter = factory()
+                with AdapterRegistry._lock:
+                    AdapterRegistry._adapters[key] = adapter
+                    AdapterRegistry._key_locks.pop(key, None)
+        return adapter
+
+    @staticmethod
+    def get_key(config_file, options):
+        return os.path.realpath(config_file), json.dumps(options, sort_keys=True, default=str)
+
+    @staticmethod
+    def clear():
+        with AdapterRegistry._lock:
+            adapters = list(AdapterRegistry._adapters.values())
+            AdapterRegistry._adapters = {}
+            AdapterRegistry._key_locks = {}
+
+        for adapter in adapters:
+            AdapterRegistry.close_adapter(adapter)
+
+    @staticmethod
+    def close_adapter(adapter):
+        """
+        Closes the outermost adapter, which closes the adapters it wraps.
+        """
+        try:
+            adapter.close()
+        except Exception as ex:
+            logger.warning(f'AdapterRegistry - unable to close adapter: {ex}')
@@ -0,0 +1,43 @@
+"""
+Synchronous PerunAdapter running an asyncio adapter
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import asyncio
+import threading
+
+from perun.micro_services.adapters.Deadline import Deadline
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+
+
+class AsyncAdapterShim(PerunAdapterAbstract):
+    """
+    Exposes an AsyncPerunAdapterAbstract implementation through the synchronous
+    interface. The async adapter runs in one event loop in a background thread,
+    so lookups of all calling threads are multiplexed on that single loop.
+    Coroutines run with the Deadline of the calling thread.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='perun-asyncio', daemon=True)
+        self.thread.start()
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        return self.run(self.adapter.get_perun_user(idp_entity_id, uids, identifiers))
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        return self.run(self.adapter.get_perun_users(idp_entity_id, uid_batches, identifier_batches))
+
+    def warm_up(self):
+        self.run(self.adapter.warm_up())
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(Deadline.bind(coroutine, Deadline.current()), self.loop).result()
+
+    def close(self):
+        self.run(self.adapter.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,52 @@
+"""
+Asyncio PerunAdapter for connection via LDAP
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+
+import yaml
+from perun.micro_services.adapters.AsyncLdapConnector import AsyncLdapConnector
+from perun.micro_services.adapters.AsyncPerunAdapterAbstract import AsyncPerunAdapterAbstract
+from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLdapAdapter(AsyncPerunAdapterAbstract):
+
+    def __init__(self, config_file):
+
+        with open(config_file, "r") as f:
+            perun_configuration = yaml.safe_load(f)
+            hostnames = perun_configuration.get(LdapAdapter.PERUN_LDAP_HOSTNAMES, None)
+            user = perun_configuration.get(LdapAdapter.PERUN_LDAP_USER, None)
+            pasword = perun_configuration.get(LdapAdapter.PERUN_LDAP_PASSWORD, None)
+            self.base = perun_configuration.get(LdapAdapter.PERUN_LDAP_BASE, None)
+            self.filter_builder = LdapAdapter.create_filter_builder(perun_configuration)
+            slow_query_threshold = perun_configuration.get(LdapAdapter.PERUN_LDAP_SLOW_QUERY_THRESHOLD, None)
+            slow_query_sample_rate = perun_configuration.get(LdapAdapter.PERUN_LDAP_SLOW_QUERY_SAMPLE_RATE, 1.0)
+
+        if None in [hostnames, user, pasword, self.base]:
+            raise Exception('One of required attributes is not defined!')
+
+        self.connector = AsyncLdapConnector(hostnames, user, pasword, slow_query_threshold=slow_query_threshold,
+                                            slow_query_sample_rate=slow_query_sample_rate,
+                                            personal_attributes=self.filter_builder.attributes)
+
+    async def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        ldap_filter = self.filter_builder.build(uids, identifiers)
+
+        if ldap_filter is None:
+            return None
+
+        response = await self.connector.search_for_entity('ou=People,' + self.base,
+                                                          ldap_filter,
+                                                          LdapAdapter.USER_ATTRIBUTES
+                                                          )
+
+        return LdapAdapter.create_user(response)
+
+    async def close(self):
+        await self.connector.close()
@@ -0,0 +1,214 @@
+"""
+Asyncio Ldap Connector
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import asyncio
+import itertools
+import logging
+import ssl
+import time
+import urllib.parse
+
+from ldap3 import SIMPLE, SUBTREE, DEREF_ALWAYS
+from ldap3.operation.bind import bind_operation, bind_response_to_dict_fast
+from ldap3.operation.search import search_operation, search_result_entry_response_to_dict_fast
+from ldap3.protocol.rfc4511 import LDAPMessage, MessageID, ProtocolOp
+from ldap3.strategy.base import BaseStrategy
+from ldap3.utils.asn1 import decode_message_fast, encode, ldap_result_to_dict_fast
+
+from ..metrics.Metrics import Metrics
+from .Deadline import Deadline
+from .RequestLogger import RequestLogger
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLdapConnector:
+    """
+    Speaks LDAP over a single asyncio stream using the ldap3 protocol codecs.
+
+    All searches are multiplexed over one bound connection and matched to
+    their responses by message id, so many searches can be in flight on
+    a single thread. The connection is opened lazily to the first reachable
+    host of `hostnames` and reopened after a failure.
+    """
+
+    BIND_RESPONSE = 1
+    SEARCH_RESULT_ENTRY = 4
+    SEARCH_RESULT_DONE = 5
+
+    DEFAULT_PORTS = {'ldap': 389, 'ldaps': 636}
+    CONNECT_TIMEOUT = 1
+    TIMEOUT = 15
+
+    def __init__(self, hostnames, user, password, slow_query_threshold=None, slow_query_sample_rate=1.0,
+                 personal_attributes=()):
+        self.hostnames = hostnames
+        self.user = user
+        self.password = password
+
+        self._message_ids = itertools.count(1)
+        self._pending = {}
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = None
+
+        self.request_seconds = Metrics.backend_request_seconds()
+        self.errors = Metrics.backend_errors()
+        self.request_logger = RequestLogger(logger, 'ldap', slow_query_threshold, slow_query_sample_rate,
+                                            personal_attributes)
+
+    async def search_for_entity(self, base, filter, attributes=None):
+        entries = await self.search(base, filter, attributes)
+
+        if len(entries) == 0:
+            logger.error('AsyncLdapConnector.search_for_entity - No entity found. Returning \'None\'.')
+            return None
+
+        if len(entries) > 1:
+            raise Exception('AsyncLdapConnector.search_for_entity - More than one entity found.')
+
+        return entries[0]
+
+    async def search_for_entities(self, base, filter, attributes=None):
+        entries = await self.search(base, filter, attributes)
+
+        if len(entries) == 0:
+            logger.error('AsyncLdapConnector.search_for_entity - No entity found. Returning \'None\'.')
+            return None
+
+        return entries
+
+    async def search(self, base, filter, attributes=None):
+        if attributes is None:
+            attributes = []
+
+        await self._ensure_connected()
+
+        request = search_operation(base, filter, SUBTREE, DEREF_ALWAYS, attributes, 0, 0, False, True, True)
+        labels = ('ldap', 'search')
+        query = {'base': base, 'filter': filter}
+        start_time = time.perf_counter()
+        try:
+            entries = await self._request('searchRequest', request)
+        except Exception as ex:
+            self.errors.inc(labels + (Metrics.TIMEOUT if isinstance(ex, asyncio.TimeoutError) else Metrics.ERROR,))
+            self.request_logger.log('search', time.perf_counter() - start_time, query, error=ex)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.request_seconds.observe(elapsed, labels)
+
+        response = []
+        for entry in entries:
+            data = {attribute: [] for attribute in attributes}
+            data.update(entry['attributes'])
+            response.append(data)
+
+        self.request_logger.log('search', elapsed, query, response)
+        return response
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ConnectionError('Connector closed.'))
+
+    async def _ensure_connected(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+
+            error = None
+            for hostname in self.hostnames:
+                try:
+                    await self._connect(hostname)
+                    return
+                except Exception as ex:
+                    logger.warning(f'AsyncLdapConnector - unable to connect to {hostname}: {ex}')
+                    error = ex
+                    await self.close()
+
+            raise Exception(f'Unable to bind user to the Perun LDAP {self.hostnames}: {error}')
+
+    async def _connect(self, hostname):
+        url = urllib.parse.urlparse(hostname if '://' in hostname else f'ldap://{hostname}')
+        port = url.port or self.DEFAULT_PORTS.get(url.scheme, 389)
+        context = ssl.create_default_context() if url.scheme == 'ldaps' else None
+
+        reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(url.hostname, port, ssl=context), Deadline.timeout(self.CONNECT_TIMEOUT)
+        )
+        self._reader_task = asyncio.ensure_future(self._read_responses(reader, self._writer))
+
+        result = await self._request('bindRequest', bind_operation(3, SIMPLE, self.user, self.password))
+        if result['result'] != 0:
+            raise Exception(f'Bind failed: {result["description"]} {result["message"]}')
+
+    async def _request(self, message_type, request):
+        message_id = next(self._message_ids)
+        message = LDAPMessage()
+        message['messageID'] = MessageID(message_id)
+        message['protocolOp'] = ProtocolOp().setComponentByName(message_type, request)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = (future, [])
+        try:
+            self._writer.write(encode(message))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, Deadline.timeout(self.TIMEOUT))
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def _read_responses(self, reader, writer):
+        data = b''
+        try:
+            while True:
+                length = BaseStrategy.compute_ldap_message_size(data)
+                if length == -1 or len(data) < length:
+                    chunk = await reader.read(65536)
+                    if not chunk:
+                        raise ConnectionError('Connection closed by the Perun LDAP.')
+                    data += chunk
+                    continue
+
+                self._dispatch(decode_message_fast(data[:length]))
+                data = data[length:]
+        except Exception as ex:
+            logger.warning(f'AsyncLdapConnector - connection lost: {ex}')
+            writer.close()
+            self._fail_pending(ex)
+
+    def _fail_pending(self, ex):
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f'Connection to the Perun LDAP lost: {ex!r}'))
+
+    def _dispatch(self, message):
+        pending = self._pending.get(message['messageID'])
+        if pending is None:
+            return
+
+        future, entries = pending
+        if future.done():
+            return
+
+        operation = message['protocolOp']
+        if operation == self.SEARCH_RESULT_ENTRY:
+            entries.append(search_result_entry_response_to_dict_fast(message['payload'], None, None, False))
+        elif operation == self.BIND_RESPONSE:
+            future.set_result(bind_response_to_dict_fast(message['payload']))
+        elif operation == self.SEARCH_RESULT_DONE:
+            result = ldap_result_to_dict_fast(message['payload'])
+            if result['result'] == 0:
+                future.set_result(entries)
+            else:
+                future.set_exception(Exception(f'LDAP search failed: {result["description"]} {result["message"]}'))
@@ -0,0 +1,46 @@
+"""
+Abstract class AsyncPerunAdapterAbstract
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import asyncio
+from abc import ABC, abstractmethod
+
+
+class AsyncPerunAdapterAbstract(ABC):
+
+    LDAP = 'ldap'
+    RPC = 'rpc'
+
+    BULK_CONCURRENCY = 16
+
+    @abstractmethod
+    async def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        pass
+
+    async def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Resolves batches concurrently, at most BULK_CONCURRENCY at a time,
+        see PerunAdapterAbstract.get_perun_users.
+        """
+        semaphore = asyncio.Semaphore(self.BULK_CONCURRENCY)
+
+        async def get_perun_user(index, uids):
+            async with semaphore:
+                identifiers = identifier_batches[index] if identifier_batches else None
+                return await self.get_perun_user(idp_entity_id, uids, identifiers)
+
+        found = await asyncio.gather(*(get_perun_user(index, uids) for index, uids in enumerate(uid_batches)))
+
+        users = {}
+        for uids, user in zip(uid_batches, found):
+            if user is not None:
+                users.update(dict.fromkeys(uids, user))
+        return users
+
+    async def warm_up(self):
+        pass
+
+    async def close(self):
+        pass
@@ -0,0 +1,83 @@
+"""
+Asyncio PerunAdapter for connection via RPC
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import asyncio
+import logging
+
+import yaml
+from perun.micro_services.adapters.AsyncPerunAdapterAbstract import AsyncPerunAdapterAbstract
+from perun.micro_services.adapters.AsyncRpcConnector import AsyncRpcConnector
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
+from perun.micro_services.adapters.RpcAdapter import RpcAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRpcAdapter(AsyncPerunAdapterAbstract):
+
+    def __init__(self, config_file):
+
+        with open(config_file, "r") as f:
+            perun_configuration = yaml.safe_load(f)
+            hostname = perun_configuration.get(RpcAdapter.PERUN_RPC_HOSTNAME, None)
+            user = perun_configuration.get(RpcAdapter.PERUN_RPC_USER, None)
+            pasword = perun_configuration.get(RpcAdapter.PERUN_RPC_PASSWORD, None)
+            pool_size = perun_configuration.get(RpcAdapter.PERUN_RPC_POOL_SIZE, AsyncRpcConnector.DEFAULT_POOL_SIZE)
+            self.parallel_lookups = perun_configuration.get(RpcAdapter.PERUN_RPC_PARALLEL_LOOKUPS, False)
+            slow_query_threshold = perun_configuration.get(RpcAdapter.PERUN_RPC_SLOW_QUERY_THRESHOLD, None)
+            slow_query_sample_rate = perun_configuration.get(RpcAdapter.PERUN_RPC_SLOW_QUERY_SAMPLE_RATE, 1.0)
+
+        if None in [hostname, user, pasword]:
+            raise Exception('One of required attributes is not defined!')
+
+        self.connector = AsyncRpcConnector(hostname, user, pasword, pool_size=pool_size,
+                                           slow_query_threshold=slow_query_threshold,
+                                           slow_query_sample_rate=slow_query_sample_rate)
+
+    async def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        if self.parallel_lookups and len(uids) > 1:
+            return await self.get_perun_user_parallel(idp_entity_id, uids)
+
+        for uid in uids:
+            try:
+                return await self.get_user_by_ext_login(idp_entity_id, uid)
+            except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, DeadlineExceeded):
+                raise
+            except Exception as ex:
+                logger.debug(ex.args)
+
+        return None
+
+    async def get_perun_user_parallel(self, idp_entity_id, uids):
+        """
+        Looks up all uids concurrently and returns the user found for the first uid
+        in the given order. Remaining lookups are cancelled once it is known.
+        """
+        tasks = [asyncio.ensure_future(self.get_user_by_ext_login(idp_entity_id, uid)) for uid in uids]
+        try:
+            for task in tasks:
+                try:
+                    return await task
+                except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, DeadlineExceeded):
+                    raise
+                except Exception as ex:
+                    logger.debug(ex.args)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return None
+
+    async def get_user_by_ext_login(self, idp_entity_id, uid):
+        result = await self.connector.get('usersManager', 'getUserByExtSourceNameAndExtLogin', {
+            'extSourceName': idp_entity_id,
+            'extLogin': uid
+        })
+
+        return RpcAdapter.create_user(result)
+
+    async def close(self):
+        await self.connector.close()
@@ -0,0 +1,188 @@
+"""
+Provides asyncio interface to call Perun RPC.
+Note that Perun RPC should be considered as unreliable
+and authentication process should continue without connection to Perun. e.g. use LDAP instead.
+
+"""
+__author__ = "Pavel Vyskocil, Pavol Pluta"
+__email__ = "vyskocilpavel@muni.cz, pavol.pluta1@gmail.com"
+
+import asyncio
+import base64
+import json
+import logging
+import ssl
+import time
+import urllib.parse
+
+from ..metrics.Metrics import Metrics
+from ..utils import build_rpc_query
+from .Deadline import Deadline
+from .RequestLogger import RequestLogger
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRpcConnector:
+    """
+    Minimal HTTP/1.1 client on asyncio streams.
+
+    Up to `pool_size` idle keep-alive connections to the Perun RPC are kept
+    and reused, a request failing on a reused connection is retried once
+    on a new one.
+    """
+
+    CONNECT_TIMEOUT = 1
+    TIMEOUT = 15
+    DEFAULT_POOL_SIZE = 10
+
+    def __init__(self, rpc_url, user, password, pool_size=DEFAULT_POOL_SIZE, slow_query_threshold=None,
+                 slow_query_sample_rate=1.0):
+        self.rpc_url = rpc_url
+        self.user = user
+        self.passwd = password
+        self.pool_size = pool_size
+
+        url = urllib.parse.urlparse(rpc_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.path = url.path if url.path.endswith('/') else url.path + '/'
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.authorization = 'Basic ' + base64.b64encode(f'{user}:{password}'.encode()).decode()
+
+        self._idle = []
+
+        self.request_seconds = Metrics.backend_request_seconds()
+        self.errors = Metrics.backend_errors()
+        self.request_logger = RequestLogger(logger, 'rpc', slow_query_threshold, slow_query_sample_rate)
+
+    async def get(self, manager, method, params=None):
+        if params is None:
+            params = []
+
+        params_query = build_rpc_query(params)
+        path = f'{self.path}json/{manager}/{method}?{params_query}'
+
+        return await self._call('GET', path, labels=('rpc', f'{manager}.{method}'), params=params)
+
+    async def post(self, manager, method, params=None):
+        if params is None:
+            params = []
+
+        params_json = json.dumps(params)
+        path = f'{self.path}json/{manager}/{method}'
+
+        return await self._call('POST', path, params_json.encode('utf-8'), ('rpc', f'{manager}.{method}'), params)
+
+    async def close(self):
+        idle = self._idle
+        self._idle = []
+        for _, writer in idle:
+            writer.close()
+
+    async def _call(self, method, path, body=None, labels=('rpc', ''), params=None):
+        start_time = time.perf_counter()
+        try:
+            body = await self._send(method, path, body)
+        except Exception as ex:
+            self.errors.inc(labels + (Metrics.TIMEOUT if isinstance(ex, asyncio.TimeoutError) else Metrics.ERROR,))
+            self.request_logger.log(labels[1], time.perf_counter() - start_time, {'params': params}, error=ex)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.request_seconds.observe(elapsed, labels)
+
+        result = json.loads(body.decode('utf-8'))
+
+        self.request_logger.log(labels[1], elapsed, {'params': params}, result)
+        if 'errorId' in result.keys():
+            self.errors.inc(labels + ('perun',))
+            raise Exception(f'Exception from Perun: {result["message"]}')
+
+        return result
+
+    async def _send(self, method, path, body):
+        reused = bool(self._idle)
+        try:
+            return await asyncio.wait_for(self._request(method, path, body), Deadline.timeout(self.TIMEOUT))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            # the server has closed the kept-alive connection in the meantime
+            return await asyncio.wait_for(self._request(method, path, body), Deadline.timeout(self.TIMEOUT))
+
+    async def _request(self, method, path, body):
+        reader, writer = await self._acquire()
+        try:
+            headers = [
+                f'{method} {path} HTTP/1.1',
+                f'Host: {self.host}',
+                f'Authorization: {self.authorization}',
+                'Accept: application/json',
+                'Connection: keep-alive',
+            ]
+            if body is not None:
+                headers += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+
+            writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + (body or b''))
+            await writer.drain()
+
+            keep_alive, response = await self._read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive and len(self._idle) < self.pool_size:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+        return response
+
+    async def _acquire(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), Deadline.timeout(self.CONNECT_TIMEOUT)
+        )
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by the Perun RPC.')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            return False, await reader.read()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        if not status.startswith('2') and not body:
+            raise Exception(f'Perun RPC responded with HTTP status {status}.')
+
+        return keep_alive, body
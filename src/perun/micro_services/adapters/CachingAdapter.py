@@ -0,0 +1,277 @@
+"""
+PerunAdapter caching user lookups of another adapter
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+from perun.micro_services.cache.MemoryCache import MemoryCache
+from perun.micro_services.metrics.Metrics import Metrics
+from perun.micro_services.models.Group import Group
+from perun.micro_services.models.User import User
+from perun.micro_services.models.Vo import Vo
+
+logger = logging.getLogger(__name__)
+
+
+class CachingAdapter(PerunAdapterAbstract):
+    """
+    Caches results of `adapter.get_perun_user` per (idp_entity_id, uid).
+
+    Found users are cached for `ttl` seconds, lookups without any result
+    for `negative_ttl` seconds. A user found for a list of uids is stored
+    under every uid of the list, because all of them were released by
+    the IdP for the same person. Attributes and memberships of users are
+    cached along with them.
+
+    Found users are kept for another `stale_ttl` seconds after they expire.
+    A stale user is returned when `adapter` fails, and with
+    `background_revalidation` it is returned right away while the lookup
+    is refreshed in a background thread.
+
+    During the first `ttl` seconds after the start, lookups of uids not cached
+    since the start are answered from `snapshot` (e.g. a SnapshotLoader) of
+    identity mappings persisted before a restart, if it knows the user, before
+    `adapter` is asked. An entry cached since the start is kept at least until
+    then, so its presence tells the uid was cached and its lookups go to
+    `adapter` when it expires.
+    """
+
+    DEFAULT_TTL = 3600
+    DEFAULT_NEGATIVE_TTL = 60
+    DEFAULT_STALE_TTL = 0
+    REVALIDATION_WORKERS = 2
+    METRIC_RESULTS = {'hits': 'hit', 'misses': 'miss', 'stale_hits': 'stale', 'snapshot_hits': 'snapshot'}
+
+    def __init__(self, adapter, cache=None, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 stale_ttl=DEFAULT_STALE_TTL, background_revalidation=False, snapshot=None):
+        self.adapter = adapter
+        self.cache = cache if cache is not None else MemoryCache()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.background_revalidation = background_revalidation
+        self.snapshot = snapshot
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.snapshot_hits = 0
+        self._stats_lock = threading.Lock()
+
+        self.requests = Metrics.cache_requests()
+        Metrics.cache_hit_ratio().set_function(lambda: self.hit_ratio)
+
+        self._revalidating = set()
+        self._executor = None
+        self._started_at = time.time()
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses + self.stale_hits + self.snapshot_hits
+        return (self.hits + self.stale_hits + self.snapshot_hits) / total if total else 0.0
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        cached_user, unknown_uids, unknown_identifiers, stale_user = self._lookup(idp_entity_id, uids, identifiers)
+
+        if cached_user is not None:
+            self._count('hits')
+            return self.deserialize_user(cached_user)
+
+        if uids and not unknown_uids:
+            self._count('hits')
+            return None
+
+        if stale_user is not None and self.background_revalidation:
+            self._count('stale_hits')
+            self._revalidate(idp_entity_id, unknown_uids, unknown_identifiers)
+            return self.deserialize_user(stale_user)
+
+        snapshot_user = self._from_snapshot(idp_entity_id, unknown_uids)
+        if snapshot_user is not None:
+            self._count('snapshot_hits')
+            return snapshot_user
+
+        self._count('misses')
+        try:
+            return self.refresh(idp_entity_id, unknown_uids, unknown_identifiers)
+        except Exception as ex:
+            if stale_user is None:
+                raise
+            logger.warning(f'CachingAdapter - lookup failed ({ex}), returning stale user.')
+            self._count('stale_hits')
+            return self.deserialize_user(stale_user)
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Answers batches from the cache and resolves the rest by one bulk lookup of `adapter`.
+        Results of the bulk lookup are cached, which pre-warms the cache.
+        """
+        users = {}
+        missing_batches = []
+        missing_uids = []
+        missing_identifiers = [] if identifier_batches else None
+
+        for index, uids in enumerate(uid_batches):
+            identifiers = identifier_batches[index] if identifier_batches else None
+            cached_user, unknown_uids, unknown_identifiers, _ = self._lookup(idp_entity_id, uids, identifiers)
+
+            if cached_user is not None:
+                self._count('hits')
+                users.update(dict.fromkeys(uids, self.deserialize_user(cached_user)))
+            elif uids and not unknown_uids:
+                self._count('hits')
+            else:
+                snapshot_user = self._from_snapshot(idp_entity_id, unknown_uids)
+                if snapshot_user is not None:
+                    self._count('snapshot_hits')
+                    users.update(dict.fromkeys(uids, snapshot_user))
+                    continue
+
+                self._count('misses')
+                missing_batches.append(uids)
+                missing_uids.append(unknown_uids)
+                if identifier_batches:
+                    missing_identifiers.append(unknown_identifiers)
+
+        if not missing_batches:
+            return users
+
+        found = self.adapter.get_perun_users(idp_entity_id, missing_uids, missing_identifiers)
+        for uids, unknown_uids in zip(missing_batches, missing_uids):
+            user = next((found[uid] for uid in unknown_uids if uid in found), None)
+            self.store(idp_entity_id, unknown_uids, user)
+            if user is not None:
+                users.update(dict.fromkeys(uids, user))
+
+        return users
+
+    def warm_up(self):
+        self.adapter.warm_up()
+
+    def close(self):
+        with self._stats_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self.adapter.close()
+
+    def refresh(self, idp_entity_id, uids, identifiers=None):
+        user = self.adapter.get_perun_user(idp_entity_id, uids, identifiers)
+        self.store(idp_entity_id, uids, user)
+        return user
+
+    def store(self, idp_entity_id, uids, user):
+        if user is None:
+            entry, ttl = {'user': None}, self.negative_ttl
+        else:
+            entry, ttl = {'user': self.serialize_user(user)}, self.ttl
+        now = time.time()
+        entry['expires_at'] = now + ttl
+        cache_ttl = ttl + self.stale_ttl
+        if self.snapshot is not None:
+            # kept while the snapshot is used, so it does not answer the uid anymore
+            cache_ttl = max(cache_ttl, self._started_at + self.ttl - now)
+
+        for uid in uids:
+            self.cache.set(self.get_key(idp_entity_id, uid), entry, cache_ttl)
+
+    @staticmethod
+    def get_key(idp_entity_id, uid):
+        return f'{idp_entity_id}|{uid}'
+
+    @staticmethod
+    def serialize_user(user):
+        data = {'id': user.id, 'name': user.name}
+        if user.attributes is not None:
+            data['attributes'] = user.attributes
+        if user.vos is not None:
+            data['vos'] = [{'id': vo.id, 'name': vo.name, 'short_name': vo.short_name} for vo in user.vos]
+        if user.groups is not None:
+            data['groups'] = [{'id': group.id, 'vo_id': group.vo_id, 'name': group.name,
+                               'description': group.description, 'unique_name': group.unique_name}
+                              for group in user.groups]
+        return data
+
+    @staticmethod
+    def deserialize_user(data):
+        vos = data.get('vos')
+        groups = data.get('groups')
+        return User(
+            data['id'], data['name'], data.get('attributes'),
+            [Vo(vo['id'], vo['name'], vo['short_name']) for vo in vos] if vos is not None else None,
+            [Group(group['id'], group['vo_id'], group['name'], group['description'], group['unique_name'])
+             for group in groups] if groups is not None else None
+        )
+
+    def _lookup(self, idp_entity_id, uids, identifiers):
+        """
+        Returns cached serialized user (or None), uids and identifiers not cached yet
+        or expired, and a stale serialized user of the expired ones.
+        """
+        now = time.time()
+        unknown_uids = []
+        unknown_identifiers = [] if identifiers else None
+        stale_user = None
+
+        for index, uid in enumerate(uids):
+            entry = self.cache.get(self.get_key(idp_entity_id, uid))
+            if entry is None or entry['expires_at'] <= now:
+                unknown_uids.append(uid)
+                if identifiers:
+                    unknown_identifiers.append(identifiers[index])
+                if entry is not None and stale_user is None:
+                    stale_user = entry['user']
+            elif entry['user'] is not None:
+                return entry['user'], unknown_uids, unknown_identifiers, stale_user
+
+        return None, unknown_uids, unknown_identifiers, stale_user
+
+    def _from_snapshot(self, idp_entity_id, uids):
+        """
+        Returns user of the first of `uids` known to the snapshot and caches it under all `uids`,
+        unless the snapshot is not used anymore or any of `uids` was cached since the start.
+        """
+        if self.snapshot is None or time.time() - self._started_at >= self.ttl:
+            return None
+        if any(self.cache.get(self.get_key(idp_entity_id, uid)) is not None for uid in uids):
+            return None
+
+        for uid in uids:
+            user = self.snapshot.get(idp_entity_id, uid)
+            if user is not None:
+                self.store(idp_entity_id, uids, user)
+                return user
+        return None
+
+    def _revalidate(self, idp_entity_id, uids, identifiers=None):
+        key = (idp_entity_id, tuple(uids), tuple(identifiers) if identifiers else None)
+        with self._stats_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.REVALIDATION_WORKERS, 'perun-revalidation')
+
+        self._executor.submit(self._run_revalidation, key)
+
+    def _run_revalidation(self, key):
+        try:
+            self.refresh(key[0], list(key[1]), list(key[2]) if key[2] else None)
+        except Exception as ex:
+            logger.warning(f'CachingAdapter - background revalidation failed: {ex}')
+        finally:
+            with self._stats_lock:
+                self._revalidating.discard(key)
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        self.requests.inc((self.METRIC_RESULTS[counter],))
@@ -0,0 +1,98 @@
+"""
+Circuit breaker guarding calls to Perun
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls. Calls taking
+    longer than `slow_call_threshold` seconds are counted as failed too.
+
+    While open, calls are rejected without touching Perun. After
+    `reset_timeout` seconds one trial call is let through (half-open);
+    its success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_RESET_TIMEOUT = 30
+    DEFAULT_SLOW_CALL_THRESHOLD = 5
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 slow_call_threshold=DEFAULT_SLOW_CALL_THRESHOLD):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self, elapsed):
+        if elapsed > self.slow_call_threshold:
+            logger.warning(f'CircuitBreaker {self.name} - call took {elapsed * 1000:.0f} ms, counting as failure.')
+            self.record_failure(elapsed)
+            return
+
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self, elapsed):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def record_ignored(self):
+        """
+        Ends a call which tells nothing about Perun, e.g. one whose time budget was spent
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def _transition(self, state):
+        logger.warning(
+            f'CircuitBreaker {self.name} - state changed from {self.state} to {state} '
+            f'after {self.failures} consecutive failures, {self.rejected} calls rejected so far.'
+        )
+        self.state = state
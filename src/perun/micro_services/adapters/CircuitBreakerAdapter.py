@@ -0,0 +1,55 @@
+"""
+PerunAdapter guarding another adapter by a circuit breaker
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import time
+
+from perun.micro_services.adapters.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerAdapter(PerunAdapterAbstract):
+    """
+    Raises CircuitOpenError instead of calling `adapter` while the breaker is open.
+    """
+
+    def __init__(self, adapter, breaker=None):
+        self.adapter = adapter
+        self.breaker = breaker if breaker is not None else CircuitBreaker(type(adapter).__name__)
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        return self._call(self.adapter.get_perun_user, (idp_entity_id, uids, identifiers))
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        # bulk lookups take long by nature, they are never counted as slow calls
+        return self._call(self.adapter.get_perun_users, (idp_entity_id, uid_batches, identifier_batches), False)
+
+    def warm_up(self):
+        self.adapter.warm_up()
+
+    def close(self):
+        self.adapter.close()
+
+    def _call(self, method, args, timed=True):
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f'CircuitBreakerAdapter - circuit {self.breaker.name} is open.')
+
+        start_time = time.monotonic()
+        try:
+            result = method(*args)
+        except DeadlineExceeded:
+            # the budget of the caller was spent, Perun did not fail
+            self.breaker.record_ignored()
+            raise
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - start_time if timed else 0)
+            raise
+
+        self.breaker.record_success(time.monotonic() - start_time if timed else 0)
+        return result
@@ -0,0 +1,117 @@
+"""
+Pool of reusable pycurl handles
+"""
+__author__ = "Pavel Vyskocil, Pavol Pluta"
+__email__ = "vyskocilpavel@muni.cz, pavol.pluta1@gmail.com"
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import pycurl
+
+logger = logging.getLogger(__name__)
+
+
+class CurlHandlePool:
+    """
+    Thread-safe pool of pycurl handles.
+
+    Every handle keeps its own cache of live connections, so handing the same
+    handle out again reuses the kept-alive TCP/TLS connection to Perun. All
+    handles share DNS and TLS session caches via CurlShare. At most `max_size`
+    idle handles are kept; handles unused for `idle_timeout` seconds are closed.
+    Handles are never shared by two threads at the same time.
+    """
+
+    DEFAULT_MAX_SIZE = 10
+    DEFAULT_IDLE_TIMEOUT = 60
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def acquire(self):
+        stale = []
+        handle = None
+        with self._lock:
+            self._in_use += 1
+            now = time.monotonic()
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if now - last_used > self.idle_timeout:
+                    stale.append(candidate)
+                else:
+                    handle = candidate
+                    break
+
+        for candidate in stale:
+            candidate.close()
+
+        if handle is None:
+            handle = pycurl.Curl()
+        else:
+            handle.unsetopt(pycurl.SHARE)
+            handle.reset()
+
+        self.setup(handle)
+        return handle
+
+    def release(self, handle, discard=False):
+        with self._lock:
+            self._in_use -= 1
+            # handles returned after close are closed too
+            if not discard and not self._closed and len(self._idle) < self.max_size:
+                self._idle.append((handle, time.monotonic()))
+                return
+
+        handle.close()
+
+    @contextmanager
+    def handle(self):
+        handle = self.acquire()
+        # a transfer interrupted by KeyboardInterrupt, GeneratorExit etc. leaves the handle unusable
+        discard = True
+        try:
+            yield handle
+            discard = False
+        except pycurl.error:
+            raise
+        except Exception:
+            discard = False
+            raise
+        finally:
+            self.release(handle, discard=discard)
+
+    def close(self):
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+            self._closed = True
+
+        for handle, _ in idle:
+            handle.close()
+
+    def setup(self, handle):
+        handle.setopt(pycurl.SHARE, self.share)
+        handle.setopt(pycurl.TCP_KEEPALIVE, 1)
+        if hasattr(pycurl, 'MAXAGE_CONN'):
+            handle.setopt(pycurl.MAXAGE_CONN, max(int(self.idle_timeout), 0))
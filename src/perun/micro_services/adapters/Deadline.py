@@ -0,0 +1,90 @@
+"""
+Time budget of one lookup shared by all Perun requests made for it
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Deadline of the current lookup, kept in a context variable, so it follows
+    the lookup into asyncio tasks and into worker threads of executors when
+    submitted by `submit`.
+
+    Connectors limit their timeouts by `timeout`, so every LDAP search and
+    RPC call gets at most the remaining time of the budget, and no request
+    is started once it is spent.
+    """
+
+    _current = contextvars.ContextVar('perun_deadline', default=None)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @property
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    @property
+    def exceeded(self):
+        return self.remaining <= 0
+
+    @staticmethod
+    def current():
+        return Deadline._current.get()
+
+    @staticmethod
+    @contextmanager
+    def start(seconds):
+        """
+        Runs the block with a deadline in `seconds`, without any when None. Yields the deadline.
+        """
+        if seconds is None:
+            yield None
+            return
+
+        deadline = Deadline(seconds)
+        token = Deadline._current.set(deadline)
+        try:
+            yield deadline
+        finally:
+            Deadline._current.reset(token)
+
+    @staticmethod
+    def timeout(default=None):
+        """
+        Returns the remaining time of the current deadline capped by `default` seconds,
+        `default` without a deadline. Raises DeadlineExceeded when the deadline is spent.
+        """
+        deadline = Deadline._current.get()
+        if deadline is None:
+            return default
+
+        remaining = deadline.remaining
+        if remaining <= 0:
+            raise DeadlineExceeded(f'Deadline - time budget of {deadline.seconds} seconds is spent.')
+        return remaining if default is None else min(default, remaining)
+
+    @staticmethod
+    def submit(executor, fn, *args):
+        """
+        Submits `fn` to `executor` to run with the deadline of the caller
+        """
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+
+    @staticmethod
+    async def bind(coroutine, deadline):
+        """
+        Awaits `coroutine` with `deadline`, for coroutines run in an event loop of another thread
+        """
+        Deadline._current.set(deadline)
+        return await coroutine
@@ -5,23 +5,67 @@ __author__ = "Pavel Vyskocil"
 __email__ = "Pavel.Vyskocil@cesnet.cz"
 
 import logging
+import time
 
 import yaml
+from ldap3.utils.conv import escape_filter_chars
+from perun.micro_services.adapters.LdapConnectionPool import LdapConnectionPool
 from perun.micro_services.adapters.LdapConnector import LdapConnector
+from perun.micro_services.adapters.LdapFilterBuilder import LdapFilterBuilder
+from perun.micro_services.adapters.LdapServerSelector import LdapServerSelector
 from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+from perun.micro_services.models.Group import Group
 from perun.micro_services.models.User import User
+from perun.micro_services.models.Vo import Vo
 
 logger = logging.getLogger(__name__)
 
 
 class LdapAdapter(PerunAdapterAbstract):
+    """
+    Looks users up in Perun LDAP.
+
+    Requested user `attributes` (names mapped to LDAP attributes by
+    ldap.user_attributes) and with `memberships` the `memberOf` group DNs
+    are read by the same search as the user. VOs and groups of the DNs are
+    resolved by a directory of their entries kept for ldap.groups_cache_ttl
+    seconds, so only groups not seen yet cost another search.
+
+    With ldap.index_path users are looked up in a local IdentityIndex of
+    their identifiers first, kept in sync with the LDAP by LdapIndexSync,
+    and in the LDAP only when the index does not know them. Lookups of
+    attributes and memberships always search the LDAP.
+    """
 
     PERUN_LDAP_HOSTNAMES = 'ldap.hostnames'
     PERUN_LDAP_BASE = 'ldap.base'
     PERUN_LDAP_USER = 'ldap.user'
     PERUN_LDAP_PASSWORD = 'ldap.password'
+    PERUN_LDAP_POOL_SIZE = 'ldap.pool_size'
+    PERUN_LDAP_POOL_IDLE_TIMEOUT = 'ldap.pool_idle_timeout'
+    PERUN_LDAP_PAGE_SIZE = 'ldap.page_size'
+    PERUN_LDAP_IDENTIFIER_ATTRIBUTES = 'ldap.identifier_attributes'
+    PERUN_LDAP_DEFAULT_IDENTIFIER_ATTRIBUTE = 'ldap.default_identifier_attribute'
+    PERUN_LDAP_BULK_FILTER_SIZE = 'ldap.bulk_filter_size'
+    PERUN_LDAP_SLOW_QUERY_THRESHOLD = 'ldap.slow_query_threshold'
+    PERUN_LDAP_SLOW_QUERY_SAMPLE_RATE = 'ldap.slow_query_sample_rate'
+    PERUN_LDAP_USER_ATTRIBUTES = 'ldap.user_attributes'
+    PERUN_LDAP_GROUPS_CACHE_TTL = 'ldap.groups_cache_ttl'
+    PERUN_LDAP_INDEX_PATH = 'ldap.index_path'
+    PERUN_LDAP_INDEX_SYNC_INTERVAL = 'ldap.index_sync_interval'
+    PERUN_LDAP_INDEX_FULL_SYNC_INTERVAL = 'ldap.index_full_sync_interval'
+    PERUN_LDAP_SERVER_SELECTION = 'ldap.server_selection'
+    PERUN_LDAP_SERVER_FAILURE_THRESHOLD = 'ldap.server_failure_threshold'
+    PERUN_LDAP_SERVER_EJECTION_TIME = 'ldap.server_ejection_time'
 
-    def __init__(self, config_file):
+    USER_ATTRIBUTES = ['perunUserId', 'displayName', 'cn']
+    MEMBER_OF = 'memberOf'
+    GROUP_ATTRIBUTES = ['perunGroupId', 'perunVoId', 'cn', 'description', 'perunUniqueGroupName']
+    VO_ATTRIBUTES = ['perunVoId', 'o', 'description']
+    DEFAULT_BULK_FILTER_SIZE = 100
+    DEFAULT_GROUPS_CACHE_TTL = 3600
+
+    def __init__(self, config_file, attributes=None, memberships=False):
 
         with open(config_file, "r") as f:
             perun_configuration = yaml.safe_load(f)
@@ -29,26 +73,248 @@ class LdapAdapter(PerunAdapterAbstract):
             user = perun_configuration.get(self.PERUN_LDAP_USER, None)
             pasword = perun_configuration.get(self.PERUN_LDAP_PASSWORD, None)
             self.base = perun_configuration.get(self.PERUN_LDAP_BASE, None)
+            pool_size = perun_configuration.get(self.PERUN_LDAP_POOL_SIZE, LdapConnectionPool.DEFAULT_MAX_SIZE)
+            pool_idle_timeout = perun_configuration.get(self.PERUN_LDAP_POOL_IDLE_TIMEOUT,
+                                                        LdapConnectionPool.DEFAULT_IDLE_TIMEOUT)
+            page_size = perun_configuration.get(self.PERUN_LDAP_PAGE_SIZE, LdapConnector.DEFAULT_PAGE_SIZE)
+            self.filter_builder = self.create_filter_builder(perun_configuration)
+            self.bulk_filter_size = perun_configuration.get(self.PERUN_LDAP_BULK_FILTER_SIZE,
+                                                            self.DEFAULT_BULK_FILTER_SIZE)
+            slow_query_threshold = perun_configuration.get(self.PERUN_LDAP_SLOW_QUERY_THRESHOLD, None)
+            slow_query_sample_rate = perun_configuration.get(self.PERUN_LDAP_SLOW_QUERY_SAMPLE_RATE, 1.0)
+            ldap_attributes = perun_configuration.get(self.PERUN_LDAP_USER_ATTRIBUTES, None) or {}
+            self.groups_cache_ttl = perun_configuration.get(self.PERUN_LDAP_GROUPS_CACHE_TTL,
+                                                            self.DEFAULT_GROUPS_CACHE_TTL)
+            index_path = perun_configuration.get(self.PERUN_LDAP_INDEX_PATH, None)
+            index_sync_interval = perun_configuration.get(self.PERUN_LDAP_INDEX_SYNC_INTERVAL, None)
+            index_full_sync_interval = perun_configuration.get(self.PERUN_LDAP_INDEX_FULL_SYNC_INTERVAL, None)
+            server_selection = perun_configuration.get(self.PERUN_LDAP_SERVER_SELECTION,
+                                                       LdapServerSelector.DEFAULT_STRATEGY)
+            server_failure_threshold = perun_configuration.get(self.PERUN_LDAP_SERVER_FAILURE_THRESHOLD,
+                                                               LdapServerSelector.DEFAULT_FAILURE_THRESHOLD)
+            server_ejection_time = perun_configuration.get(self.PERUN_LDAP_SERVER_EJECTION_TIME,
+                                                           LdapServerSelector.DEFAULT_EJECTION_TIME)
+
+        # requested attribute name -> LDAP attribute, names not mapped are LDAP attributes
+        self.user_attributes = {name: ldap_attributes.get(name, name) for name in attributes or []}
+        self.memberships = memberships
+        self.attributes = self.USER_ATTRIBUTES + sorted(set(self.user_attributes.values())
+                                                        .difference(self.USER_ATTRIBUTES))
+        if memberships:
+            self.attributes.append(self.MEMBER_OF)
+        self._directory = {}
 
         if None in [hostnames, user, pasword, self.base]:
             raise Exception('One of required attributes is not defined!')
 
-        self.connector = LdapConnector(hostnames, user, pasword)
+        self.connector = LdapConnector(hostnames, user, pasword, pool_size=pool_size,
+                                       pool_idle_timeout=pool_idle_timeout, page_size=page_size,
+                                       slow_query_threshold=slow_query_threshold,
+                                       slow_query_sample_rate=slow_query_sample_rate,
+                                       personal_attributes=self.filter_builder.attributes +
+                                       sorted(set(self.user_attributes.values())),
+                                       server_selection=server_selection,
+                                       server_failure_threshold=server_failure_threshold,
+                                       server_ejection_time=server_ejection_time)
 
-    def get_perun_user(self, idp_entity_id, uids):
+        self.index_sync = None
+        if index_path is not None:
+            self.index_sync = self.create_index_sync(index_path, index_sync_interval, index_full_sync_interval)
 
-        ldap_query = ''
-        for uid in uids:
-            ldap_query += '(eduPersonPrincipalNames=' + uid + ')'
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        if self.use_index:
+            for index, uid in enumerate(uids):
+                user = self._from_index(uid, identifiers[index] if identifiers else None)
+                if user is not None:
+                    return user
 
-        if not ldap_query.strip():
+        ldap_filter = self.filter_builder.build(uids, identifiers)
+
+        if ldap_filter is None:
             return None
 
         response = self.connector.search_for_entity('ou=People,' + self.base,
-                                                    '(|' + ldap_query + ')',
-                                                    ['perunUserId', 'displayName', 'cn']
+                                                    ldap_filter,
+                                                    self.attributes
                                                     )
 
+        user = self.create_user(response)
+        if user is not None:
+            self.add_details([(user, response)])
+        return user
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Searches uids of all batches by OR filters of at most `bulk_filter_size` identifiers,
+        each read by a paged search, and matches the found entries back to the uids
+        by values of their identifier attributes.
+        """
+        users = {}
+        if self.use_index:
+            missing_batches = []
+            missing_identifiers = [] if identifier_batches else None
+            for index, uids in enumerate(uid_batches):
+                identifiers = identifier_batches[index] if identifier_batches else [None] * len(uids)
+                user = next(filter(None, (self._from_index(uid, identifier)
+                                          for uid, identifier in zip(uids, identifiers))), None)
+                if user is not None:
+                    users.update(dict.fromkeys(uids, user))
+                else:
+                    missing_batches.append(uids)
+                    if identifier_batches:
+                        missing_identifiers.append(identifiers)
+            uid_batches, identifier_batches = missing_batches, missing_identifiers
+
+        lookups = []
+        for index, uids in enumerate(uid_batches):
+            identifiers = identifier_batches[index] if identifier_batches else [None] * len(uids)
+            lookups += [(uid, identifier, self.filter_builder.get_attribute(identifier))
+                        for uid, identifier in zip(uids, identifiers)]
+
+        identifier_attributes = {attribute for _, _, attribute in lookups}
+        attributes = self.attributes + sorted(identifier_attributes.difference(self.attributes))
+
+        found = {}
+        entries = []
+        for start in range(0, len(lookups), self.bulk_filter_size):
+            chunk = lookups[start:start + self.bulk_filter_size]
+            ldap_filter = self.filter_builder.build([uid for uid, _, _ in chunk],
+                                                    [identifier for _, identifier, _ in chunk])
+            if ldap_filter is None:
+                continue
+
+            for entry in self.connector.search_paged('ou=People,' + self.base, ldap_filter, attributes):
+                user = self.create_user(entry)
+                entries.append((user, entry))
+                for attribute in identifier_attributes:
+                    for value in entry.get(attribute, []):
+                        found[(attribute, str(value).lower())] = user
+
+        self.add_details(entries)
+
+        position = 0
+        for uids in uid_batches:
+            batch = lookups[position:position + len(uids)]
+            position += len(uids)
+            for uid, _, attribute in batch:
+                user = found.get((attribute, str(uid).lower()))
+                if user is not None:
+                    users.update(dict.fromkeys(uids, user))
+                    break
+
+        return users
+
+    def warm_up(self):
+        self.connector.warm_up()
+
+    @property
+    def use_index(self):
+        return self.index_sync is not None and not self.user_attributes and not self.memberships \
+            and self.index_sync.ready
+
+    def create_index_sync(self, path, sync_interval=None, full_sync_interval=None):
+        """
+        Opens the identity index at `path` and starts its sync with the LDAP
+        """
+        from perun.micro_services.adapters.LdapIndexSync import LdapIndexSync
+        from perun.micro_services.cache.IdentityIndex import IdentityIndex
+
+        return LdapIndexSync(
+            self.connector, self.base, IdentityIndex(path), self.filter_builder.attributes,
+            sync_interval=sync_interval or LdapIndexSync.DEFAULT_SYNC_INTERVAL,
+            full_sync_interval=full_sync_interval or LdapIndexSync.DEFAULT_FULL_SYNC_INTERVAL
+        ).start()
+
+    def close(self):
+        if self.index_sync is not None:
+            self.index_sync.stop()
+        self.connector.close()
+
+    def add_details(self, entries):
+        """
+        Sets requested attributes and memberships of users read from their LDAP entries,
+        `entries` are pairs of user and entry.
+        """
+        if self.user_attributes:
+            for user, entry in entries:
+                user.attributes = {name: entry.get(attribute) for name, attribute in self.user_attributes.items()}
+
+        if not self.memberships:
+            return
+
+        memberships = [self.parse_member_of(entry.get(self.MEMBER_OF, [])) for _, entry in entries]
+        groups = self.get_groups({group_id for ids in memberships for group_id, _ in ids})
+        vos = self.get_vos({vo_id for ids in memberships for _, vo_id in ids})
+
+        for (user, _), ids in zip(entries, memberships):
+            user.groups = [groups[group_id] for group_id, _ in ids if group_id in groups]
+            user.vos = [vos[vo_id] for vo_id in sorted(set(vo_id for _, vo_id in ids)) if vo_id in vos]
+
+    def get_groups(self, ids):
+        return self._resolve('group', ids, 'perunGroup', 'perunGroupId', self.GROUP_ATTRIBUTES, lambda entry: Group(
+            entry['perunGroupId'][0], entry['perunVoId'][0], entry['cn'][0],
+            (entry.get('description') or [''])[0], entry['perunUniqueGroupName'][0]
+        ))
+
+    def get_vos(self, ids):
+        return self._resolve('vo', ids, 'perunVO', 'perunVoId', self.VO_ATTRIBUTES, lambda entry: Vo(
+            entry['perunVoId'][0], (entry.get('description') or [''])[0], entry['o'][0]
+        ))
+
+    @staticmethod
+    def parse_member_of(dns):
+        """
+        Returns (group id, VO id) pairs of group DNs `perunGroupId=..,perunVoId=..,base`
+        """
+        memberships = []
+        for dn in dns:
+            rdns = dict(str.split(rdn, '=', 1) for rdn in str.split(dn, ',')[:2] if '=' in rdn)
+            if 'perunGroupId' in rdns and 'perunVoId' in rdns:
+                memberships.append((rdns['perunGroupId'], rdns['perunVoId']))
+        return memberships
+
+    def _from_index(self, uid, identifier):
+        if uid is None or not str(uid).strip():
+            return None
+        return self.index_sync.index.get(self.filter_builder.get_attribute(identifier), uid)
+
+    def _resolve(self, kind, ids, object_class, id_attribute, attributes, create):
+        """
+        Returns dict of `ids` and objects made by `create` from their entries,
+        searches only the ids not found in the directory or expired.
+        """
+        now = time.monotonic()
+        resolved = {}
+        missing = []
+        for id in ids:
+            item = self._directory.get((kind, id))
+            if item is not None and item[0] > now:
+                resolved[id] = item[1]
+            else:
+                missing.append(id)
+
+        missing.sort()
+        for start in range(0, len(missing), self.bulk_filter_size):
+            chunk = missing[start:start + self.bulk_filter_size]
+            values = ''.join(f'({id_attribute}={escape_filter_chars(id)})' for id in chunk)
+            ldap_filter = f'(&(objectClass={object_class})(|{values}))'
+            for entry in self.connector.search(self.base, ldap_filter, attributes):
+                obj = create(entry)
+                self._directory[(kind, str(obj.id))] = (now + self.groups_cache_ttl, obj)
+                resolved[str(obj.id)] = obj
+
+        return resolved
+
+    @staticmethod
+    def create_filter_builder(perun_configuration):
+        return LdapFilterBuilder(
+            perun_configuration.get(LdapAdapter.PERUN_LDAP_IDENTIFIER_ATTRIBUTES, None),
+            perun_configuration.get(LdapAdapter.PERUN_LDAP_DEFAULT_IDENTIFIER_ATTRIBUTE,
+                                    LdapFilterBuilder.DEFAULT_ATTRIBUTE)
+        )
+
+    @staticmethod
+    def create_user(response):
         if response is None:
             return None
 
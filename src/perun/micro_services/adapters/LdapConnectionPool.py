@@ -0,0 +1,172 @@
+"""
+Pool of bound LDAP connections
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+class LdapConnectionPool:
+    """
+    Bounded, thread-safe pool of already bound LDAP connections.
+
+    Connections are created lazily by `factory` and handed out LIFO, so the
+    most recently used (and most likely still alive) connection is reused first.
+    Connections idle for longer than `idle_timeout` seconds are evicted and
+    connections idle for longer than `health_check_interval` seconds are probed
+    before they are handed out.
+
+    `acquire` waits for a free connection at most `acquire_timeout` seconds
+    and raises PoolExhaustedError, or DeadlineExceeded when the current
+    Deadline ends the wait earlier.
+    """
+
+    DEFAULT_MAX_SIZE = 10
+    DEFAULT_IDLE_TIMEOUT = 300
+    DEFAULT_HEALTH_CHECK_INTERVAL = 30
+    DEFAULT_ACQUIRE_TIMEOUT = 5
+
+    def __init__(self, factory, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        if max_size < 1:
+            raise ValueError('LdapConnectionPool - max_size must be a positive number.')
+
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self):
+        timeout = Deadline.timeout(self.acquire_timeout)
+        deadline = time.monotonic() + timeout
+        while True:
+            stale = []
+            conn = None
+            with self._condition:
+                while conn is None:
+                    now = time.monotonic()
+                    while self._idle:
+                        candidate, last_used = self._idle.pop()
+                        if now - last_used > self.idle_timeout:
+                            stale.append(candidate)
+                            self._size -= 1
+                            continue
+                        conn = candidate
+                        break
+
+                    if conn is not None:
+                        break
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        if timeout < self.acquire_timeout:
+                            raise DeadlineExceeded('LdapConnectionPool.acquire - time budget is spent '
+                                                   'waiting for a free LDAP connection.')
+                        raise PoolExhaustedError('LdapConnectionPool.acquire - No free LDAP connection available.')
+                    self._condition.wait(remaining)
+
+            for candidate in stale:
+                self._close(candidate)
+
+            if conn is None:
+                try:
+                    return self.factory()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if self._is_healthy(conn, now - last_used):
+                return conn
+
+            self._close(conn)
+            self._forget()
+
+    def release(self, conn, discard=False):
+        # connections returned after close are closed too
+        if discard or conn.closed or self._closed:
+            self._close(conn)
+            self._forget()
+            return
+
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            discard = True
+            raise
+        finally:
+            # also reached when a generator holding the connection is closed early
+            self.release(conn, discard=discard)
+
+    def close(self):
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._closed = True
+            self._condition.notify_all()
+
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _is_healthy(self, conn, idle_time):
+        if conn.closed or not conn.bound:
+            return False
+
+        if idle_time < self.health_check_interval:
+            return True
+
+        try:
+            return conn.extend.standard.who_am_i() is not None
+        except Exception as ex:
+            logger.debug(f'LdapConnectionPool - health check failed: {ex}')
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.unbind()
+        except Exception as ex:
+            logger.debug(f'LdapConnectionPool - unable to unbind connection: {ex}')
@@ -4,21 +4,62 @@ Ldap Connector
 __author__ = "Pavel Vyskocil"
 __email__ = "Pavel.Vyskocil@cesnet.cz"
 
-import json
+import functools
 import logging
-from ..utils import milli_time
+import math
+import time
+from ..metrics.Metrics import Metrics
+from .Deadline import Deadline
+from .LdapConnectionPool import LdapConnectionPool
+from .LdapServerSelector import LdapServerSelector
+from .RequestLogger import RequestLogger
 
-from ldap3 import Server, Connection, ServerPool, FIRST
+from ldap3 import Server, Connection
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPResponseTimeoutError
 
 logger = logging.getLogger(__name__)
 
 
 class LdapConnector:
-
-    def __init__(self, hostnames, user, password):
+    """
+    Searches Perun LDAP on the host of `hostnames` picked by LdapServerSelector
+    for each request, with a pool of bound connections per host.
+    """
+
+    PAGED_RESULTS_CONTROL = '1.2.840.113556.1.4.319'
+    DEFAULT_PAGE_SIZE = 500
+
+    def __init__(self, hostnames, user, password, pool_size=LdapConnectionPool.DEFAULT_MAX_SIZE,
+                 pool_idle_timeout=LdapConnectionPool.DEFAULT_IDLE_TIMEOUT, page_size=DEFAULT_PAGE_SIZE,
+                 slow_query_threshold=None, slow_query_sample_rate=1.0, personal_attributes=(),
+                 server_selection=LdapServerSelector.DEFAULT_STRATEGY,
+                 server_failure_threshold=LdapServerSelector.DEFAULT_FAILURE_THRESHOLD,
+                 server_ejection_time=LdapServerSelector.DEFAULT_EJECTION_TIME):
         self.hostnames = hostnames
         self.user = user
         self.password = password
+        self.page_size = page_size
+
+        self.servers = {hostname: Server(hostname) for hostname in self.hostnames}
+        self.pools = {
+            hostname: LdapConnectionPool(functools.partial(self.create_connection, hostname), max_size=pool_size,
+                                         idle_timeout=pool_idle_timeout)
+            for hostname in self.hostnames
+        }
+        self.selector = LdapServerSelector(self.hostnames, server_selection, probe=self.probe,
+                                           failure_threshold=server_failure_threshold,
+                                           ejection_time=server_ejection_time)
+        self.request_logger = RequestLogger(logger, 'ldap', slow_query_threshold, slow_query_sample_rate,
+                                            personal_attributes)
+
+        self.request_seconds = Metrics.backend_request_seconds()
+        self.errors = Metrics.backend_errors()
+        pool_connections = Metrics.pool_connections()
+        pool_connections.set_function(lambda: sum(pool.idle for pool in self.pools.values()), ('ldap', 'idle'))
+        pool_connections.set_function(lambda: sum(pool.size - pool.idle for pool in self.pools.values()),
+                                      ('ldap', 'in_use'))
+        ejected_servers = Metrics.ldap_ejected_servers()
+        ejected_servers.set_function(lambda: sum(server.ejected for server in self.selector.servers))
 
     def search_for_entity(self, base, filter, attributes=None):
 
@@ -42,43 +83,133 @@ class LdapConnector:
 
         return entries
 
+    def warm_up(self):
+        """
+        Opens and binds a pooled connection to every host, which are otherwise opened by the first searches.
+        """
+        for pool in self.pools.values():
+            with pool.connection():
+                pass
+
+    def probe(self, hostname):
+        """
+        Opens and binds a new connection to the ejected `hostname`, raises an exception when it fails
+        """
+        # not released to the pool, which did not count it
+        self.pools[hostname].factory().unbind()
+
     def search(self, base, filter, attributes=None):
         if attributes is None:
             attributes = []
 
-        server_pool = ServerPool(None, FIRST)
-
-        for hostname in self.hostnames:
-            server = Server(hostname)
-            server_pool.add(server)
-
-        conn = Connection(server_pool, user=self.user, password=self.password)
+        hostname = self.selector.select()
+        try:
+            return self._search(hostname, base, filter, attributes)
+        except LDAPCommunicationError as ex:
+            logger.warning(f'LdapConnector.search - connection to the Perun LDAP {hostname} failed ({ex}), '
+                           f'reconnecting.')
+            return self._search(self.selector.select(exclude=hostname), base, filter, attributes)
+
+    def search_paged(self, base, filter, attributes=None, page_size=None, size_limit=0, time_limit=0):
+        """
+        Generator of simplified entries fetched page by page with the simple paged results control,
+        so only one page is held in memory at a time. The pooled connection stays reserved
+        until the generator is exhausted or closed.
+        """
+        if attributes is None:
+            attributes = []
+        if page_size is None:
+            page_size = self.page_size
+
+        hostname = self.selector.select()
+        with self.selector.request(hostname, timed=False), self.pools[hostname].connection() as conn:
+            cookie = None
+            pages = 0
+            elapsed = 0
+            while True:
+                elapsed += self._timed_search(
+                    conn, 'search_paged', base, filter, attributes=attributes, paged_size=page_size,
+                    paged_cookie=cookie, size_limit=size_limit, time_limit=time_limit
+                )
+                pages += 1
+
+                yield from self.iter_simplified_entries(conn.response or [])
+
+                control = conn.result.get('controls', {}).get(self.PAGED_RESULTS_CONTROL, {})
+                cookie = control.get('value', {}).get('cookie')
+                if not cookie:
+                    break
+
+        self.request_logger.log('search_paged', elapsed, {'base': base, 'filter': filter, 'pages': pages})
+
+    def create_connection(self, hostname):
+        conn = Connection(self.servers[hostname], user=self.user, password=self.password)
         conn.open()
 
         if conn.bind() is False:
-            raise Exception(f'Unable to bind user to the Perun LDAP {repr(server_pool.get_current_server(conn))}.')
-
-        start_time = milli_time()
-        conn.search(base, filter, attributes=attributes)
-        end_time = milli_time()
-
-        response = self.get_simplified_entries(conn.entries)
-        response_time = end_time - start_time
-        logger.debug(
-            f'LdapConnector.search - search query proceeded in {response_time} ms. '
-            f'Query base: {base}, filter: {filter}, response: {response}.'
-        )
-        conn.unbind()
+            raise Exception(f'Unable to bind user to the Perun LDAP {repr(self.servers[hostname])}.')
+
+        return conn
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    def _search(self, hostname, base, filter, attributes):
+        with self.selector.request(hostname), self.pools[hostname].connection() as conn:
+            elapsed = self._timed_search(conn, 'search', base, filter, attributes=attributes)
+
+            response = self.get_simplified_entries(conn.response or [])
+
+        self.request_logger.log('search', elapsed, {'base': base, 'filter': filter}, response)
         return response
 
+    def _timed_search(self, conn, method, base, filter, **kwargs):
+        """
+        Runs the search and records its duration and failure,
+        returns the response time in seconds.
+        """
+        labels = ('ldap', method)
+        timeout = Deadline.timeout()
+        if timeout is not None:
+            # the server stops searching in whole seconds, the socket waits for the rest of the budget
+            time_limit = max(1, math.ceil(timeout))
+            kwargs['time_limit'] = min(kwargs.get('time_limit') or time_limit, time_limit)
+            if conn.socket is not None:
+                conn.socket.settimeout(timeout)
+
+        start_time = time.perf_counter()
+        try:
+            conn.search(base, filter, **kwargs)
+        except Exception as ex:
+            kind = Metrics.TIMEOUT if isinstance(ex, LDAPResponseTimeoutError) else Metrics.ERROR
+            self.errors.inc(labels + (kind,))
+            self.request_logger.log(method, time.perf_counter() - start_time, {'base': base, 'filter': filter},
+                                    error=ex)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.request_seconds.observe(elapsed, labels)
+            if timeout is not None and conn.socket is not None:
+                conn.socket.settimeout(conn.receive_timeout)
+
+        return elapsed
+
+    @staticmethod
+    def get_simplified_entries(response):
+        return list(LdapConnector.iter_simplified_entries(response))
+
     @staticmethod
-    def get_simplified_entries(entries):
-        data = []
-        for entry in entries:
-            entry_dict = json.loads(entry.entry_to_json())['attributes']
-            x = {}
-            for key in entry_dict.keys():
-                x.update({key: entry_dict[key]})
-
-            data.append(x)
-        return data
+    def iter_simplified_entries(response):
+        """
+        Converts raw ldap3 search response to dicts of attribute name and list of values,
+        without building ldap3 Entry objects.
+        """
+        for entry in response:
+            if entry.get('type') != 'searchResEntry':
+                continue
+
+            yield {
+                key: value if isinstance(value, list) else [value]
+                for key, value in entry['attributes'].items()
+            }
@@ -0,0 +1,98 @@
+"""
+Builder of LDAP filters searching users by their identifiers
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import re
+
+from ldap3.utils.conv import escape_filter_chars
+
+
+class LdapFilterBuilder:
+    """
+    Builds a single equality filter matching any of the user identifiers.
+
+    Every identifier is searched in the LDAP attribute configured for the
+    identifier attribute it was released in, identifiers without configured
+    attribute in `default_attribute`. Values are escaped according to RFC 4515
+    and duplicate clauses are dropped. One identifier results in a plain
+    `(attribute=value)` filter, more of them in one flat `(|...)`.
+
+    Filter templates are cached per combination of attributes, so building
+    a filter only escapes the values and fills them into a ready template.
+    """
+
+    DEFAULT_ATTRIBUTE = 'eduPersonPrincipalNames'
+    TEMPLATE_CACHE_SIZE = 256
+    SPECIAL_CHARACTERS = re.compile('[\\\\*()\x00]')
+
+    def __init__(self, identifier_attributes=None, default_attribute=DEFAULT_ATTRIBUTE):
+        self.identifier_attributes = {
+            str.lower(identifier): attribute for identifier, attribute in (identifier_attributes or {}).items()
+        }
+        self.default_attribute = default_attribute
+
+        self._templates = {}
+
+    def build(self, uids, identifiers=None):
+        """
+        Returns filter matching any of `uids`, None when there is nothing to search for.
+        `identifiers` are names of the identifier attributes `uids` were released in.
+        """
+        attributes = []
+        values = []
+        clauses = set()
+
+        for index, uid in enumerate(uids):
+            if uid is None or not str(uid).strip():
+                continue
+
+            attribute = self.get_attribute(identifiers[index] if identifiers else None)
+            value = self.escape(str(uid))
+            if (attribute, value) in clauses:
+                continue
+
+            clauses.add((attribute, value))
+            attributes.append(attribute)
+            values.append(value)
+
+        if not values:
+            return None
+
+        return self.get_template(tuple(attributes)).format(*values)
+
+    @property
+    def attributes(self):
+        """
+        LDAP attributes identifiers are searched in, the default one first
+        """
+        attributes = [self.default_attribute]
+        for attribute in self.identifier_attributes.values():
+            if attribute not in attributes:
+                attributes.append(attribute)
+        return attributes
+
+    def get_attribute(self, identifier):
+        if identifier is None:
+            return self.default_attribute
+        return self.identifier_attributes.get(str.lower(identifier), self.default_attribute)
+
+    def get_template(self, attributes):
+        template = self._templates.get(attributes)
+        if template is None:
+            if len(self._templates) >= self.TEMPLATE_CACHE_SIZE:
+                self._templates.clear()
+
+            template = ''.join(f'({attribute}={{}})' for attribute in attributes)
+            if len(attributes) > 1:
+                template = f'(|{template})'
+            self._templates[attributes] = template
+
+        return template
+
+    @staticmethod
+    def escape(value):
+        if LdapFilterBuilder.SPECIAL_CHARACTERS.search(value) is None:
+            return value
+        return escape_filter_chars(value)
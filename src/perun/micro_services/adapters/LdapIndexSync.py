@@ -0,0 +1,165 @@
+"""
+Synchronization of an IdentityIndex with Perun LDAP
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import datetime
+import logging
+import threading
+import time
+
+from ldap3.utils.conv import escape_filter_chars
+from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class LdapIndexSync:
+    """
+    Keeps `index` (IdentityIndex) of identifier `attributes` of Perun users
+    in sync with the Perun LDAP `connector` is connected to.
+
+    The index is filled by a full paged dump of `ou=People` under `base`,
+    repeated every `full_sync_interval` seconds, which also drops deleted
+    users. In between, users modified since the last sync are read every
+    `sync_interval` seconds by polling their modifyTimestamp. Processes
+    sharing the index claim syncs through it, so only one of them syncs
+    per interval.
+    """
+
+    USERS_FILTER = '(objectClass=perunUser)'
+    MODIFY_TIMESTAMP = 'modifyTimestamp'
+    SYNC_CLAIM = 'sync_claimed_at'
+    FULL_SYNC_AT = 'full_sync_at'
+    SYNCED_AT = 'synced_at'
+    LAST_MODIFIED = 'last_modified'
+    DEFAULT_SYNC_INTERVAL = 300
+    DEFAULT_FULL_SYNC_INTERVAL = 86400
+
+    def __init__(self, connector, base, index, attributes, sync_interval=DEFAULT_SYNC_INTERVAL,
+                 full_sync_interval=DEFAULT_FULL_SYNC_INTERVAL):
+        self.connector = connector
+        self.base = base
+        self.index = index
+        self.attributes = attributes
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+
+        self._ready = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        """
+        Whether the index holds a full dump, possibly written by another process
+        """
+        if not self._ready:
+            self._ready = self.index.get_meta(self.FULL_SYNC_AT) is not None
+        return self._ready
+
+    def sync(self, full=False):
+        """
+        Runs a full or incremental sync, when it is due and not claimed by another process.
+        Returns the number of written users, or None when nothing was synced.
+        """
+        now = time.time()
+        if not self.index.claim(self.SYNC_CLAIM, now, 0 if full else self.sync_interval / 2):
+            return None
+
+        full_sync_at = self.index.get_meta(self.FULL_SYNC_AT)
+        last_modified = self.index.get_meta(self.LAST_MODIFIED)
+        if full or full_sync_at is None or last_modified is None or now - full_sync_at >= self.full_sync_interval:
+            return self.sync_full(now)
+        return self.sync_modified(last_modified, now)
+
+    def sync_full(self, now=None):
+        now = time.time() if now is None else now
+        entries = self.connector.search_paged('ou=People,' + self.base, self.USERS_FILTER, self._search_attributes())
+        last_modified = []
+        count = self.index.replace(self._users(entries, last_modified))
+
+        self.index.set_meta(self.LAST_MODIFIED, max(last_modified, default=self.format_timestamp(now)))
+        self.index.set_meta(self.FULL_SYNC_AT, now)
+        self.index.set_meta(self.SYNCED_AT, now)
+        logger.info(f'LdapIndexSync - indexed {count} users.')
+        return count
+
+    def sync_modified(self, since, now=None):
+        now = time.time() if now is None else now
+        ldap_filter = f'(&{self.USERS_FILTER}({self.MODIFY_TIMESTAMP}>={escape_filter_chars(since)}))'
+        entries = self.connector.search_paged('ou=People,' + self.base, ldap_filter, self._search_attributes())
+        last_modified = []
+        count = self.index.update(self._users(entries, last_modified))
+
+        self.index.set_meta(self.LAST_MODIFIED, max(last_modified, default=since))
+        self.index.set_meta(self.SYNCED_AT, now)
+        logger.debug(f'LdapIndexSync - updated {count} users modified since {since}.')
+        return count
+
+    def start(self):
+        """
+        Syncs the index in a background thread, the first sync right away
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='perun-index-sync', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def format_timestamp(value):
+        """
+        Returns modifyTimestamp `value` (datetime, string or epoch seconds) as LDAP generalized time
+        """
+        if isinstance(value, (int, float)):
+            value = datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+        if isinstance(value, datetime.datetime):
+            return value.astimezone(datetime.timezone.utc).strftime('%Y%m%d%H%M%SZ')
+        return str(value)
+
+    def _search_attributes(self):
+        attributes = [attribute for attribute in self.attributes if attribute not in LdapAdapter.USER_ATTRIBUTES]
+        return LdapAdapter.USER_ATTRIBUTES + attributes + [self.MODIFY_TIMESTAMP]
+
+    def _users(self, entries, last_modified):
+        """
+        Generator of users and their identifiers of LDAP `entries`, appends
+        the latest modifyTimestamp of the entries to `last_modified`
+        """
+        latest = None
+        for entry in entries:
+            if not entry.get('perunUserId'):
+                continue
+
+            for value in entry.get(self.MODIFY_TIMESTAMP, []):
+                value = self.format_timestamp(value)
+                if latest is None or value > latest:
+                    latest = value
+
+            user = LdapAdapter.create_user({
+                'perunUserId': entry['perunUserId'],
+                'displayName': entry.get('displayName') or [''],
+                'cn': entry.get('cn') or [''],
+            })
+            identifiers = [(attribute, value) for attribute in self.attributes for value in entry.get(attribute, [])]
+            yield user, identifiers
+
+        if latest is not None:
+            last_modified.append(latest)
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as ex:
+                logger.warning(f'LdapIndexSync - sync of the identity index failed: {ex}')
+
+            if self._stopped.wait(self.sync_interval):
+                break
@@ -0,0 +1,209 @@
+"""
+Health-scored selection among the replicas of Perun LDAP
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
+from perun.micro_services.adapters.LdapConnectionPool import PoolExhaustedError
+
+logger = logging.getLogger(__name__)
+
+
+class LdapServer:
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.ewma = None
+        self.last_used = 0
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = None
+        self.ejections = 0
+        self.probing = False
+
+    @property
+    def ejected(self):
+        return self.ejected_until is not None
+
+
+class LdapServerSelector:
+    """
+    Picks the host of `hostnames` for each LDAP request.
+
+    Strategies:
+      - first: the first listed host, which is not ejected
+      - round_robin: hosts which are not ejected in turn
+      - least_outstanding: the host with the lowest EWMA latency weighted by
+        its requests in flight, so slow or busy replicas get less traffic
+
+    The latency EWMA of a host idle for `decay_time` seconds halves, so
+    a host which was slow once is tried again. A host failing
+    `failure_threshold` requests in a row is ejected for `ejection_time`
+    seconds, after which a background probe (the `probe` callable called with
+    the hostname) decides whether it takes requests again. Every failed
+    probe doubles the ejection time up to MAX_EJECTION_TIME. When all hosts
+    are ejected, the one ejected for the shortest time is used anyway.
+    """
+
+    FIRST = 'first'
+    ROUND_ROBIN = 'round_robin'
+    LEAST_OUTSTANDING = 'least_outstanding'
+    STRATEGIES = [FIRST, ROUND_ROBIN, LEAST_OUTSTANDING]
+
+    DEFAULT_STRATEGY = LEAST_OUTSTANDING
+    DEFAULT_FAILURE_THRESHOLD = 3
+    DEFAULT_EJECTION_TIME = 30
+    DEFAULT_DECAY_TIME = 60
+    MAX_EJECTION_TIME = 300
+    EWMA_WEIGHT = 0.3
+
+    def __init__(self, hostnames, strategy=DEFAULT_STRATEGY, probe=None, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 ejection_time=DEFAULT_EJECTION_TIME, decay_time=DEFAULT_DECAY_TIME):
+        if not hostnames:
+            raise ValueError('LdapServerSelector - no hostnames given.')
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'LdapServerSelector - unknown strategy "{strategy}", '
+                             f'available: {", ".join(self.STRATEGIES)}.')
+
+        self.servers = [LdapServer(hostname) for hostname in hostnames]
+        self.strategy = strategy
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.decay_time = decay_time
+
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def get(self, hostname):
+        return next(server for server in self.servers if server.hostname == hostname)
+
+    def select(self, exclude=None):
+        """
+        Returns the hostname for the next request, another host than `exclude` when possible
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = []
+            for server in self.servers:
+                if server.ejected and server.ejected_until <= now and not server.probing:
+                    self._start_probe(server)
+                if not server.ejected:
+                    available.append(server)
+
+            candidates = [server for server in available if server.hostname != exclude] or available
+            if not candidates:
+                return min(self.servers, key=lambda server: server.ejected_until).hostname
+
+            if self.strategy == self.FIRST or len(candidates) == 1:
+                return candidates[0].hostname
+
+            if self.strategy == self.ROUND_ROBIN:
+                self._next += 1
+                return candidates[self._next % len(candidates)].hostname
+
+            return min(candidates, key=lambda server: self._score(server, now)).hostname
+
+    @contextmanager
+    def request(self, hostname, timed=True):
+        """
+        Tracks the request to `hostname` run in the block and its failure, and
+        its latency when `timed` (paged searches take long by nature)
+        """
+        server = self.get(hostname)
+        with self._lock:
+            server.outstanding += 1
+
+        start_time = time.monotonic()
+        # not counted unless the block completes or fails, e.g. when a paged search is closed early
+        failed = None
+        try:
+            yield
+            failed = False
+        except (DeadlineExceeded, PoolExhaustedError):
+            # the request was not sent, the host did not fail
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.monotonic() - start_time if timed and failed is not None else None
+            self._finish(server, elapsed, failed)
+
+    def _score(self, server, now):
+        if server.ewma is None:
+            # hosts without any measurement are tried first
+            return 0
+        return self._decayed_ewma(server, now) * (server.outstanding + 1)
+
+    def _decayed_ewma(self, server, now):
+        return server.ewma * 0.5 ** (max(0, now - server.last_used) / self.decay_time)
+
+    def _update_ewma(self, server, elapsed, now):
+        if server.ewma is None:
+            server.ewma = elapsed
+        else:
+            ewma = self._decayed_ewma(server, now)
+            server.ewma = ewma + self.EWMA_WEIGHT * (elapsed - ewma)
+        server.last_used = now
+
+    def _finish(self, server, elapsed, failed):
+        now = time.monotonic()
+        with self._lock:
+            server.outstanding -= 1
+            if elapsed is not None:
+                self._update_ewma(server, elapsed, now)
+            if failed is None:
+                return
+
+            if not failed:
+                server.failures = 0
+                return
+
+            server.failures += 1
+            if not server.ejected and server.failures >= self.failure_threshold and len(self.servers) > 1:
+                self._eject(server, now)
+
+    def _eject(self, server, now):
+        ejection_time = min(self.ejection_time * 2 ** server.ejections, self.MAX_EJECTION_TIME)
+        server.ejected_until = now + ejection_time
+        server.ejections += 1
+        logger.warning(f'LdapServerSelector - ejecting {server.hostname} for {ejection_time} seconds '
+                       f'after {server.failures} consecutive failures.')
+
+    def _start_probe(self, server):
+        server.probing = True
+        if self.probe is None:
+            self._reinstate(server, None)
+            return
+
+        threading.Thread(target=self._run_probe, args=(server,), name='perun-ldap-probe', daemon=True).start()
+
+    def _run_probe(self, server):
+        start_time = time.monotonic()
+        try:
+            self.probe(server.hostname)
+        except Exception as ex:
+            with self._lock:
+                server.probing = False
+                self._eject(server, time.monotonic())
+            logger.debug(f'LdapServerSelector - probe of {server.hostname} failed: {ex}')
+            return
+
+        with self._lock:
+            self._reinstate(server, time.monotonic() - start_time)
+
+    def _reinstate(self, server, elapsed):
+        logger.info(f'LdapServerSelector - {server.hostname} takes requests again.')
+        server.probing = False
+        server.ejected_until = None
+        server.ejections = 0
+        server.failures = 0
+        server.ewma = elapsed
+        server.last_used = time.monotonic()
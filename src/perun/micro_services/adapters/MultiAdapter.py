@@ -0,0 +1,237 @@
+"""
+PerunAdapter combining several Perun interfaces
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import yaml
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+from perun.micro_services.adapters.PerunAdapter import PerunAdapter
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class MultiAdapter(PerunAdapterAbstract):
+    """
+    Asks adapters of the configured interfaces in order.
+
+    In `fallback` mode the next adapter is asked when the previous one
+    did not find the user or failed. In `hedge` mode the other adapters are
+    also asked when the first one did not answer within the configured
+    percentile of its recent response times, and the first user found by
+    any of them is returned.
+    """
+
+    PERUN_MULTI_INTERFACES = 'multi.interfaces'
+    PERUN_MULTI_MODE = 'multi.mode'
+    PERUN_MULTI_HEDGE_PERCENTILE = 'multi.hedge_percentile'
+    PERUN_MULTI_HEDGE_MIN_DELAY = 'multi.hedge_min_delay'
+    PERUN_MULTI_HEDGE_WORKERS = 'multi.hedge_workers'
+
+    FALLBACK = 'fallback'
+    HEDGE = 'hedge'
+
+    DEFAULT_INTERFACES = [PerunAdapterAbstract.LDAP, PerunAdapterAbstract.RPC]
+    DEFAULT_HEDGE_PERCENTILE = 95
+    DEFAULT_HEDGE_MIN_DELAY = 0.05
+    DEFAULT_HEDGE_WORKERS = 32
+    LATENCY_WINDOW = 100
+
+    def __init__(self, config_file, attributes=None, memberships=False):
+        with open(config_file, "r") as f:
+            perun_configuration = yaml.safe_load(f)
+            interfaces = perun_configuration.get(self.PERUN_MULTI_INTERFACES, self.DEFAULT_INTERFACES)
+            self.mode = perun_configuration.get(self.PERUN_MULTI_MODE, self.FALLBACK)
+            self.hedge_percentile = perun_configuration.get(self.PERUN_MULTI_HEDGE_PERCENTILE,
+                                                            self.DEFAULT_HEDGE_PERCENTILE)
+            self.hedge_min_delay = perun_configuration.get(self.PERUN_MULTI_HEDGE_MIN_DELAY,
+                                                           self.DEFAULT_HEDGE_MIN_DELAY)
+            hedge_workers = perun_configuration.get(self.PERUN_MULTI_HEDGE_WORKERS, self.DEFAULT_HEDGE_WORKERS)
+
+        if self.mode not in [self.FALLBACK, self.HEDGE]:
+            raise Exception(f'MultiAdapter: Unknown mode "{self.mode}".')
+
+        if not interfaces or self.MULTI in interfaces:
+            raise Exception('MultiAdapter: Option "multi.interfaces" must list ldap and/or rpc interfaces.')
+
+        self.adapters = [PerunAdapter.get_instance(config_file, interface, attributes, memberships)
+                         for interface in interfaces]
+        self.latencies = [deque(maxlen=self.LATENCY_WINDOW) for _ in self.adapters]
+        self._latencies_lock = threading.Lock()
+        # hedges only, the first adapter is asked on the calling thread
+        self.executor = ThreadPoolExecutor(hedge_workers, 'perun-multi')
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        if self.mode == self.HEDGE:
+            return self.get_perun_user_hedged(idp_entity_id, uids, identifiers)
+
+        failures = 0
+        for adapter in self.adapters:
+            try:
+                user = adapter.get_perun_user(idp_entity_id, uids, identifiers)
+            except DeadlineExceeded:
+                raise
+            except Exception as ex:
+                logger.warning(f'MultiAdapter - {type(adapter).__name__} failed: {ex}')
+                failures += 1
+                continue
+
+            if user is not None:
+                return user
+
+        if failures == len(self.adapters):
+            raise Exception('MultiAdapter - lookup failed in all interfaces.')
+        return None
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Asks adapters in order (also in `hedge` mode), each of them only for
+        the batches not resolved by the previous ones.
+        """
+        users = {}
+        pending = list(range(len(uid_batches)))
+        failures = 0
+
+        for adapter in self.adapters:
+            try:
+                found = adapter.get_perun_users(
+                    idp_entity_id,
+                    [uid_batches[index] for index in pending],
+                    [identifier_batches[index] for index in pending] if identifier_batches else None
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as ex:
+                logger.warning(f'MultiAdapter - {type(adapter).__name__} bulk lookup failed: {ex}')
+                failures += 1
+                continue
+
+            users.update(found)
+            pending = [index for index in pending if not any(uid in found for uid in uid_batches[index])]
+            if not pending:
+                break
+
+        if failures == len(self.adapters):
+            raise Exception('MultiAdapter - bulk lookup failed in all interfaces.')
+        return users
+
+    @property
+    def queries_per_uid(self):
+        return self.adapters[0].queries_per_uid
+
+    def warm_up(self):
+        for adapter in self.adapters:
+            try:
+                adapter.warm_up()
+            except Exception as ex:
+                logger.warning(f'MultiAdapter - warm-up of {type(adapter).__name__} failed: {ex}')
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for adapter in self.adapters:
+            try:
+                adapter.close()
+            except Exception as ex:
+                logger.warning(f'MultiAdapter - unable to close {type(adapter).__name__}: {ex}')
+
+    def get_perun_user_hedged(self, idp_entity_id, uids, identifiers=None):
+        """
+        Asks the first adapter on `executor` and waits for it within the hedge delay. The other
+        adapters are then asked in order by one hedge, which starts once the first adapter
+        is slower than usual, or right away when it did not find the user. The first user
+        found by either of them is returned.
+        """
+        settled = threading.Event()
+        primary = Deadline.submit(self.executor, self._timed_call, 0, idp_entity_id, uids, identifiers)
+        delay = self.get_hedge_delay(0)
+        try:
+            user = primary.result(Deadline.timeout(delay))
+            if user is not None:
+                return user
+        except FutureTimeoutError:
+            logger.debug(f'MultiAdapter - hedging {type(self.adapters[0]).__name__} after {delay * 1000:.0f} ms.')
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            # reported below with the other failures
+            pass
+
+        hedge = Deadline.submit(self.executor, self._run_hedge, settled, idp_entity_id, uids, identifiers)
+        pending = {primary, hedge}
+        failures = 0
+        try:
+            while pending:
+                done, pending = wait(pending, Deadline.timeout(), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded('MultiAdapter - time budget is spent.')
+
+                for future in done:
+                    if future is primary:
+                        try:
+                            user = future.result()
+                        except DeadlineExceeded:
+                            raise
+                        except Exception as ex:
+                            logger.warning(f'MultiAdapter - {type(self.adapters[0]).__name__} failed: {ex}')
+                            user = None
+                            failures += 1
+                    else:
+                        user, hedge_failures = future.result()
+                        failures += hedge_failures
+
+                    if user is not None:
+                        return user
+        finally:
+            # the hedge stops before asking another adapter
+            settled.set()
+
+        if failures == len(self.adapters):
+            raise Exception('MultiAdapter - lookup failed in all interfaces.')
+        return None
+
+    def get_hedge_delay(self, index):
+        with self._latencies_lock:
+            latencies = sorted(self.latencies[index])
+
+        if not latencies:
+            return self.hedge_min_delay
+
+        position = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, latencies[position])
+
+    def _timed_call(self, index, idp_entity_id, uids, identifiers):
+        start_time = time.monotonic()
+        try:
+            return self.adapters[index].get_perun_user(idp_entity_id, uids, identifiers)
+        finally:
+            with self._latencies_lock:
+                self.latencies[index].append(time.monotonic() - start_time)
+
+    def _run_hedge(self, settled, idp_entity_id, uids, identifiers):
+        """
+        Asks the adapters after the first one in order, unless a user was found meanwhile.
+        Returns the found user (or None) and the number of failed adapters.
+        """
+        failures = 0
+        for index in range(1, len(self.adapters)):
+            if settled.is_set():
+                break
+            try:
+                user = self._timed_call(index, idp_entity_id, uids, identifiers)
+            except Exception as ex:
+                logger.warning(f'MultiAdapter - {type(self.adapters[index]).__name__} failed: {ex}')
+                failures += 1
+                continue
+
+            if user is not None:
+                return user, failures
+
+        return None, failures
@@ -4,17 +4,52 @@ Class PerunAdapter
 __author__ = "Pavel Vyskocil"
 __email__ = "Pavel.Vyskocil@cesnet.cz"
 
-from perun.micro_services.adapters.LdapAdapter import LdapAdapter
 from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
-from perun.micro_services.adapters.RpcAdapter import RpcAdapter
 
 
 class PerunAdapter:
+    """
+    Creates adapters of Perun interfaces. Modules of an interface are imported
+    when its adapter is created, so only the client library of the configured
+    interface (ldap3, pycurl) is loaded.
+
+    Adapters read user `attributes` and with `memberships` VOs and groups
+    of found users along with them.
+    """
 
     @staticmethod
-    def get_instance(config_file_path, interface=PerunAdapterAbstract.RPC):
+    def get_instance(config_file_path, interface=PerunAdapterAbstract.RPC, attributes=None, memberships=False):
         if interface == PerunAdapterAbstract.LDAP:
-            adapter = LdapAdapter(config_file_path)
+            from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+            adapter = LdapAdapter(config_file_path, attributes, memberships)
+        elif interface == PerunAdapterAbstract.MULTI:
+            from perun.micro_services.adapters.MultiAdapter import MultiAdapter
+            adapter = MultiAdapter(config_file_path, attributes, memberships)
         else:
-            adapter = RpcAdapter(config_file_path)
+            from perun.micro_services.adapters.RpcAdapter import RpcAdapter
+            adapter = RpcAdapter(config_file_path, attributes, memberships)
         return adapter
+
+    @staticmethod
+    def get_async_instance(config_file_path, interface=PerunAdapterAbstract.RPC, attributes=None, memberships=False):
+        if attributes or memberships:
+            raise Exception('PerunAdapter: User attributes and memberships have no asyncio implementation.')
+
+        if interface == PerunAdapterAbstract.LDAP:
+            from perun.micro_services.adapters.AsyncLdapAdapter import AsyncLdapAdapter
+            adapter = AsyncLdapAdapter(config_file_path)
+        elif interface == PerunAdapterAbstract.RPC:
+            from perun.micro_services.adapters.AsyncRpcAdapter import AsyncRpcAdapter
+            adapter = AsyncRpcAdapter(config_file_path)
+        else:
+            raise Exception(f'PerunAdapter: Interface "{interface}" has no asyncio implementation.')
+        return adapter
+
+    @staticmethod
+    def get_async_instance_shim(config_file_path, interface=PerunAdapterAbstract.RPC, attributes=None,
+                                memberships=False):
+        """
+        Returns asyncio adapter of `interface` usable through the synchronous interface
+        """
+        from perun.micro_services.adapters.AsyncAdapterShim import AsyncAdapterShim
+        return AsyncAdapterShim(PerunAdapter.get_async_instance(config_file_path, interface, attributes, memberships))
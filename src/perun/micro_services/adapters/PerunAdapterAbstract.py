@@ -11,7 +11,46 @@ class PerunAdapterAbstract(ABC):
 
     LDAP = 'ldap'
     RPC = 'rpc'
+    MULTI = 'multi'
 
     @abstractmethod
-    def get_perun_user(self, idp_entity_id, uids):
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        """
+        Returns the user identified by any of `uids`, or None. `identifiers` are names
+        of the attributes (as in `uids_identifiers`) the uids were released in.
+        """
+        pass
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Resolves many users at once. Every batch holds the uids of one person, as passed
+        to `get_perun_user`. Returns dict mapping every uid of a batch, whose user was found,
+        to that user. Adapters override this with a more efficient lookup.
+        """
+        users = {}
+        for index, uids in enumerate(uid_batches):
+            user = self.get_perun_user(idp_entity_id, uids, identifier_batches[index] if identifier_batches else None)
+            if user is not None:
+                users.update(dict.fromkeys(uids, user))
+        return users
+
+    @property
+    def queries_per_uid(self):
+        """
+        Whether Perun is asked for the uids one by one in their order, so the order
+        of uids matters. Adapters wrapping another `adapter` tell it of the wrapped one.
+        """
+        return getattr(getattr(self, 'adapter', None), 'queries_per_uid', False)
+
+    def warm_up(self):
+        """
+        Opens connections to Perun ahead of the first lookup, which otherwise opens them.
+        """
+        pass
+
+    def close(self):
+        """
+        Closes connections and stops threads of the adapter. Adapters wrapping another
+        `adapter` close the wrapped one too.
+        """
         pass
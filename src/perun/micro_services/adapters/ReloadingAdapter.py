@@ -0,0 +1,96 @@
+"""
+PerunAdapter created again when the perun configuration changes
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import os
+import threading
+import time
+
+from perun.micro_services.adapters.AdapterRegistry import AdapterRegistry
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadingAdapter(PerunAdapterAbstract):
+    """
+    Delegates lookups to the adapter created by `factory` from `config_file`.
+
+    The modification time of `config_file` is checked at most once per
+    `reload_interval` seconds. When the file changed, a new adapter is created
+    and replaces the current one, which finishes lookups already in flight
+    and is closed after `close_delay` seconds. When the new adapter cannot be
+    created, e.g. the file is being written, the current one is kept.
+    """
+
+    DEFAULT_RELOAD_INTERVAL = 30
+    DEFAULT_CLOSE_DELAY = 60
+
+    def __init__(self, factory, config_file, reload_interval=DEFAULT_RELOAD_INTERVAL,
+                 close_delay=DEFAULT_CLOSE_DELAY):
+        self.factory = factory
+        self.config_file = config_file
+        self.reload_interval = reload_interval
+        self.close_delay = close_delay
+
+        self._mtime = self._get_mtime()
+        self._adapter = factory(config_file)
+        self._next_check = time.monotonic() + reload_interval
+        self._lock = threading.Lock()
+
+    @property
+    def adapter(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._adapter
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        return self.adapter.get_perun_user(idp_entity_id, uids, identifiers)
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        return self.adapter.get_perun_users(idp_entity_id, uid_batches, identifier_batches)
+
+    def warm_up(self):
+        self.adapter.warm_up()
+
+    def reload(self, force=False):
+        """
+        Replaces the adapter when the configuration file changed, returns True when it was replaced.
+        """
+        if not self._lock.acquire(blocking=False):
+            # another thread is checking the file, lookups continue on the current adapter
+            return False
+
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            mtime = self._get_mtime()
+            if mtime == self._mtime and not force:
+                return False
+
+            try:
+                adapter = self.factory(self.config_file)
+            except Exception as ex:
+                logger.error(f'ReloadingAdapter - unable to reload configuration "{self.config_file}": {ex}')
+                return False
+
+            previous, self._adapter, self._mtime = self._adapter, adapter, mtime
+        finally:
+            self._lock.release()
+
+        logger.info(f'ReloadingAdapter - configuration "{self.config_file}" reloaded.')
+        timer = threading.Timer(self.close_delay, AdapterRegistry.close_adapter, (previous,))
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def close(self):
+        AdapterRegistry.close_adapter(self._adapter)
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,106 @@
+"""
+Logging of requests to Perun LDAP/RPC
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import hashlib
+import logging
+import random
+import re
+
+
+class RequestLogger:
+    """
+    Level-guarded, structured logging of requests of one Perun `backend`.
+
+    Requests taking at least `slow_threshold` seconds are logged as warnings,
+    only `sample_rate` of them, so an outage does not flood the log. Other
+    requests are logged on debug level and only when it is enabled, so
+    a request costs no formatting unless it is logged.
+
+    Logged queries and responses are redacted: credentials are dropped and
+    values of personal attributes (PERSONAL_KEYS and `personal_attributes`,
+    all values of LDAP filters) are replaced by a short hash, so records of
+    one user can still be correlated. Records carry the request details
+    in the `perun_request` attribute for structured log formatters.
+    """
+
+    CREDENTIAL_KEYS = {'password', 'passwd', 'userpassword', 'authorization', 'cookie'}
+    PERSONAL_KEYS = {'extlogin', 'login', 'uid', 'mail', 'name', 'displayname', 'cn', 'firstname', 'middlename',
+                     'lastname', 'titlebefore', 'titleafter', 'edupersonprincipalnames'}
+    FILTER_KEYS = {'filter'}
+    PUBLIC_FILTER_ATTRIBUTES = {'objectclass'}
+    FILTER_ASSERTION = re.compile(r'\(([^()=~<>]+)([~<>]?=)([^()]*)\)')
+    REDACTED = '***'
+
+    def __init__(self, logger, backend, slow_threshold=None, sample_rate=1.0, personal_attributes=()):
+        self.logger = logger
+        self.backend = backend
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self.personal_keys = self.PERSONAL_KEYS | {str.lower(attribute) for attribute in personal_attributes}
+
+    def log(self, method, seconds, query, response=None, error=None):
+        """
+        Logs request `method` with `query` (dict), which took `seconds`
+        and returned `response` or failed with `error`.
+        """
+        if self.slow_threshold is not None and seconds >= self.slow_threshold:
+            if self.sample_rate >= 1 or random.random() < self.sample_rate:
+                self._emit(logging.WARNING, 'Slow', method, seconds, query, None, error)
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, 'Finished' if error is None else 'Failed', method, seconds, query, response,
+                       error)
+
+    def redact(self, value, key=None):
+        if isinstance(value, dict):
+            if isinstance(key, str) and str.lower(key) in self.personal_keys:
+                # e.g. values of map attributes
+                return {name: self.redact(item, key) for name, item in value.items()}
+            return {name: self.redact(item, name) for name, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.redact(item, key) for item in value]
+
+        name = str.lower(key) if isinstance(key, str) else None
+        if name in self.CREDENTIAL_KEYS:
+            return self.REDACTED
+        if name in self.personal_keys:
+            return self.pseudonymize(value)
+        if name in self.FILTER_KEYS and isinstance(value, str):
+            return self.redact_filter(value)
+        return value
+
+    def redact_filter(self, ldap_filter):
+        def redact_assertion(match):
+            attribute, operator, value = match.groups()
+            if str.lower(attribute) in self.PUBLIC_FILTER_ATTRIBUTES or value == '*':
+                return match.group(0)
+            return f'({attribute}{operator}{self.pseudonymize(value)})'
+
+        return self.FILTER_ASSERTION.sub(redact_assertion, ldap_filter)
+
+    @staticmethod
+    def pseudonymize(value):
+        if value is None:
+            return None
+        return '#' + hashlib.sha256(str(value).encode('utf-8')).hexdigest()[:10]
+
+    def _emit(self, level, kind, method, seconds, query, response, error):
+        record = {
+            'backend': self.backend,
+            'method': method,
+            'duration_ms': round(seconds * 1000),
+            'query': self.redact(query),
+        }
+        if response is not None:
+            record['response'] = self.redact(response)
+        if error is not None:
+            # messages of errors may quote the query, only their type is logged
+            record['error'] = type(error).__name__
+
+        self.logger.log(level, '%s Perun %s request %s in %d ms, query: %s%s%s', kind, self.backend, method,
+                        record['duration_ms'], record['query'],
+                        f', response: {record["response"]}' if 'response' in record else '',
+                        f', error: {record["error"]}' if 'error' in record else '',
+                        extra={'perun_request': record})
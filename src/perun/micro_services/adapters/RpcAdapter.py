@@ -1,56 +1,219 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+import pycurl
 import yaml
+from perun.micro_services.adapters.CurlHandlePool import CurlHandlePool
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
 from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
 from perun.micro_services.adapters.RpcConnector import RpcConnector
+from perun.micro_services.models.Group import Group
 from perun.micro_services.models.User import User
+from perun.micro_services.models.Vo import Vo
 
 logger = logging.getLogger(__name__)
 
 
 class RpcAdapter(PerunAdapterAbstract):
+    """
+    Looks users up in Perun RPC.
+
+    Requested user `attributes` (names mapped to attribute URNs by
+    rpc.user_attributes) and with `memberships` the VOs and groups of
+    a found user are read by concurrent calls issued together.
+    """
 
     PERUN_CONFIG_FILE_NAME = 'perun_config_file_name'
 
     PERUN_RPC_HOSTNAME = 'rpc.hostname'
     PERUN_RPC_USER = 'rpc.user'
     PERUN_RPC_PASSWORD = 'rpc.password'
+    PERUN_RPC_POOL_SIZE = 'rpc.pool_size'
+    PERUN_RPC_POOL_IDLE_TIMEOUT = 'rpc.pool_idle_timeout'
+    PERUN_RPC_PARALLEL_LOOKUPS = 'rpc.parallel_lookups'
+    PERUN_RPC_MAX_WORKERS = 'rpc.max_workers'
+    PERUN_RPC_SLOW_QUERY_THRESHOLD = 'rpc.slow_query_threshold'
+    PERUN_RPC_SLOW_QUERY_SAMPLE_RATE = 'rpc.slow_query_sample_rate'
+    PERUN_RPC_USER_ATTRIBUTES = 'rpc.user_attributes'
+    PERUN_RPC_SESSION_FILE = 'rpc.session_file'
+
+    DEFAULT_MAX_WORKERS = 4
 
     connector = None
 
-    def __init__(self, config_file):
+    def __init__(self, config_file, attributes=None, memberships=False):
 
         with open(config_file, "r") as f:
             perun_configuration = yaml.safe_load(f)
             hostname = perun_configuration.get(self.PERUN_RPC_HOSTNAME, None)
             user = perun_configuration.get(self.PERUN_RPC_USER, None)
             pasword = perun_configuration.get(self.PERUN_RPC_PASSWORD, None)
+            pool_size = perun_configuration.get(self.PERUN_RPC_POOL_SIZE, CurlHandlePool.DEFAULT_MAX_SIZE)
+            pool_idle_timeout = perun_configuration.get(self.PERUN_RPC_POOL_IDLE_TIMEOUT,
+                                                        CurlHandlePool.DEFAULT_IDLE_TIMEOUT)
+            self.parallel_lookups = perun_configuration.get(self.PERUN_RPC_PARALLEL_LOOKUPS, False)
+            self.max_workers = perun_configuration.get(self.PERUN_RPC_MAX_WORKERS, self.DEFAULT_MAX_WORKERS)
+            slow_query_threshold = perun_configuration.get(self.PERUN_RPC_SLOW_QUERY_THRESHOLD, None)
+            slow_query_sample_rate = perun_configuration.get(self.PERUN_RPC_SLOW_QUERY_SAMPLE_RATE, 1.0)
+            rpc_attributes = perun_configuration.get(self.PERUN_RPC_USER_ATTRIBUTES, None) or {}
+            session_file = perun_configuration.get(self.PERUN_RPC_SESSION_FILE, None)
+
+        # requested attribute name -> attribute URN, names not mapped are URNs
+        self.user_attributes = {name: rpc_attributes.get(name, name) for name in attributes or []}
+        self.memberships = memberships
 
         if None in [hostname, user, pasword]:
             raise Exception('One of required attributes is not defined!')
 
-        self.connector = RpcConnector(hostname, user, pasword)
+        self.connector = RpcConnector(hostname, user, pasword, pool_size=pool_size,
+                                      pool_idle_timeout=pool_idle_timeout,
+                                      slow_query_threshold=slow_query_threshold,
+                                      slow_query_sample_rate=slow_query_sample_rate,
+                                      session_file=session_file,
+                                      # values of attributes read by getAttributes
+                                      personal_attributes=['value'] if self.user_attributes else ())
+        self.executor = ThreadPoolExecutor(self.max_workers, 'perun-rpc')
+        # separate workers, details of users resolved by `executor` are read while it waits
+        self.details_executor = ThreadPoolExecutor(self.max_workers, 'perun-rpc-details') \
+            if self.user_attributes or memberships else None
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        if self.parallel_lookups and len(uids) > 1:
+            return self.add_details(self.get_perun_user_parallel(idp_entity_id, uids))
+
+        return self.add_details(self.get_perun_user_sequential(idp_entity_id, uids))
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        """
+        Resolves batches concurrently by `max_workers` threads, each of them reusing
+        its kept-alive connection to the Perun RPC. Uids of one batch are looked up in order.
+        """
+        def lookup(uids):
+            return self.add_details(self.get_perun_user_sequential(idp_entity_id, uids))
+
+        futures = [Deadline.submit(self.executor, lookup, uids) for uids in uid_batches]
+
+        users = {}
+        try:
+            for uids, future in zip(uid_batches, futures):
+                user = future.result()
+                if user is not None:
+                    users.update(dict.fromkeys(uids, user))
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return users
+
+    @property
+    def queries_per_uid(self):
+        return not self.parallel_lookups
+
+    def warm_up(self):
+        self.connector.warm_up()
+
+    def close(self):
+        # lookups still running on the workers finish, handles they return are closed
+        self.executor.shutdown(wait=False)
+        if self.details_executor is not None:
+            self.details_executor.shutdown(wait=False)
+        self.connector.close()
+
+    def add_details(self, user):
+        """
+        Reads requested attributes and memberships of `user` (or None) and returns it. Attributes,
+        VOs and then groups of all VOs are read concurrently.
+        """
+        if user is None or self.details_executor is None:
+            return user
+
+        attributes = Deadline.submit(self.details_executor, self.get_user_attributes, user.id) \
+            if self.user_attributes else None
+        try:
+            if self.memberships:
+                user.vos = self.get_vos_where_user_is_member(user.id)
+                groups = [Deadline.submit(self.details_executor, self.get_member_groups, vo, user.id)
+                          for vo in user.vos]
+                user.groups = [group for future in groups for group in future.result()]
+            if attributes is not None:
+                user.attributes = attributes.result()
+        finally:
+            if attributes is not None:
+                attributes.cancel()
 
-    def get_perun_user(self, idp_entity_id, uids):
-        user = None
+        return user
 
-        for uid in uids:
-            try:
-                result = self.connector.get('usersManager', 'getUserByExtSourceNameAndExtLogin', {
-                    'extSourceName': idp_entity_id,
-                    'extLogin': uid
-                })
+    def get_user_attributes(self, user_id):
+        result = self.connector.post('attributesManager', 'getAttributes', {
+            'user': user_id,
+            'attrNames': sorted(set(self.user_attributes.values()))
+        })
+
+        values = {f'{attribute["namespace"]}:{attribute["friendlyName"]}': attribute.get('value')
+                  for attribute in result}
+        return {name: values.get(urn) for name, urn in self.user_attributes.items()}
 
-                name = ''
-                for item in ['titleBefore', 'firstName', 'middleName', 'lastName', 'titleAfter']:
-                    field = result[item]
+    def get_vos_where_user_is_member(self, user_id):
+        result = self.connector.get('usersManager', 'getVosWhereUserIsMember', {'user': user_id})
 
-                    if field is not None and field.strip():
-                        name += field + ' '
+        return [Vo(vo['id'], vo['name'], vo['shortName']) for vo in result]
 
-                name = name.strip()
-                return User(result['id'], name)
+    def get_member_groups(self, vo, user_id):
+        member = self.connector.get('membersManager', 'getMemberByUser', {'vo': vo.id, 'user': user_id})
+        result = self.connector.get('groupsManager', 'getMemberGroups', {'member': member['id']})
+
+        return [Group(group['id'], vo.id, group['name'], group.get('description'), f'{vo.short_name}:{group["name"]}')
+                for group in result]
+
+    def get_perun_user_sequential(self, idp_entity_id, uids):
+        user = None
+
+        for uid in uids:
+            try:
+                return self.get_user_by_ext_login(idp_entity_id, uid)
+            except (pycurl.error, DeadlineExceeded):
+                raise
             except Exception as ex:
                 logger.debug(ex.args)
 
         return user
+
+    def get_perun_user_parallel(self, idp_entity_id, uids):
+        """
+        Looks up all uids concurrently and returns the user found for the first uid
+        in the given order. Lookups not started yet are cancelled once it is known.
+        """
+        futures = [Deadline.submit(self.executor, self.get_user_by_ext_login, idp_entity_id, uid) for uid in uids]
+        try:
+            for future in futures:
+                try:
+                    return future.result()
+                except (pycurl.error, DeadlineExceeded):
+                    raise
+                except Exception as ex:
+                    logger.debug(ex.args)
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return None
+
+    def get_user_by_ext_login(self, idp_entity_id, uid):
+        result = self.connector.get('usersManager', 'getUserByExtSourceNameAndExtLogin', {
+            'extSourceName': idp_entity_id,
+            'extLogin': uid
+        })
+
+        return self.create_user(result)
+
+    @staticmethod
+    def create_user(result):
+        name = ''
+        for item in ['titleBefore', 'firstName', 'middleName', 'lastName', 'titleAfter']:
+            field = result[item]
+
+            if field is not None and field.strip():
+                name += field + ' '
+
+        name = name.strip()
+        return User(result['id'], name)
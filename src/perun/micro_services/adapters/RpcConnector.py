@@ -9,10 +9,14 @@ __email__ = "vyskocilpavel@muni.cz, pavol.pluta1@gmail.com"
 
 import json
 import logging
-import urllib.parse
-import re
+import time
 import pycurl
-from ..utils import milli_time
+from ..metrics.Metrics import Metrics
+from ..utils import build_rpc_query
+from .CurlHandlePool import CurlHandlePool
+from .Deadline import Deadline
+from .RequestLogger import RequestLogger
+from .RpcSession import RpcSession
 
 from io import BytesIO
 
@@ -20,52 +24,47 @@ logger = logging.getLogger(__name__)
 
 
 class RpcConnector:
-    COOKIE_FILE = '/tmp/proxyidp_cookie.txt'
+    """
+    Calls Perun RPC through pooled curl handles. Calls are authenticated by the
+    Perun session held in memory by `session` and by basic authentication only
+    when there is none, see RpcSession. Timeouts of calls are limited by the
+    remaining time of the current Deadline.
+    """
+
     CONNECT_TIMEOUT = 1
     TIMEOUT = 15
+    HTTP_UNAUTHORIZED = 401
 
-    def __init__(self, rpc_url, user, password):
+    def __init__(self, rpc_url, user, password, pool_size=CurlHandlePool.DEFAULT_MAX_SIZE,
+                 pool_idle_timeout=CurlHandlePool.DEFAULT_IDLE_TIMEOUT, slow_query_threshold=None,
+                 slow_query_sample_rate=1.0, session_file=None, personal_attributes=()):
         self.rpc_url = rpc_url
         self.user = user
         self.passwd = password
+        self.pool = CurlHandlePool(pool_size, pool_idle_timeout)
+        self.session = RpcSession(session_file)
+        self.request_logger = RequestLogger(logger, 'rpc', slow_query_threshold, slow_query_sample_rate,
+                                            personal_attributes)
+
+        self.request_seconds = Metrics.backend_request_seconds()
+        self.errors = Metrics.backend_errors()
+        pool_connections = Metrics.pool_connections()
+        pool_connections.set_function(lambda: self.pool.idle, ('rpc', 'idle'))
+        pool_connections.set_function(lambda: self.pool.in_use, ('rpc', 'in_use'))
 
     def get(self, manager, method, params=None):
         if params is None:
             params = []
 
-        params_query = urllib.parse.urlencode(params)
-        params_query = re.sub(r'%5B\d+%5D', '%5B%5D', params_query)
+        params_query = build_rpc_query(params)
 
         uri = f'{self.rpc_url}json/{manager}/{method}'
 
-        buffer = BytesIO()
-        c = pycurl.Curl()
-        c.setopt(pycurl.URL, f'{uri}?{params_query}')
-        c.setopt(pycurl.USERPWD, f'{self.user}:{self.passwd}')
-        c.setopt(pycurl.WRITEDATA, buffer)
-        c.setopt(pycurl.COOKIEJAR, self.COOKIE_FILE)
-        c.setopt(pycurl.COOKIEFILE, self.COOKIE_FILE)
-        c.setopt(pycurl.CONNECTTIMEOUT, self.CONNECT_TIMEOUT)
-        c.setopt(pycurl.TIMEOUT, self.TIMEOUT)
-
-        start_time = milli_time()
-        c.perform()
-        end_time = milli_time()
-        c.close()
-
-        body = buffer.getvalue()
-        result_json = body.decode('utf-8')
-        result = json.loads(result_json)
-
-        if 'errorId' in result.keys():
-            raise Exception(f'Exception from Perun: {result["message"]}')
+        def prepare(c):
+            c.setopt(pycurl.URL, f'{uri}?{params_query}')
+            return []
 
-        response_time = end_time - start_time
-        logger.debug(
-            f'GET call {uri} with params: {params_query}, response: {result} in: {response_time} ms.'
-        )
-
-        return result
+        return self._call(manager, method, params, prepare)
 
     def post(self, manager, method, params=None):
         if params is None:
@@ -74,34 +73,99 @@ class RpcConnector:
         params_json = json.dumps(params)
         uri = f'{self.rpc_url}json/{manager}/{method}'
 
-        buffer = BytesIO()
-        c = pycurl.Curl()
-        c.setopt(pycurl.URL, uri)
-        c.setopt(pycurl.USERPWD, self.user + ':' + self.passwd)
-        c.setopt(pycurl.CUSTOMREQUEST, 'POST')
-        c.setopt(pycurl.POSTFIELDS, params_json)
-        c.setopt(c.WRITEDATA, buffer)
-        c.setopt(pycurl.HTTPHEADER, ['Content-Type:application/json', 'Content-Length: {}'.format(len(params_json))])
-        c.setopt(pycurl.CONNECTTIMEOUT, self.CONNECT_TIMEOUT)
-        c.setopt(pycurl.TIMEOUT, self.TIMEOUT)
-
-        start_time = milli_time()
-        c.perform()
-        end_time = milli_time()
-        c.close()
-
-        body = buffer.getvalue()
+        def prepare(c):
+            c.setopt(pycurl.URL, uri)
+            c.setopt(pycurl.CUSTOMREQUEST, 'POST')
+            c.setopt(pycurl.POSTFIELDS, params_json)
+            return ['Content-Type:application/json', 'Content-Length: {}'.format(len(params_json))]
+
+        return self._call(manager, method, params, prepare)
+
+    def warm_up(self):
+        """
+        Opens a kept-alive connection to Perun (TCP, TLS) in a pooled handle by a HEAD request,
+        the connection is otherwise opened by the first call.
+        """
+        with self.pool.handle() as c:
+            c.setopt(pycurl.URL, self.rpc_url)
+            c.setopt(pycurl.NOBODY, True)
+            c.setopt(pycurl.CONNECTTIMEOUT, self.CONNECT_TIMEOUT)
+            c.setopt(pycurl.TIMEOUT, self.TIMEOUT)
+            c.perform()
+
+    def close(self):
+        self.pool.close()
+        self.session.close()
+
+    def _call(self, manager, method, params, prepare):
+        cookie = self.session.header
+        body, status, elapsed = self._request(manager, method, params, prepare, cookie)
+        if status == self.HTTP_UNAUTHORIZED and cookie is not None:
+            # the session has expired in Perun, a new one is started by basic authentication
+            self.session.rejected(cookie)
+            body, status, retry_elapsed = self._request(manager, method, params, prepare, None)
+            elapsed += retry_elapsed
+
         # Body is a byte string.
         # We have to know the encoding in order to print it to a text file
         # such as standard output.
         result_json = body.decode('utf-8')
         result = json.loads(result_json)
 
+        self.request_logger.log(f'{manager}.{method}', elapsed, {'params': params}, result)
         if 'errorId' in result.keys():
+            self.errors.inc(('rpc', f'{manager}.{method}', 'perun'))
             raise Exception(f'Exception from Perun: {result["message"]}')
 
-        response_time = end_time - start_time
-        logger.debug(
-            f'POST call {uri} with params: {params_json}, response: {result} in: {response_time} ms.')
-
         return result
+
+    def _request(self, manager, method, params, prepare, cookie):
+        """
+        Performs request prepared by `prepare` authenticated by the session `cookie` header,
+        or by basic authentication when it is None. Returns its body, HTTP status and
+        response time in seconds.
+        """
+        timeout = Deadline.timeout(self.TIMEOUT)
+        buffer = BytesIO()
+        header_lines = []
+        with self.pool.handle() as c:
+            headers = prepare(c)
+            if cookie is None:
+                c.setopt(pycurl.USERPWD, f'{self.user}:{self.passwd}')
+            else:
+                headers.append(cookie)
+            if headers:
+                c.setopt(pycurl.HTTPHEADER, headers)
+            c.setopt(pycurl.WRITEDATA, buffer)
+            c.setopt(pycurl.HEADERFUNCTION, header_lines.append)
+            # in milliseconds, zero would disable the timeouts
+            c.setopt(pycurl.CONNECTTIMEOUT_MS, max(1, int(min(self.CONNECT_TIMEOUT, timeout) * 1000)))
+            c.setopt(pycurl.TIMEOUT_MS, max(1, int(timeout * 1000)))
+
+            elapsed = self._perform(c, manager, method, params)
+            status = c.getinfo(pycurl.RESPONSE_CODE)
+
+        if status != self.HTTP_UNAUTHORIZED:
+            self.session.update(header_lines, cookie is not None)
+        return buffer.getvalue(), status, elapsed
+
+    def _perform(self, c, manager, method, params):
+        """
+        Performs the prepared request and records its duration and failure,
+        returns the response time in seconds.
+        """
+        labels = ('rpc', f'{manager}.{method}')
+        start_time = time.perf_counter()
+        try:
+            c.perform()
+        except pycurl.error as ex:
+            kind = Metrics.TIMEOUT if ex.args[0] == pycurl.E_OPERATION_TIMEDOUT else Metrics.ERROR
+            self.errors.inc(labels + (kind,))
+            self.request_logger.log(f'{manager}.{method}', time.perf_counter() - start_time, {'params': params},
+                                    error=ex)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.request_seconds.observe(elapsed, labels)
+
+        return elapsed
@@ -0,0 +1,238 @@
+"""
+Session cookies of a connection to Perun RPC
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http.cookies import CookieError, SimpleCookie
+
+logger = logging.getLogger(__name__)
+
+
+class RpcSession:
+    """
+    Thread-safe in-memory store of the session cookies set by Perun RPC.
+
+    While the store holds a valid session, requests send its cookies instead
+    of basic authentication. A session rejected by Perun (HTTP 401) is
+    cleared and the request is repeated with basic authentication, which
+    starts a new one. Sessions are not used anymore once Perun rejects
+    MAX_REJECTIONS new sessions in a row, i.e. it does not authenticate
+    by its cookies.
+
+    With `path` the session is also persisted to `path`.<pid> of the process,
+    written atomically only when the cookies change, and a new store resumes
+    the newest valid session persisted by any process. The file is removed
+    by `close`, files left by processes which are not running are removed
+    by the next store loading them. `close` is also called at exit of the process.
+    """
+
+    SET_COOKIE = b'set-cookie:'
+    MAX_REJECTIONS = 3
+
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = True
+        self._cookies = {}
+        self._header = None
+        self._verified = False
+        self._rejections = 0
+        self._saved_inode = None
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self.load()
+            atexit.register(self.close)
+
+    @property
+    def header(self):
+        """
+        Returns the Cookie header of the valid session, or None
+        """
+        if not self.enabled:
+            return None
+
+        header = self._header
+        if header is not None and self._expired(time.time()):
+            with self._lock:
+                self._remove_expired(time.time())
+            header = self._header
+        return header
+
+    def update(self, header_lines, authenticated=False):
+        """
+        Stores cookies of Set-Cookie lines of a successful response, `header_lines` are raw
+        header lines. `authenticated` tells the request was authenticated by the session.
+        """
+        if authenticated:
+            self._verified = True
+            self._rejections = 0
+
+        cookies = [line[len(self.SET_COOKIE):].decode('latin-1').strip() for line in header_lines
+                   if line[:len(self.SET_COOKIE)].lower() == self.SET_COOKIE]
+        if not cookies or not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            for value in cookies:
+                self._set_cookie(value, now)
+            self._remove_expired(now)
+            # a session started by basic authentication is not known to work yet
+            self._verified = authenticated
+
+        if self.path is not None:
+            self.save()
+
+    def rejected(self, header=None):
+        """
+        Clears the session rejected by Perun. With the Cookie `header` sent in the rejected
+        request, requests rejected concurrently count as one rejection of that session,
+        and the session is kept when it was replaced meanwhile.
+        """
+        with self._lock:
+            if header is not None and header != self._header:
+                return
+            if not self._verified:
+                self._rejections += 1
+                if self._rejections >= self.MAX_REJECTIONS:
+                    logger.warning('RpcSession - Perun rejects new sessions, using basic authentication only.')
+                    self.enabled = False
+            self._cookies = {}
+            self._header = None
+            self._verified = False
+
+    def load(self):
+        """
+        Resumes the newest session persisted by any process, which has not expired
+        """
+        now = time.time()
+        paths = sorted(glob.glob(glob.escape(self.path) + '.*'), key=self._mtime, reverse=True)
+        try:
+            for path in paths:
+                try:
+                    with open(path, 'r') as f:
+                        cookies = {name: (value, expires_at) for name, value, expires_at in json.load(f)}
+                except (OSError, ValueError, TypeError) as ex:
+                    logger.debug(f'RpcSession - unable to load session from "{path}": {ex}')
+                    continue
+
+                with self._lock:
+                    self._cookies = cookies
+                    self._remove_expired(now)
+                    if not self._cookies:
+                        continue
+                    # a resumed session, which Perun rejects, is cleared without disabling sessions
+                    self._verified = True
+
+                # kept for the processes started later, when the one which persisted it exits
+                self.save()
+                return True
+
+            return False
+        finally:
+            for path in paths:
+                self._remove_stale(path)
+
+    def save(self):
+        with self._lock:
+            cookies = [[name, value, expires_at] for name, (value, expires_at) in self._cookies.items()]
+
+        path = f'{self.path}.{os.getpid()}'
+        directory = os.path.dirname(path) or '.'
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.rpc_session', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cookies, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, path)
+            self._saved_inode = os.stat(path).st_ino
+        except OSError as ex:
+            logger.warning(f'RpcSession - unable to persist session to "{path}": {ex}')
+
+    def close(self):
+        """
+        Removes the file persisting the session, unless a newer store of the process has replaced it
+        """
+        if self.path is not None:
+            # the closed store is not kept alive until the exit
+            atexit.unregister(self.close)
+        if self._saved_inode is None:
+            return
+
+        path = f'{self.path}.{os.getpid()}'
+        try:
+            if os.stat(path).st_ino == self._saved_inode:
+                os.remove(path)
+        except OSError as ex:
+            logger.debug(f'RpcSession - unable to remove session file "{path}": {ex}')
+        self._saved_inode = None
+
+    def _remove_stale(self, path):
+        """
+        Removes the session file `path` of a process, which is not running anymore
+        """
+        try:
+            pid = int(path.rsplit('.', 1)[1])
+        except ValueError:
+            return
+        if pid == os.getpid():
+            return
+
+        try:
+            os.kill(pid, 0)
+            return
+        except PermissionError:
+            # running under another user
+            return
+        except OSError:
+            pass
+
+        try:
+            os.remove(path)
+        except OSError as ex:
+            logger.debug(f'RpcSession - unable to remove session file "{path}": {ex}')
+
+    def _set_cookie(self, value, now):
+        try:
+            cookie = SimpleCookie()
+            cookie.load(value)
+        except CookieError:
+            logger.debug('RpcSession - ignoring malformed Set-Cookie header.')
+            return
+
+        for name, morsel in cookie.items():
+            expires_at = None
+            try:
+                if morsel['max-age']:
+                    expires_at = now + int(morsel['max-age'])
+                elif morsel['expires']:
+                    expires_at = parsedate_to_datetime(morsel['expires']).timestamp()
+            except (TypeError, ValueError):
+                logger.debug(f'RpcSession - ignoring invalid expiration of cookie {name}.')
+            self._cookies[name] = (morsel.value, expires_at)
+
+    def _expired(self, now):
+        return any(expires_at is not None and expires_at <= now for _, expires_at in self._cookies.values())
+
+    def _remove_expired(self, now):
+        self._cookies = {name: (value, expires_at) for name, (value, expires_at) in self._cookies.items()
+                         if expires_at is None or expires_at > now}
+        self._header = 'Cookie: ' + '; '.join(f'{name}={value}' for name, (value, _) in self._cookies.items()) \
+            if self._cookies else None
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
@@ -0,0 +1,82 @@
+"""
+PerunAdapter sharing one in-flight lookup among concurrent identical lookups
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import threading
+
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+from perun.micro_services.metrics.Metrics import Metrics
+
+
+class InFlightCall:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightAdapter(PerunAdapterAbstract):
+    """
+    Coalesces concurrent lookups of the same uids released by the same IdP.
+
+    The first caller calls `adapter`, callers arriving while its lookup is
+    in flight wait for it and receive the same user, or the same exception.
+    A waiting caller gives up when its own deadline is spent.
+    Bulk lookups are passed to `adapter` as they are.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+
+        self.coalesced = 0
+        self.coalesced_calls = Metrics.coalesced_calls()
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        key = (idp_entity_id, tuple(uids), tuple(identifiers) if identifiers else None)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = InFlightCall()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            self.coalesced_calls.inc()
+            if not call.done.wait(Deadline.timeout()):
+                raise DeadlineExceeded('SingleFlightAdapter - time budget is spent waiting for the lookup.')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self.adapter.get_perun_user(idp_entity_id, uids, identifiers)
+            return call.result
+        except Exception as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_perun_users(self, idp_entity_id, uid_batches, identifier_batches=None):
+        return self.adapter.get_perun_users(idp_entity_id, uid_batches, identifier_batches)
+
+    def warm_up(self):
+        self.adapter.warm_up()
+
+    def close(self):
+        self.adapter.close()
@@ -0,0 +1,44 @@
+"""
+Class CacheBackend
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+from perun.micro_services.cache.CacheBackendAbstract import CacheBackendAbstract
+from perun.micro_services.cache.MemoryCache import MemoryCache
+
+
+class CacheBackend:
+    """
+    Creates cache backends, modules of the shared backends are imported
+    only when they are configured.
+    """
+
+    BACKEND = 'backend'
+    MAX_SIZE = 'max_size'
+    PATH = 'path'
+    SERVER = 'server'
+    TIMEOUT = 'timeout'
+
+    @staticmethod
+    def get_instance(config):
+        backend = str.lower(config.get(CacheBackend.BACKEND, CacheBackendAbstract.MEMORY))
+
+        if backend == CacheBackendAbstract.SQLITE:
+            from perun.micro_services.cache.SqliteCache import SqliteCache
+            path = config.get(CacheBackend.PATH, None)
+            if path is None:
+                raise Exception(f'CacheBackend: Required option "{CacheBackend.PATH}" not defined.')
+            return SqliteCache(path, config.get(CacheBackend.MAX_SIZE, SqliteCache.DEFAULT_MAX_SIZE))
+
+        if backend == CacheBackendAbstract.MEMCACHED:
+            from perun.micro_services.cache.MemcachedCache import MemcachedCache
+            server = config.get(CacheBackend.SERVER, None)
+            if server is None:
+                raise Exception(f'CacheBackend: Required option "{CacheBackend.SERVER}" not defined.')
+            return MemcachedCache(server, config.get(CacheBackend.TIMEOUT, MemcachedCache.DEFAULT_TIMEOUT))
+
+        if backend == CacheBackendAbstract.MEMORY:
+            return MemoryCache(config.get(CacheBackend.MAX_SIZE, MemoryCache.DEFAULT_MAX_SIZE))
+
+        raise Exception(f'CacheBackend: Unknown cache backend "{backend}".')
@@ -0,0 +1,37 @@
+"""
+Abstract class CacheBackendAbstract
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+from abc import ABC, abstractmethod
+
+
+class CacheBackendAbstract(ABC):
+    """
+    Storage of cached Perun lookups.
+
+    Keys are strings, values are JSON serializable objects. Implementations
+    must be thread-safe and must not raise on an unavailable storage,
+    a failing read is reported as a miss.
+    """
+
+    MEMORY = 'memory'
+    SQLITE = 'sqlite'
+    MEMCACHED = 'memcached'
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
@@ -0,0 +1,139 @@
+"""
+Class CacheSnapshot
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from perun.micro_services.models.User import User
+
+
+class CacheSnapshot:
+    """
+    Read-only snapshot of identity mappings (issuer and uid to Perun user)
+    in a compact binary file.
+
+    The file is memory-mapped and searched in place, so loading it costs
+    nothing regardless of its size and all worker processes share its pages.
+
+    Layout (little endian): magic, number of records (uint32), creation time
+    (float64), offsets of records sorted by key (uint32 each) and the records.
+    A record is the key, user id and user name, each prefixed by its length
+    (uint16, NONE_LENGTH stands for a missing name).
+
+    Keys are `issuer|uid`, mappings valid for any issuer (e.g. built from
+    an LDAP dump) use the WILDCARD issuer.
+    """
+
+    MAGIC = b'PRNSNAP1'
+    HEADER = struct.Struct('<8sId')
+    OFFSET = struct.Struct('<I')
+    LENGTH = struct.Struct('<H')
+    NONE_LENGTH = 0xFFFF
+    WILDCARD = '*'
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, self.created_at = self.HEADER.unpack_from(self._data, 0)
+        if magic != self.MAGIC:
+            self._data.close()
+            raise Exception(f'CacheSnapshot: File "{path}" is not a snapshot.')
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    def get(self, issuer, uid):
+        """
+        Returns user mapped to `uid` released by `issuer`, or to `uid` of any issuer.
+        """
+        user = self.find(self.get_key(issuer, uid))
+        if user is None:
+            user = self.find(self.get_key(self.WILDCARD, uid))
+        return user
+
+    def find(self, key):
+        key = key.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.OFFSET.unpack_from(self._data, self.HEADER.size + middle * self.OFFSET.size)[0]
+            record_key, offset = self._read(offset)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                user_id, offset = self._read(offset)
+                name, _ = self._read(offset)
+                return User(user_id.decode('utf-8'), None if name is None else name.decode('utf-8'))
+        return None
+
+    def close(self):
+        self._data.close()
+
+    @staticmethod
+    def get_key(issuer, uid):
+        return f'{issuer}|{uid}'
+
+    @staticmethod
+    def write(path, mappings, created_at=None):
+        """
+        Writes snapshot of `mappings` (iterable of key and User) atomically to `path`,
+        later mappings of the same key win.
+        """
+        records = {}
+        for key, user in mappings:
+            records[key.encode('utf-8')] = CacheSnapshot._encode_record(key, user)
+
+        keys = sorted(records)
+        header_size = CacheSnapshot.HEADER.size + len(keys) * CacheSnapshot.OFFSET.size
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(CacheSnapshot.HEADER.pack(CacheSnapshot.MAGIC, len(keys),
+                                                  time.time() if created_at is None else created_at))
+                offset = header_size
+                for key in keys:
+                    f.write(CacheSnapshot.OFFSET.pack(offset))
+                    offset += len(records[key])
+                for key in keys:
+                    f.write(records[key])
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        return len(keys)
+
+    @staticmethod
+    def _encode_record(key, user):
+        record = b''
+        for value in [key, str(user.id), user.name]:
+            if value is None:
+                record += CacheSnapshot.LENGTH.pack(CacheSnapshot.NONE_LENGTH)
+                continue
+            encoded = value.encode('utf-8')[:CacheSnapshot.NONE_LENGTH - 1]
+            record += CacheSnapshot.LENGTH.pack(len(encoded)) + encoded
+        return record
+
+    def _read(self, offset):
+        length = self.LENGTH.unpack_from(self._data, offset)[0]
+        offset += self.LENGTH.size
+        if length == self.NONE_LENGTH:
+            return None, offset
+        return self._data[offset:offset + length], offset + length
@@ -0,0 +1,144 @@
+"""
+Statistics of identifiers resolving Perun users per IdP
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IdentifierStats:
+    """
+    Counts lookups of each identifier of users logging in through an IdP
+    and how many of them found the user.
+
+    `order` ranks identifiers by their smoothed hit ratio, (hits + 1) / (lookups + 2),
+    so an identifier not looked up yet ranks above one which keeps missing and
+    gets tried. Counts of an identifier are halved after MAX_LOOKUPS lookups,
+    so the ranking follows changes of the attributes released by the IdP.
+
+    With `path` the counts are persisted to the JSON file `path`, loaded at
+    start, written at most every `save_interval` seconds and at exit of the
+    process. Worker processes sharing the file add their new counts to the
+    counts in the file while holding a lock of `path`.lock.
+    """
+
+    MAX_LOOKUPS = 1000
+    DEFAULT_SAVE_INTERVAL = 60
+
+    def __init__(self, path=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+
+        # issuer -> identifier -> [hits, lookups]
+        self._counts = {}
+        self._pending = {}
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self._counts = self._read()
+            atexit.register(self.close)
+
+    def get(self, issuer, identifier):
+        """
+        Returns hits and lookups of `identifier` of users of `issuer`
+        """
+        hits, lookups = self._counts.get(issuer, {}).get(identifier, (0, 0))
+        return hits, lookups
+
+    def order(self, issuer, identifiers):
+        """
+        Returns `identifiers` ordered from the one most likely finding users of `issuer`,
+        equally ranked identifiers keep their order
+        """
+        counts = self._counts.get(issuer, {})
+
+        def ratio(identifier):
+            hits, lookups = counts.get(identifier, (0, 0))
+            return (hits + 1) / (lookups + 2)
+
+        return sorted(identifiers, key=ratio, reverse=True)
+
+    def record(self, issuer, identifier, found):
+        with self._lock:
+            self._add(self._counts, issuer, identifier, int(found), 1)
+            self._add(self._pending, issuer, identifier, int(found), 1, decay=False)
+            save = self.path is not None and time.monotonic() - self._saved_at >= self.save_interval
+
+        if save:
+            self.save()
+
+    def save(self):
+        """
+        Adds the counts recorded since the last save to the counts in the file
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._saved_at = time.monotonic()
+
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            with open(self.path + '.lock', 'a') as lock:
+                # read, update and write by one process at a time, so no counts are lost
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                counts = self._read()
+                for issuer, identifiers in pending.items():
+                    for identifier, (hits, lookups) in identifiers.items():
+                        self._add(counts, issuer, identifier, hits, lookups)
+
+                fd, tmp_path = tempfile.mkstemp(prefix='.identifier_stats', dir=directory)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(counts, f)
+                os.replace(tmp_path, self.path)
+        except OSError as ex:
+            logger.warning(f'IdentifierStats - unable to save statistics to "{self.path}": {ex}')
+            with self._lock:
+                for issuer, identifiers in pending.items():
+                    for identifier, (hits, lookups) in identifiers.items():
+                        self._add(self._pending, issuer, identifier, hits, lookups, decay=False)
+            return
+
+        with self._lock:
+            # counts of other processes, and the ones recorded meanwhile
+            for issuer, identifiers in self._pending.items():
+                for identifier, (hits, lookups) in identifiers.items():
+                    self._add(counts, issuer, identifier, hits, lookups)
+            self._counts = counts
+
+    def close(self):
+        """
+        Saves the counts recorded since the last save
+        """
+        if self.path is not None and self._pending:
+            self.save()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                counts = json.load(f)
+            return {issuer: {identifier: list(values) for identifier, values in identifiers.items()}
+                    for issuer, identifiers in counts.items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, AttributeError) as ex:
+            logger.warning(f'IdentifierStats - unable to load statistics from "{self.path}": {ex}')
+            return {}
+
+    def _add(self, counts, issuer, identifier, hits, lookups, decay=True):
+        values = counts.setdefault(issuer, {}).setdefault(identifier, [0, 0])
+        values[0] += hits
+        values[1] += lookups
+        if decay and values[1] > self.MAX_LOOKUPS:
+            values[0] //= 2
+            values[1] //= 2
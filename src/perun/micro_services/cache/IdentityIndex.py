@@ -0,0 +1,174 @@
+"""
+Local index of identifiers of Perun users stored in a SQLite file
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import os
+import sqlite3
+import threading
+
+from perun.micro_services.models.User import User
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityIndex:
+    """
+    Maps values of identifier attributes of Perun users (compared case
+    insensitively) to the users. Stored in a SQLite database in WAL mode,
+    so all worker processes of a host read it while one of them writes.
+
+    The index is filled by `replace` with all users (e.g. a full dump of
+    Perun LDAP) and kept current by `update` with the changed ones.
+    Values of `meta` keys let processes sharing the index coordinate.
+    """
+
+    BUSY_TIMEOUT = 5
+    STAGE_BATCH_SIZE = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, name TEXT)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS identifiers (attribute TEXT NOT NULL, value TEXT NOT NULL, '
+            'user_id TEXT NOT NULL, PRIMARY KEY (attribute, value)) WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS identifiers_user_id ON identifiers (user_id)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+
+    def get(self, attribute, value):
+        """
+        Returns the user with `value` of the identifier `attribute`, or None
+        """
+        try:
+            row = self._connection().execute(
+                'SELECT users.id, users.name FROM identifiers JOIN users ON users.id = identifiers.user_id '
+                'WHERE identifiers.attribute = ? AND identifiers.value = ?', (attribute, str.lower(str(value)))
+            ).fetchone()
+        except sqlite3.Error as ex:
+            logger.warning(f'IdentityIndex.get - unable to read from {self.path}: {ex}')
+            return None
+
+        return None if row is None else User(row[0], row[1])
+
+    def replace(self, users):
+        """
+        Replaces the whole index by `users`, pairs of User and list of its (attribute, value)
+        identifiers. Readers see the previous index until all users are written.
+
+        Users are collected in temporary tables of the connection first, so the
+        index is locked for writing only while they are copied into it, not while
+        `users` are read (e.g. during the whole LDAP dump).
+        """
+        conn = self._connection()
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS staged_users (id TEXT PRIMARY KEY, name TEXT)')
+        conn.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS staged_identifiers (attribute TEXT NOT NULL, value TEXT NOT NULL, '
+            'user_id TEXT NOT NULL, PRIMARY KEY (attribute, value)) WITHOUT ROWID'
+        )
+        try:
+            conn.execute('DELETE FROM temp.staged_users')
+            conn.execute('DELETE FROM temp.staged_identifiers')
+            count = 0
+            batch = []
+            for user_identifiers in users:
+                batch.append(user_identifiers)
+                if len(batch) >= self.STAGE_BATCH_SIZE:
+                    count += self._insert(conn, 'temp.staged_', batch, clear=True)
+                    batch = []
+            count += self._insert(conn, 'temp.staged_', batch, clear=True)
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM identifiers')
+                conn.execute('DELETE FROM users')
+                conn.execute('INSERT INTO users (id, name) SELECT id, name FROM temp.staged_users')
+                conn.execute(
+                    'INSERT INTO identifiers (attribute, value, user_id) '
+                    'SELECT attribute, value, user_id FROM temp.staged_identifiers'
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.execute('DELETE FROM temp.staged_users')
+            conn.execute('DELETE FROM temp.staged_identifiers')
+
+        return count
+
+    def update(self, users):
+        """
+        Stores `users` (as in `replace`) replacing their previous identifiers
+        """
+        return self._insert(self._connection(), '', users, clear=False, lock='BEGIN IMMEDIATE')
+
+    def get_meta(self, key, default=None):
+        row = self._connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self._connection().execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def claim(self, key, now, interval):
+        """
+        Atomically sets `key` to `now` unless it was set less than `interval` seconds ago,
+        returns whether it was set. Processes sharing the index claim periodic work by it.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[0] < interval:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, now))
+            conn.execute('COMMIT')
+            return True
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    @staticmethod
+    def _insert(conn, prefix, users, clear, lock='BEGIN'):
+        """
+        Inserts `users` into the tables named with `prefix` in one transaction, previous
+        identifiers of the users are deleted first unless the tables were `clear`
+        """
+        count = 0
+        conn.execute(lock)
+        try:
+            for user, identifiers in users:
+                if not clear:
+                    conn.execute(f'DELETE FROM {prefix}identifiers WHERE user_id = ?', (user.id,))
+                conn.execute(f'INSERT OR REPLACE INTO {prefix}users (id, name) VALUES (?, ?)', (user.id, user.name))
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO {prefix}identifiers (attribute, value, user_id) VALUES (?, ?, ?)',
+                    [(attribute, str.lower(str(value)), user.id) for attribute, value in identifiers]
+                )
+                count += 1
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        return count
+
+    def _connection(self):
+        # connections must not be shared by forked worker processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,114 @@
+"""
+Cache shared by all nodes stored in memcached
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import hashlib
+import json
+import logging
+import math
+import os
+import socket
+import threading
+
+from perun.micro_services.cache.CacheBackendAbstract import CacheBackendAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class MemcachedCache(CacheBackendAbstract):
+    """
+    Cache stored in a memcached server speaking the text protocol.
+
+    Every thread keeps its own connection. Any network failure drops the
+    connection and is reported as a miss, so an unavailable memcached only
+    disables caching and never breaks the authentication.
+    """
+
+    DEFAULT_PORT = 11211
+    DEFAULT_TIMEOUT = 0.2
+    DEFAULT_PREFIX = 'perun:'
+
+    def __init__(self, server, timeout=DEFAULT_TIMEOUT, prefix=DEFAULT_PREFIX):
+        host, _, port = server.rpartition(':')
+        if not host:
+            host, port = port, self.DEFAULT_PORT
+
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def get(self, key):
+        try:
+            response = self._command(f'get {self._key(key)}\r\n'.encode())
+            if response.startswith(b'END'):
+                return None
+            header, _, rest = response.partition(b'\r\n')
+            length = int(header.split()[3])
+            return json.loads(rest[:length])
+        except (OSError, ValueError, IndexError) as ex:
+            self._disconnect(f'MemcachedCache.get - {ex}')
+            return None
+
+    def set(self, key, value, ttl):
+        data = json.dumps(value).encode()
+        # memcached treats zero as "never expire"
+        ttl = max(int(math.ceil(ttl)), 1)
+        try:
+            self._command(f'set {self._key(key)} 0 {ttl} {len(data)}\r\n'.encode() + data + b'\r\n')
+        except OSError as ex:
+            self._disconnect(f'MemcachedCache.set - {ex}')
+
+    def delete(self, key):
+        try:
+            self._command(f'delete {self._key(key)}\r\n'.encode())
+        except OSError as ex:
+            self._disconnect(f'MemcachedCache.delete - {ex}')
+
+    def clear(self):
+        try:
+            self._command(b'flush_all\r\n')
+        except OSError as ex:
+            self._disconnect(f'MemcachedCache.clear - {ex}')
+
+    def _key(self, key):
+        # memcached keys are limited to 250 characters without whitespace
+        return self.prefix + hashlib.sha1(key.encode()).hexdigest()
+
+    def _command(self, request):
+        sock = self._socket()
+        sock.sendall(request)
+
+        response = b''
+        while not self._is_complete(response):
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError('Connection closed by memcached.')
+            response += chunk
+        return response
+
+    @staticmethod
+    def _is_complete(response):
+        if not response.endswith(b'\r\n'):
+            return False
+        if response.startswith(b'VALUE'):
+            return response.endswith(b'\r\nEND\r\n')
+        return True
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def _disconnect(self, reason):
+        logger.warning(f'{reason}, dropping connection to memcached {self.address}.')
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
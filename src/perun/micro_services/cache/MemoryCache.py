@@ -0,0 +1,63 @@
+"""
+In-process LRU cache with per-entry TTL
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import threading
+import time
+from collections import OrderedDict
+
+from perun.micro_services.cache.CacheBackendAbstract import CacheBackendAbstract
+
+
+class MemoryCache(CacheBackendAbstract):
+    """
+    Thread-safe cache of a single process bounded to `max_size` entries.
+
+    The least recently used entry is evicted when the cache is full
+    and every entry expires `ttl` seconds after it was stored.
+    """
+
+    DEFAULT_MAX_SIZE = 10000
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError('MemoryCache - max_size must be a positive number.')
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,146 @@
+"""
+Command line tool building a CacheSnapshot from a dump of Perun LDAP
+
+Usage: python -m perun.micro_services.cache.SnapshotBuilder --output FILE
+           (--ldif DUMP.ldif | --perun-config perun_configuration.yml)
+           [--attribute NAME ...] [--issuer ENTITY_ID]
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import argparse
+import base64
+import logging
+import sys
+
+from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+from perun.micro_services.adapters.LdapFilterBuilder import LdapFilterBuilder
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotBuilder:
+    """
+    Maps every value of the identifier `attributes` of Perun user entries
+    to the user. Mappings are valid for logins released by `issuer`,
+    by default by any IdP.
+    """
+
+    USERS_FILTER = '(objectClass=perunUser)'
+
+    def __init__(self, attributes, issuer=CacheSnapshot.WILDCARD):
+        self.attributes = attributes
+        self.issuer = issuer
+
+    def mappings(self, entries):
+        for entry in entries:
+            if not entry.get('perunUserId'):
+                continue
+
+            user = LdapAdapter.create_user({
+                'perunUserId': entry['perunUserId'],
+                'displayName': entry.get('displayName') or [''],
+                'cn': entry.get('cn') or [''],
+            })
+            for attribute in self.attributes:
+                for value in entry.get(attribute, []):
+                    yield CacheSnapshot.get_key(self.issuer, value), user
+
+    def build(self, path, entries):
+        return CacheSnapshot.write(path, self.mappings(entries))
+
+    def search_ldap(self, adapter):
+        """
+        Returns all Perun users of the LDAP `adapter` is connected to, read by a paged search.
+        """
+        return adapter.connector.search_paged('ou=People,' + adapter.base, self.USERS_FILTER,
+                                              LdapAdapter.USER_ATTRIBUTES + self.attributes)
+
+    def read_ldif(self, lines):
+        """
+        Returns entries of the LDIF `lines` (RFC 2849 content records) with requested attributes
+        """
+        names = {str.lower(name): name for name in LdapAdapter.USER_ATTRIBUTES + self.attributes}
+        entry = {}
+        logical_line = None
+
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line.startswith(' ') and logical_line is not None:
+                logical_line += line[1:]
+                continue
+
+            if logical_line is not None:
+                self._parse_ldif_line(logical_line, names, entry)
+            logical_line = None
+
+            if not line:
+                if entry:
+                    yield entry
+                entry = {}
+            elif not line.startswith('#'):
+                logical_line = line
+
+        if logical_line is not None:
+            self._parse_ldif_line(logical_line, names, entry)
+        if entry:
+            yield entry
+
+    @staticmethod
+    def _parse_ldif_line(line, names, entry):
+        name, separator, value = line.partition(':')
+        name = names.get(str.lower(name.split(';')[0]))
+        if not separator or name is None:
+            return
+
+        if value.startswith(':'):
+            value = base64.b64decode(value[1:].strip()).decode('utf-8')
+        elif value.startswith('<'):
+            # values referenced by URL are not used by Perun users
+            return
+        else:
+            value = value.strip()
+
+        entry.setdefault(name, []).append(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Builds a snapshot of identity mappings from Perun LDAP.')
+    parser.add_argument('--output', required=True, help='path of the snapshot file')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ldif', help='LDIF dump of Perun LDAP, - for standard input')
+    source.add_argument('--perun-config', help='perun configuration, users are read from its LDAP')
+    parser.add_argument('--attribute', action='append', dest='attributes',
+                        help='LDAP attribute with identifiers of users, may be repeated '
+                             f'(default: identifier attributes of the perun configuration, '
+                             f'or {LdapFilterBuilder.DEFAULT_ATTRIBUTE})')
+    parser.add_argument('--issuer', default=CacheSnapshot.WILDCARD,
+                        help='entity id of the IdP releasing the identifiers (default: any IdP)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.perun_config is not None:
+        adapter = LdapAdapter(args.perun_config)
+        try:
+            attributes = args.attributes or adapter.filter_builder.attributes
+            builder = SnapshotBuilder(attributes, args.issuer)
+            count = builder.build(args.output, builder.search_ldap(adapter))
+        finally:
+            # stops the index sync of the configuration and unbinds the connections
+            adapter.close()
+    else:
+        builder = SnapshotBuilder(args.attributes or [LdapFilterBuilder.DEFAULT_ATTRIBUTE], args.issuer)
+        if args.ldif == '-':
+            count = builder.build(args.output, builder.read_ldif(sys.stdin))
+        else:
+            with open(args.ldif, 'r', encoding='utf-8') as f:
+                count = builder.build(args.output, builder.read_ldif(f))
+
+    logger.info(f'SnapshotBuilder - written {count} mappings to "{args.output}".')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
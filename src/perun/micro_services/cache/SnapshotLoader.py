@@ -0,0 +1,92 @@
+"""
+Class SnapshotLoader
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import os
+import threading
+
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotLoader:
+    """
+    Keeps the CacheSnapshot at `path` loaded.
+
+    With `refresh_interval` a background thread checks the file every
+    `refresh_interval` seconds and loads it again when it was replaced
+    (e.g. by a periodically run SnapshotBuilder). Snapshots older than
+    `max_age` seconds are not used.
+    """
+
+    DEFAULT_MAX_AGE = 86400
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE, refresh_interval=None):
+        self.path = path
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+
+        self.snapshot = None
+        self._mtime = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def get(self, issuer, uid):
+        snapshot = self.snapshot
+        if snapshot is None or (self.max_age is not None and snapshot.age > self.max_age):
+            return None
+        return snapshot.get(issuer, uid)
+
+    def load(self):
+        """
+        Loads the snapshot when the file changed since the last load, returns True when it was loaded.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as ex:
+            logger.warning(f'SnapshotLoader - snapshot "{self.path}" not available: {ex}')
+            return False
+
+        if mtime == self._mtime:
+            return False
+
+        try:
+            snapshot = CacheSnapshot(self.path)
+        except Exception as ex:
+            logger.warning(f'SnapshotLoader - unable to load snapshot "{self.path}": {ex}')
+            return False
+
+        if self.max_age is not None and snapshot.age > self.max_age:
+            logger.warning(f'SnapshotLoader - snapshot "{self.path}" is older than {self.max_age} seconds.')
+
+        # the previous snapshot is unmapped once no lookup references it
+        self.snapshot = snapshot
+        self._mtime = mtime
+        logger.info(f'SnapshotLoader - loaded {len(snapshot)} mappings from "{self.path}".')
+        return True
+
+    def start(self):
+        self.load()
+        if self.refresh_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='perun-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        # unmapped once no lookup references it
+        self.snapshot = None
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            self.load()
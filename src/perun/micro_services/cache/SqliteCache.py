@@ -0,0 +1,111 @@
+"""
+Cache shared by all processes on a host stored in a SQLite file
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from perun.micro_services.cache.CacheBackendAbstract import CacheBackendAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteCache(CacheBackendAbstract):
+    """
+    Cache stored in a SQLite database in WAL mode, so all worker processes
+    of a host read and warm the same entries concurrently.
+
+    Expired entries and entries over `max_size` (the ones expiring first)
+    are purged on every `purge_interval`-th write.
+    """
+
+    DEFAULT_MAX_SIZE = 100000
+    DEFAULT_PURGE_INTERVAL = 1000
+    BUSY_TIMEOUT = 1
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE, purge_interval=DEFAULT_PURGE_INTERVAL):
+        self.path = path
+        self.max_size = max_size
+        self.purge_interval = purge_interval
+
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)')
+
+    def get(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT value FROM cache WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as ex:
+            logger.warning(f'SqliteCache.get - unable to read from {self.path}: {ex}')
+            return None
+
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+        except sqlite3.Error as ex:
+            logger.warning(f'SqliteCache.set - unable to write to {self.path}: {ex}')
+            return
+
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % self.purge_interval == 0
+
+        if purge:
+            self.purge()
+
+    def delete(self, key):
+        try:
+            self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as ex:
+            logger.warning(f'SqliteCache.delete - unable to write to {self.path}: {ex}')
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM cache')
+        except sqlite3.Error as ex:
+            logger.warning(f'SqliteCache.clear - unable to write to {self.path}: {ex}')
+
+    def purge(self):
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+            conn.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_size,)
+            )
+        except sqlite3.Error as ex:
+            logger.warning(f'SqliteCache.purge - unable to write to {self.path}: {ex}')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def _connection(self):
+        # connections must not be shared by forked worker processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
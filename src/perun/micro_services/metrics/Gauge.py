@@ -0,0 +1,60 @@
+"""
+Class Gauge
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Gauge:
+    """
+    Value per combination of label values, which can go up and down.
+
+    The value is either set directly or read from a function at the time
+    of collection, which keeps e.g. pool utilisation off the hot path.
+    """
+
+    TYPE = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, function, labels=()):
+        with self._lock:
+            self._functions[labels] = function
+
+    def get(self, labels=()):
+        function = self._functions.get(labels)
+        if function is not None:
+            return function()
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+            functions = list(self._functions.items())
+
+        for labels, value in values:
+            yield self.name, tuple(zip(self.labelnames, labels)), value
+
+        for labels, function in functions:
+            try:
+                value = function()
+            except Exception as ex:
+                logger.debug(f'Gauge {self.name} - unable to read value: {ex}')
+                continue
+            yield self.name, tuple(zip(self.labelnames, labels)), value
@@ -0,0 +1,57 @@
+"""
+Class Histogram
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import threading
+from bisect import bisect_left
+
+
+class Histogram:
+    """
+    Counts observed values (e.g. latencies in seconds) in fixed cumulative
+    buckets per combination of label values.
+    """
+
+    TYPE = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def get_count(self, labels=()):
+        series = self._values.get(labels)
+        return sum(series[0]) if series is not None else 0
+
+    def get_sum(self, labels=()):
+        series = self._values.get(labels)
+        return series[1] if series is not None else 0.0
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+
+        for labels, counts, total in values:
+            label_pairs = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', label_pairs + (('le', bound),), cumulative
+            yield f'{self.name}_sum', label_pairs, total
+            yield f'{self.name}_count', label_pairs, cumulative
@@ -0,0 +1,110 @@
+"""
+Class Metrics
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import threading
+
+from perun.micro_services.metrics.MetricsExporter import MetricsExporter
+from perun.micro_services.metrics.MetricsRegistry import MetricsRegistry
+from perun.micro_services.metrics.NullRegistry import NullRegistry
+
+
+class Metrics:
+    """
+    Process wide metrics registry.
+
+    Until metrics are enabled the registry is a NullRegistry, so the
+    instrumented code records into no-op metrics. Components pick their
+    metrics up when they are created, metrics therefore have to be
+    configured before the adapters are.
+    """
+
+    BACKEND_REQUEST_SECONDS = 'perun_backend_request_seconds'
+    BACKEND_ERRORS = 'perun_backend_errors_total'
+    POOL_CONNECTIONS = 'perun_pool_connections'
+    LDAP_EJECTED_SERVERS = 'perun_ldap_ejected_servers'
+    CACHE_REQUESTS = 'perun_cache_requests_total'
+    CACHE_HIT_RATIO = 'perun_cache_hit_ratio'
+    COALESCED_CALLS = 'perun_coalesced_calls_total'
+    DEADLINE_EXCEEDED = 'perun_deadline_exceeded_total'
+    PROCESS_SECONDS = 'perun_identity_process_seconds'
+
+    TIMEOUT = 'timeout'
+    ERROR = 'error'
+
+    registry = NullRegistry()
+    exporter = None
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def configure(config):
+        with Metrics._lock:
+            if not Metrics.registry.enabled:
+                Metrics.registry = MetricsRegistry()
+
+            if Metrics.exporter is None:
+                Metrics.exporter = MetricsExporter.get_instance(config, Metrics.registry)
+                Metrics.exporter.start()
+
+        return Metrics.registry
+
+    @staticmethod
+    def enable():
+        with Metrics._lock:
+            if not Metrics.registry.enabled:
+                Metrics.registry = MetricsRegistry()
+        return Metrics.registry
+
+    @staticmethod
+    def disable():
+        with Metrics._lock:
+            if Metrics.exporter is not None:
+                Metrics.exporter.close()
+                Metrics.exporter = None
+            Metrics.registry = NullRegistry()
+
+    @staticmethod
+    def backend_request_seconds():
+        return Metrics.registry.histogram(Metrics.BACKEND_REQUEST_SECONDS, 'Duration of Perun LDAP/RPC requests.',
+                                          ('backend', 'method'))
+
+    @staticmethod
+    def backend_errors():
+        return Metrics.registry.counter(Metrics.BACKEND_ERRORS, 'Failed Perun LDAP/RPC requests.',
+                                        ('backend', 'method', 'kind'))
+
+    @staticmethod
+    def pool_connections():
+        return Metrics.registry.gauge(Metrics.POOL_CONNECTIONS, 'Connections of the Perun connection pools.',
+                                      ('backend', 'state'))
+
+    @staticmethod
+    def ldap_ejected_servers():
+        return Metrics.registry.gauge(Metrics.LDAP_EJECTED_SERVERS,
+                                      'Perun LDAP hosts ejected from the selection after failures.')
+
+    @staticmethod
+    def cache_requests():
+        return Metrics.registry.counter(Metrics.CACHE_REQUESTS, 'Lookups answered by the cache of Perun users.',
+                                        ('result',))
+
+    @staticmethod
+    def cache_hit_ratio():
+        return Metrics.registry.gauge(Metrics.CACHE_HIT_RATIO, 'Ratio of lookups answered by the cache.')
+
+    @staticmethod
+    def coalesced_calls():
+        return Metrics.registry.counter(Metrics.COALESCED_CALLS,
+                                        'Lookups answered by an in-flight lookup of the same user.')
+
+    @staticmethod
+    def deadline_exceeded():
+        return Metrics.registry.counter(Metrics.DEADLINE_EXCEEDED, 'Lookups aborted after spending the time budget.')
+
+    @staticmethod
+    def process_seconds():
+        return Metrics.registry.histogram(Metrics.PROCESS_SECONDS, 'Duration of PerunIdentity.process.',
+                                          ('result',))
@@ -0,0 +1,36 @@
+"""
+Class MetricsExporter
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import importlib
+
+from perun.micro_services.metrics.MetricsExporterAbstract import MetricsExporterAbstract
+
+
+class MetricsExporter:
+
+    EXPORTER = 'exporter'
+    ADDRESS = 'address'
+    PORT = 'port'
+
+    @staticmethod
+    def get_instance(config, registry):
+        exporter = config.get(MetricsExporter.EXPORTER, MetricsExporterAbstract.PROMETHEUS)
+
+        if str.lower(exporter) == MetricsExporterAbstract.PROMETHEUS:
+            # imports http.server, loaded only when metrics are exported
+            from perun.micro_services.metrics.PrometheusExporter import PrometheusExporter
+            return PrometheusExporter(
+                registry,
+                config.get(MetricsExporter.ADDRESS, PrometheusExporter.DEFAULT_ADDRESS),
+                config.get(MetricsExporter.PORT, None)
+            )
+
+        module_name, _, class_name = exporter.rpartition('.')
+        if not module_name:
+            raise Exception(f'MetricsExporter: Unknown metrics exporter "{exporter}".')
+
+        exporter_class = getattr(importlib.import_module(module_name), class_name)
+        return exporter_class(registry, config)
@@ -0,0 +1,26 @@
+"""
+Abstract class MetricsExporterAbstract
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+from abc import ABC, abstractmethod
+
+
+class MetricsExporterAbstract(ABC):
+    """
+    Publishes metrics of a registry.
+
+    Custom exporters are configured by their dotted class path and are
+    created with the registry and the `metrics` configuration.
+    """
+
+    PROMETHEUS = 'prometheus'
+
+    @abstractmethod
+    def start(self):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
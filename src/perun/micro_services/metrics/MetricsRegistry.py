@@ -0,0 +1,49 @@
+"""
+Class MetricsRegistry
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import threading
+
+from perun.micro_services.metrics.Counter import Counter
+from perun.micro_services.metrics.Gauge import Gauge
+from perun.micro_services.metrics.Histogram import Histogram
+
+
+class MetricsRegistry:
+    """
+    Holds metrics by name. Asking for an already registered metric returns
+    the existing one, so every component can simply ask for what it records.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def collect(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _register(self, metric_class, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            elif not isinstance(metric, metric_class):
+                raise Exception(f'MetricsRegistry: Metric "{name}" is already registered as {metric.TYPE}.')
+            return metric
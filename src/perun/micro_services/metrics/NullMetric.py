@@ -0,0 +1,29 @@
+"""
+Class NullMetric
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+
+class NullMetric:
+    """
+    Metric ignoring everything recorded into it.
+    """
+
+    def inc(self, labels=(), amount=1):
+        pass
+
+    def set(self, value, labels=()):
+        pass
+
+    def set_function(self, function, labels=()):
+        pass
+
+    def observe(self, value, labels=()):
+        pass
+
+    def samples(self):
+        return iter(())
+
+
+NullMetric.INSTANCE = NullMetric()
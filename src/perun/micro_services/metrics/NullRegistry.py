@@ -0,0 +1,31 @@
+"""
+Class NullRegistry
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+from perun.micro_services.metrics.NullMetric import NullMetric
+
+
+class NullRegistry:
+    """
+    Registry used while metrics are disabled, every metric it hands out
+    is the same no-op NullMetric.
+    """
+
+    enabled = False
+
+    def counter(self, name, documentation, labelnames=()):
+        return NullMetric.INSTANCE
+
+    def gauge(self, name, documentation, labelnames=()):
+        return NullMetric.INSTANCE
+
+    def histogram(self, name, documentation, labelnames=(), buckets=None):
+        return NullMetric.INSTANCE
+
+    def get(self, name):
+        return None
+
+    def collect(self):
+        return []
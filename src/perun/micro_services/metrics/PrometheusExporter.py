@@ -0,0 +1,95 @@
+"""
+Class PrometheusExporter
+"""
+__author__ = "Pavel Vyskocil"
+__email__ = "Pavel.Vyskocil@cesnet.cz"
+
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from perun.micro_services.metrics.MetricsExporterAbstract import MetricsExporterAbstract
+
+logger = logging.getLogger(__name__)
+
+
+class PrometheusExporter(MetricsExporterAbstract):
+    """
+    Renders metrics in the Prometheus text exposition format and, when
+    `port` is set, serves them over HTTP from a daemon thread.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    DEFAULT_ADDRESS = '127.0.0.1'
+
+    def __init__(self, registry, address=DEFAULT_ADDRESS, port=None):
+        self.registry = registry
+        self.address = address
+        self.port = port
+        self.server = None
+
+    def start(self):
+        if self.port is None or self.server is not None:
+            return
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PrometheusExporter.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.address, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='perun-metrics', daemon=True).start()
+        logger.info(f'PrometheusExporter - serving metrics on {self.address}:{self.server.server_port}.')
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def render(self):
+        lines = []
+        for metric in self.registry.collect():
+            lines.append(f'# HELP {metric.name} {self.escape(metric.documentation, False)}')
+            lines.append(f'# TYPE {metric.name} {metric.TYPE}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{self.format_labels(labels)} {self.format_value(value)}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ''
+        pairs = ','.join(
+            f'{name}="{PrometheusExporter.escape(PrometheusExporter.format_value(value))}"' for name, value in labels
+        )
+        return '{' + pairs + '}'
+
+    @staticmethod
+    def format_value(value):
+        if isinstance(value, str):
+            return value
+        if isinstance(value, bool):
+            return str(int(value))
+        if isinstance(value, float):
+            if math.isinf(value):
+                return '+Inf' if value > 0 else '-Inf'
+            if math.isnan(value):
+                return 'NaN'
+        return repr(value)
+
+    @staticmethod
+    def escape(value, quotes=True):
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+        return value.replace('"', '\\"') if quotes else value
@@ -8,10 +8,18 @@ from perun.micro_services.models.ObjectWithId import ObjectWithId
 
 
 class User(ObjectWithId):
+    """
+    Perun user. `attributes` (dict of attribute values), `vos` and `groups`
+    (lists of Vo and Group objects the user is member of) are None unless
+    they were requested from the adapter.
+    """
 
-    def __init__(self, id, name):
+    def __init__(self, id, name, attributes=None, vos=None, groups=None):
         super().__init__(id)
         self.name = name
+        self.attributes = attributes
+        self.vos = vos
+        self.groups = groups
 
     def __str__(self):
         return f'User[id: {self.id}, name: {self.name}]'
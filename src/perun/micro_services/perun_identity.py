@@ -6,9 +6,21 @@ __author__ = "Pavel Vyskocil"
 __email__ = "Pavel.Vyskocil@cesnet.cz"
 
 import logging
+import time
 
+from perun.micro_services.adapters.AdapterRegistry import AdapterRegistry
+from perun.micro_services.adapters.CachingAdapter import CachingAdapter
+from perun.micro_services.adapters.CircuitBreaker import CircuitBreaker
+from perun.micro_services.adapters.CircuitBreakerAdapter import CircuitBreakerAdapter
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
 from perun.micro_services.adapters.PerunAdapter import PerunAdapter
 from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+from perun.micro_services.adapters.ReloadingAdapter import ReloadingAdapter
+from perun.micro_services.adapters.SingleFlightAdapter import SingleFlightAdapter
+from perun.micro_services.cache.CacheBackend import CacheBackend
+from perun.micro_services.cache.IdentifierStats import IdentifierStats
+from perun.micro_services.cache.SnapshotLoader import SnapshotLoader
+from perun.micro_services.metrics.Metrics import Metrics
 from satosa.micro_services.base import ResponseMicroService
 
 logger = logging.getLogger(__name__)
@@ -16,8 +28,39 @@ logger = logging.getLogger(__name__)
 
 class PerunIdentity(ResponseMicroService):
     INTERFACE = 'interface'
+    ASYNCIO = 'asyncio'
     UIDS_IDENTIFIERS = 'uids_identifiers'
+    IDENTIFIER_ORDER = 'identifier_order'
+    IDENTIFIER_ORDER_ISSUERS = 'issuers'
+    IDENTIFIER_ORDER_ADAPTIVE = 'adaptive'
+    IDENTIFIER_ORDER_STATS_PATH = 'stats_path'
+    IDENTIFIER_ORDER_SAVE_INTERVAL = 'save_interval'
+    USER_ATTRIBUTES = 'user_attributes'
+    MEMBERSHIPS = 'memberships'
     PERUN_CONFIG_FILE_NAME = 'perun_config_file_name'
+    CACHE = 'cache'
+    CACHE_TTL = 'ttl'
+    CACHE_NEGATIVE_TTL = 'negative_ttl'
+    CACHE_STALE_TTL = 'stale_ttl'
+    CACHE_BACKGROUND_REVALIDATION = 'background_revalidation'
+    CACHE_SNAPSHOT = 'snapshot'
+    SNAPSHOT_PATH = 'path'
+    SNAPSHOT_MAX_AGE = 'max_age'
+    SNAPSHOT_REFRESH_INTERVAL = 'refresh_interval'
+    CIRCUIT_BREAKER = 'circuit_breaker'
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = 'failure_threshold'
+    CIRCUIT_BREAKER_RESET_TIMEOUT = 'reset_timeout'
+    CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD = 'slow_call_threshold'
+    SINGLE_FLIGHT = 'single_flight'
+    SHARED_ADAPTER = 'shared_adapter'
+    RELOAD_INTERVAL = 'reload_interval'
+    WARM_UP = 'warm_up'
+    METRICS = 'metrics'
+    DEADLINE = 'deadline'
+
+    PERUN_ID = 'perun_id'
+    PERUN_VOS = 'perun_vos'
+    PERUN_GROUPS = 'perun_groups'
 
     logprefix = "PerunIdentity:"
 
@@ -27,33 +70,208 @@ class PerunIdentity(ResponseMicroService):
         self.config = config
 
         self.uids_identifiers = config.get(self.UIDS_IDENTIFIERS, [])
+        order_config = config.get(self.IDENTIFIER_ORDER, None) or {}
+        self.issuer_identifiers = order_config.get(self.IDENTIFIER_ORDER_ISSUERS, None) or {}
+        self.identifier_stats = None
+        if order_config.get(self.IDENTIFIER_ORDER_ADAPTIVE, False):
+            self.identifier_stats = IdentifierStats(
+                order_config.get(self.IDENTIFIER_ORDER_STATS_PATH, None),
+                order_config.get(self.IDENTIFIER_ORDER_SAVE_INTERVAL, IdentifierStats.DEFAULT_SAVE_INTERVAL)
+            )
         confif_file_name = config.get(self.PERUN_CONFIG_FILE_NAME, None)
 
         if confif_file_name is None:
             raise Exception(f'PerunIdentity: Required option "{self.PERUN_CONFIG_FILE_NAME}" not defined.')
 
+        metrics_config = config.get(self.METRICS, None)
+        if metrics_config is not None:
+            # before the adapters, which pick their metrics up when created
+            Metrics.configure(metrics_config)
+        self.process_seconds = Metrics.process_seconds()
+        self.deadline_exceeded = Metrics.deadline_exceeded()
+        self.deadline = config.get(self.DEADLINE, None)
+
+        if config.get(self.SHARED_ADAPTER, False):
+            options = {key: value for key, value in config.items()
+                       if key not in [self.UIDS_IDENTIFIERS, self.IDENTIFIER_ORDER]}
+            self.adapter: PerunAdapterAbstract = AdapterRegistry.get_instance(
+                confif_file_name, options, lambda: self.create_adapter(confif_file_name)
+            )
+        else:
+            self.adapter: PerunAdapterAbstract = self.create_adapter(confif_file_name)
+
+        if config.get(self.WARM_UP, False):
+            try:
+                self.adapter.warm_up()
+            except Exception as ex:
+                # connections are opened by the first lookup instead
+                logger.warning(f'{self.logprefix} Unable to warm up connections to Perun: {ex}')
+
+    def create_adapter(self, config_file_name):
+        """
+        Creates adapter of the configured interface wrapped by the configured
+        circuit breaker, single-flight and cache adapters
+        """
+        config = self.config
         interface = str.lower(config.get(self.INTERFACE))
-        self.adapter: PerunAdapterAbstract = PerunAdapter.get_instance(confif_file_name, interface)
+        attributes = config.get(self.USER_ATTRIBUTES, None)
+        memberships = config.get(self.MEMBERSHIPS, False)
+        if config.get(self.ASYNCIO, False):
+            def factory(config_file):
+                return PerunAdapter.get_async_instance_shim(config_file, interface, attributes, memberships)
+        else:
+            def factory(config_file):
+                return PerunAdapter.get_instance(config_file, interface, attributes, memberships)
+
+        reload_interval = config.get(self.RELOAD_INTERVAL, None)
+        if reload_interval:
+            # circuit breaker and cache wrap the reloaded adapter and keep their state
+            adapter = ReloadingAdapter(factory, config_file_name, reload_interval)
+        else:
+            adapter = factory(config_file_name)
+
+        breaker_config = config.get(self.CIRCUIT_BREAKER, None)
+        if breaker_config is not None:
+            adapter = CircuitBreakerAdapter(adapter, CircuitBreaker(
+                interface,
+                failure_threshold=breaker_config.get(self.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                                                     CircuitBreaker.DEFAULT_FAILURE_THRESHOLD),
+                reset_timeout=breaker_config.get(self.CIRCUIT_BREAKER_RESET_TIMEOUT,
+                                                 CircuitBreaker.DEFAULT_RESET_TIMEOUT),
+                slow_call_threshold=breaker_config.get(self.CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD,
+                                                       CircuitBreaker.DEFAULT_SLOW_CALL_THRESHOLD)
+            ))
+
+        if config.get(self.SINGLE_FLIGHT, False):
+            adapter = SingleFlightAdapter(adapter)
+
+        cache_config = config.get(self.CACHE, None)
+        if cache_config is not None:
+            snapshot_config = cache_config.get(self.CACHE_SNAPSHOT, None)
+            adapter = CachingAdapter(
+                adapter,
+                CacheBackend.get_instance(cache_config),
+                ttl=cache_config.get(self.CACHE_TTL, CachingAdapter.DEFAULT_TTL),
+                negative_ttl=cache_config.get(self.CACHE_NEGATIVE_TTL, CachingAdapter.DEFAULT_NEGATIVE_TTL),
+                stale_ttl=cache_config.get(self.CACHE_STALE_TTL, CachingAdapter.DEFAULT_STALE_TTL),
+                background_revalidation=cache_config.get(self.CACHE_BACKGROUND_REVALIDATION, False),
+                snapshot=self.load_snapshot(snapshot_config) if snapshot_config is not None else None
+            )
+
+        return adapter
+
+    def load_snapshot(self, snapshot_config):
+        """
+        Startup hook loading the snapshot of identity mappings, which answers
+        first logins after a restart instead of Perun. Returns None when users
+        are read with attributes or memberships, which the snapshot does not have.
+        """
+        path = snapshot_config.get(self.SNAPSHOT_PATH, None)
+        if path is None:
+            raise Exception(f'PerunIdentity: Required option "{self.CACHE}.{self.CACHE_SNAPSHOT}.'
+                            f'{self.SNAPSHOT_PATH}" not defined.')
+
+        if self.config.get(self.USER_ATTRIBUTES, None) or self.config.get(self.MEMBERSHIPS, False):
+            logger.warning(f'{self.logprefix} Snapshot is not used, its users have no attributes and memberships.')
+            return None
+
+        return SnapshotLoader(
+            path,
+            max_age=snapshot_config.get(self.SNAPSHOT_MAX_AGE, SnapshotLoader.DEFAULT_MAX_AGE),
+            refresh_interval=snapshot_config.get(self.SNAPSHOT_REFRESH_INTERVAL, None)
+        ).start()
+
+    def get_published_attributes(self, user):
+        """
+        Returns perun_id, requested attributes and memberships of `user` stored into data.attributes
+        """
+        published = {self.PERUN_ID: [user.id]}
+        for name, value in (user.attributes or {}).items():
+            if value is not None:
+                published[name] = value if isinstance(value, list) else [value]
+        if user.vos is not None:
+            published[self.PERUN_VOS] = [vo.short_name for vo in user.vos]
+        if user.groups is not None:
+            published[self.PERUN_GROUPS] = [group.unique_name for group in user.groups]
+        return published
+
+    def get_identifiers(self, idp_entity_id):
+        """
+        Returns identifiers searched for users of `idp_entity_id`: the ones configured
+        for the IdP, or uids_identifiers in the learned order when adaptive
+        """
+        identifiers = self.issuer_identifiers.get(idp_entity_id, None)
+        if identifiers is not None:
+            return identifiers
+        if self.identifier_stats is not None:
+            return self.identifier_stats.order(idp_entity_id, self.uids_identifiers)
+        return self.uids_identifiers
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers):
+        """
+        Looks the user up by all uids at once. With learned order and an adapter asking Perun
+        for the uids one by one anyway, the uids are looked up one by one here, which records
+        the identifier finding the user. Adapters searching all uids by one query
+        (e.g. one LDAP filter) get them at once, their order does not matter.
+        """
+        if self.identifier_stats is None or idp_entity_id in self.issuer_identifiers or len(uids) < 2 \
+                or not self.adapter.queries_per_uid:
+            return self.adapter.get_perun_user(idp_entity_id, uids, identifiers)
+
+        for uid, identifier in zip(uids, identifiers):
+            user = self.adapter.get_perun_user(idp_entity_id, [uid], [identifier])
+            self.identifier_stats.record(idp_entity_id, identifier, user is not None)
+            if user is not None:
+                return user
+        return None
+
+    def close(self):
+        """
+        Saves the learned order of identifiers, e.g. at shutdown of the worker
+        """
+        if self.identifier_stats is not None:
+            self.identifier_stats.close()
 
     def process(self, context, data):
         """
-        Finds Perun user and store perunUserId into data.attributes
+        Finds Perun user and store perunUserId, its attributes and memberships into data.attributes
         """
+        start_time = time.perf_counter()
         idp_entity_id = data.auth_info['issuer']
         attributes = data.attributes
 
         uids = []
+        identifiers = []
 
-        for identifier in self.uids_identifiers:
+        for identifier in self.get_identifiers(idp_entity_id):
             if identifier in attributes.keys():
                 uid = attributes[identifier][0]
                 uids.append(uid)
+                identifiers.append(identifier)
 
-        user = self.adapter.get_perun_user(idp_entity_id, uids)
+        with Deadline.start(self.deadline) as deadline:
+            try:
+                user = self.get_perun_user(idp_entity_id, uids, identifiers)
+                result = 'not_found' if user is None else 'found'
+            except Exception as ex:
+                user = None
+                if isinstance(ex, DeadlineExceeded) or (deadline is not None and deadline.exceeded):
+                    # authentication continues without Perun user instead of waiting longer
+                    logger.warning(f'{self.logprefix} Perun user not found within {self.deadline} seconds: {ex}')
+                    self.deadline_exceeded.inc()
+                    result = 'deadline'
+                else:
+                    # Perun is unavailable, authentication continues without Perun user
+                    logger.error(f'{self.logprefix} Unable to get user from Perun: {ex}')
+                    result = 'error'
 
-        logger.debug(f'User: {user} found')
         if user is not None:
-            attributes.update({'perun_id': [user.id]})
+            if logger.isEnabledFor(logging.DEBUG):
+                # only the id, the name is personal data
+                logger.debug(f'{self.logprefix} User {user.id} found')
+            attributes.update(self.get_published_attributes(user))
             data.attributes = attributes
 
+        self.process_seconds.observe(time.perf_counter() - start_time, (result,))
+
         return super().process(context, data)
@@ -1,5 +1,13 @@
+import re
 import time
+import urllib.parse
 
 
 def milli_time():
     return time.time_ns() // 1000000
+
+
+def build_rpc_query(params):
+    params_query = urllib.parse.urlencode(params)
+    # Perun expects list parameters as name[]=value
+    return re.sub(r'%5B\d+%5D', '%5B%5D', params_query)
@@ -0,0 +1,63 @@
+import threading
+
+import mock
+from perun.micro_services.adapters.AdapterRegistry import AdapterRegistry
+from perun.micro_services.adapters.CachingAdapter import CachingAdapter
+from perun.micro_services.adapters.CircuitBreakerAdapter import CircuitBreakerAdapter
+from perun.micro_services.adapters.SingleFlightAdapter import SingleFlightAdapter
+
+
+class TestAdapterRegistry:
+
+    def test_shared_per_config_and_options(self, tmp_path):
+        config_file = str(tmp_path / 'perun_configuration.yml')
+        factory = mock.Mock(side_effect=lambda: mock.Mock(spec=['get_perun_user', 'close']))
+
+        try:
+            first = AdapterRegistry.get_instance(config_file, {'interface': 'ldap'}, factory)
+            second = AdapterRegistry.get_instance(str(tmp_path / '.' / 'perun_configuration.yml'),
+                                                  {'interface': 'ldap'}, factory)
+            other = AdapterRegistry.get_instance(config_file, {'interface': 'rpc'}, factory)
+        finally:
+            AdapterRegistry.clear()
+
+        assert first is second
+        assert first is not other
+        assert factory.call_count == 2
+        first.close.assert_called_once()
+
+    def test_close_wrapped_adapters(self):
+        inner = mock.Mock(spec=['get_perun_user', 'close'])
+        snapshot = mock.Mock(spec=['get', 'close'])
+        adapter = CachingAdapter(SingleFlightAdapter(CircuitBreakerAdapter(inner)), snapshot=snapshot)
+
+        AdapterRegistry.close_adapter(adapter)
+
+        inner.close.assert_called_once()
+        snapshot.close.assert_called_once()
+
+    def test_factory_blocks_only_its_key(self, tmp_path):
+        config_file = str(tmp_path / 'perun_configuration.yml')
+        creating = threading.Event()
+        release = threading.Event()
+
+        def slow_factory():
+            creating.set()
+            release.wait(5)
+            return mock.Mock(spec=['close'])
+
+        try:
+            thread = threading.Thread(target=AdapterRegistry.get_instance,
+                                      args=(config_file, {'interface': 'ldap'}, slow_factory))
+            thread.start()
+            creating.wait(5)
+
+            other = AdapterRegistry.get_instance(config_file, {'interface': 'rpc'}, lambda: mock.Mock(spec=['close']))
+            assert thread.is_alive()
+            release.set()
+            thread.join()
+        finally:
+            release.set()
+            AdapterRegistry.clear()
+
+        assert other is not None
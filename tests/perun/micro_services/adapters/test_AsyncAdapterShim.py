@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+from perun.micro_services.adapters.AsyncAdapterShim import AsyncAdapterShim
+from perun.micro_services.adapters.AsyncPerunAdapterAbstract import AsyncPerunAdapterAbstract
+from perun.micro_services.models.User import User
+
+
+class FakeAsyncAdapter(AsyncPerunAdapterAbstract):
+
+    def __init__(self):
+        self.threads = set()
+        self.closed = False
+
+    async def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        self.threads.add(threading.current_thread().name)
+        await asyncio.sleep(0.01)
+        return User(uids[0], 'Test user')
+
+    async def close(self):
+        self.closed = True
+
+
+class TestAsyncAdapterShim:
+
+    def test_get_perun_user(self):
+        shim = AsyncAdapterShim(FakeAsyncAdapter())
+
+        user = shim.get_perun_user('https://idp.example.com', ['a@example.com'])
+        shim.close()
+
+        assert user.id == 'a@example.com'
+        assert shim.adapter.closed
+
+    def test_calls_share_event_loop(self):
+        shim = AsyncAdapterShim(FakeAsyncAdapter())
+        users = []
+
+        threads = [threading.Thread(target=lambda i=i: users.append(shim.get_perun_user('idp', [i])))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        shim.close()
+
+        assert sorted(user.id for user in users) == list(range(5))
+        assert shim.adapter.threads == {'perun-asyncio'}
+
+    def test_get_perun_users(self):
+        shim = AsyncAdapterShim(FakeAsyncAdapter())
+
+        users = shim.get_perun_users('idp', [['a@example.com', 'b@example.com'], ['c@example.com']])
+        shim.close()
+
+        assert users['a@example.com'].id == users['b@example.com'].id == 'a@example.com'
+        assert users['c@example.com'].id == 'c@example.com'
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+from ldap3.protocol.rfc4511 import (LDAPMessage, MessageID, ProtocolOp, BindResponse, ResultCode, SearchResultEntry,
+                                    SearchResultDone, PartialAttributeList, PartialAttribute, AttributeDescription,
+                                    Vals, AttributeValue, LDAPDN)
+from ldap3.strategy.base import BaseStrategy
+from ldap3.utils.asn1 import encode
+from perun.micro_services.adapters.AsyncLdapConnector import AsyncLdapConnector
+
+
+class FakePerunLdapServer:
+    """
+    Answers bind and search requests, a search returns every entry with a value
+    contained in the raw request. Searches are answered after `delay` seconds,
+    the first search the slowest, so responses arrive out of order.
+    """
+
+    BIND_REQUEST = 0x60
+    SEARCH_REQUEST = 0x63
+
+    ENTRIES = {
+        'perunUserId=1,ou=People,dc=perun': {'perunUserId': ['1'], 'displayName': ['Test User'],
+                                             'eduPersonPrincipalNames': ['a@example.com']},
+        'perunUserId=2,ou=People,dc=perun': {'perunUserId': ['2'], 'displayName': ['Other User'],
+                                             'eduPersonPrincipalNames': ['b@example.com']},
+    }
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.connections = 0
+        self.searches = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        data = b''
+        while True:
+            length = BaseStrategy.compute_ldap_message_size(data)
+            if length == -1 or len(data) < length:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                data += chunk
+                continue
+
+            message, data = data[:length], data[length:]
+            message_id, operation = self.parse(message)
+            if operation == self.BIND_REQUEST:
+                writer.write(self.bind_response(message_id, b'password' in message))
+            elif operation == self.SEARCH_REQUEST:
+                self.searches += 1
+                asyncio.ensure_future(self.search(writer, message_id, message, self.delay / self.searches))
+        writer.close()
+
+    async def search(self, writer, message_id, message, delay):
+        await asyncio.sleep(delay)
+        for dn, attributes in self.ENTRIES.items():
+            if attributes['eduPersonPrincipalNames'][0].encode() in message:
+                writer.write(self.search_entry(message_id, dn, attributes))
+        writer.write(self.message(message_id, 'searchResDone', self.result(SearchResultDone(), 0)))
+
+    @staticmethod
+    def parse(message):
+        position = 2 + (message[1] & 0x7f if message[1] & 0x80 else 0)
+        id_length = message[position + 1]
+        message_id = int.from_bytes(message[position + 2:position + 2 + id_length], 'big')
+        return message_id, message[position + 2 + id_length]
+
+    @staticmethod
+    def message(message_id, message_type, operation):
+        message = LDAPMessage()
+        message['messageID'] = MessageID(message_id)
+        message['protocolOp'] = ProtocolOp().setComponentByName(message_type, operation)
+        return encode(message)
+
+    @staticmethod
+    def result(operation, code):
+        operation['resultCode'] = ResultCode(code)
+        operation['matchedDN'] = ''
+        operation['diagnosticMessage'] = ''
+        return operation
+
+    def bind_response(self, message_id, success):
+        return self.message(message_id, 'bindResponse', self.result(BindResponse(), 0 if success else 49))
+
+    def search_entry(self, message_id, dn, attributes):
+        entry = SearchResultEntry()
+        entry['object'] = LDAPDN(dn)
+        attribute_list = PartialAttributeList()
+        for index, (name, values) in enumerate(attributes.items()):
+            attribute = PartialAttribute()
+            attribute['type'] = AttributeDescription(name)
+            vals = Vals()
+            for value_index, value in enumerate(values):
+                vals.setComponentByPosition(value_index, AttributeValue(value))
+            attribute['vals'] = vals
+            attribute_list.setComponentByPosition(index, attribute)
+        entry['attributes'] = attribute_list
+        return self.message(message_id, 'searchResEntry', entry)
+
+
+class TestAsyncLdapConnector:
+
+    BASE = 'ou=People,dc=perun'
+    ATTRIBUTES = ['perunUserId', 'displayName', 'cn']
+
+    @staticmethod
+    def run(fake_server, test, password='password'):
+        async def main():
+            server = await asyncio.start_server(fake_server.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            connector = AsyncLdapConnector([f'ldap://127.0.0.1:{port}'], 'cn=admin', password)
+            try:
+                return await test(connector)
+            finally:
+                await connector.close()
+                server.close()
+
+        return asyncio.run(main())
+
+    def test_search_for_entity(self):
+        async def test(connector):
+            return await connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=a@example.com)',
+                                                     self.ATTRIBUTES)
+
+        entry = self.run(FakePerunLdapServer(), test)
+
+        assert entry['perunUserId'] == ['1']
+        assert entry['displayName'] == ['Test User']
+        assert entry['cn'] == []
+
+    def test_search_for_entity_not_found(self):
+        async def test(connector):
+            return await connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=c@example.com)',
+                                                     self.ATTRIBUTES)
+
+        assert self.run(FakePerunLdapServer(), test) is None
+
+    def test_concurrent_searches_on_one_connection(self):
+        fake_server = FakePerunLdapServer(delay=0.2)
+
+        async def test(connector):
+            return await asyncio.gather(
+                connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=a@example.com)', self.ATTRIBUTES),
+                connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=b@example.com)', self.ATTRIBUTES),
+            )
+
+        first, second = self.run(fake_server, test)
+
+        assert first['perunUserId'] == ['1']
+        assert second['perunUserId'] == ['2']
+        assert fake_server.connections == 1
+
+    def test_bind_failure(self):
+        async def test(connector):
+            return await connector.search(self.BASE, '(eduPersonPrincipalNames=a@example.com)')
+
+        with pytest.raises(Exception):
+            self.run(FakePerunLdapServer(), test, password='wrong')
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+from perun.micro_services.adapters.AsyncRpcConnector import AsyncRpcConnector
+
+from tests.perun.micro_services.adapters.test_RpcConnector import FakePerunRpcHandler, FakePerunRpcServer
+
+
+class TestAsyncRpcConnector:
+
+    @pytest.fixture
+    def server(self):
+        server = FakePerunRpcServer(('127.0.0.1', 0), FakePerunRpcHandler)
+        server.connections = 0
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def create_connector(server):
+        return AsyncRpcConnector(f'http://127.0.0.1:{server.server_port}/', 'user', 'password')
+
+    def test_get(self, server):
+        connector = self.create_connector(server)
+        result = asyncio.run(connector.get('usersManager', 'getUserById', {'id': 1}))
+
+        assert result['path'] == '/json/usersManager/getUserById?id=1'
+
+    def test_post(self, server):
+        connector = self.create_connector(server)
+        result = asyncio.run(connector.post('usersManager', 'getUserById', {'id': 1}))
+
+        assert result == {'id': 1}
+
+    def test_perun_error(self, server):
+        connector = self.create_connector(server)
+
+        with pytest.raises(Exception):
+            asyncio.run(connector.get('usersManager', 'getError'))
+
+    def test_connection_kept_alive(self, server):
+        connector = self.create_connector(server)
+
+        async def call():
+            for _ in range(5):
+                await connector.get('usersManager', 'getUserById', {'id': 1})
+                await connector.post('usersManager', 'getUserById', {'id': 1})
+            await connector.close()
+
+        asyncio.run(call())
+        assert server.connections == 1
+
+    def test_concurrent_calls(self, server):
+        connector = self.create_connector(server)
+
+        async def call():
+            results = await asyncio.gather(
+                *[connector.get('usersManager', 'getUserById', {'id': i}) for i in range(10)]
+            )
+            await connector.close()
+            return results
+
+        results = asyncio.run(call())
+        assert [result['path'] for result in results] == [
+            f'/json/usersManager/getUserById?id={i}' for i in range(10)
+        ]
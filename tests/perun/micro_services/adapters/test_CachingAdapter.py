@@ -0,0 +1,199 @@
+import time
+
+import mock
+import pytest
+from perun.micro_services.adapters.CachingAdapter import CachingAdapter
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+from perun.micro_services.models.Group import Group
+from perun.micro_services.models.User import User
+from perun.micro_services.models.Vo import Vo
+
+
+class TestCachingAdapter:
+
+    IDP = 'https://idp.example.com'
+
+    @staticmethod
+    def create_adapter(user):
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = user
+        return CachingAdapter(backend), backend
+
+    def test_cache_user(self):
+        adapter, backend = self.create_adapter(User(1, 'Test user'))
+
+        first = adapter.get_perun_user(self.IDP, ['a@example.com', 'b@example.com'])
+        second = adapter.get_perun_user(self.IDP, ['b@example.com'])
+
+        assert first.id == second.id == 1
+        assert second.name == 'Test user'
+        assert backend.get_perun_user.call_count == 1
+        assert (adapter.hits, adapter.misses) == (1, 1)
+        assert adapter.hit_ratio == 0.5
+
+    def test_cache_user_details(self):
+        user = User(1, 'Test user', {'email': ['user@example.com']}, [Vo(1, 'Test VO', 'vo')],
+                    [Group(10, 1, 'group', None, 'vo:group')])
+        adapter, backend = self.create_adapter(user)
+
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+        user = adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert backend.get_perun_user.call_count == 1
+        assert user.attributes == {'email': ['user@example.com']}
+        assert [vo.short_name for vo in user.vos] == ['vo']
+        assert [(group.id, group.vo_id, group.unique_name) for group in user.groups] == [(10, 1, 'vo:group')]
+
+    def test_issuer_in_key(self):
+        adapter, backend = self.create_adapter(User(1, 'Test user'))
+
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+        adapter.get_perun_user('https://other.example.com', ['a@example.com'])
+
+        assert backend.get_perun_user.call_count == 2
+
+    def test_negative_cache(self):
+        adapter, backend = self.create_adapter(None)
+
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']) is None
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']) is None
+        assert backend.get_perun_user.call_count == 1
+
+    def test_only_unknown_uids_queried(self):
+        adapter, backend = self.create_adapter(None)
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        user = adapter.get_perun_user(self.IDP, ['a@example.com', 'b@example.com'])
+
+        assert user.id == 1
+        backend.get_perun_user.assert_called_with(self.IDP, ['b@example.com'], None)
+
+    def test_identifiers_of_unknown_uids_passed(self):
+        adapter, backend = self.create_adapter(None)
+        adapter.get_perun_user(self.IDP, ['a@example.com'], ['edupersonprincipalname'])
+        adapter.get_perun_user(self.IDP, ['a@example.com', 'b@example.com'], ['edupersonprincipalname', 'mail'])
+
+        backend.get_perun_user.assert_called_with(self.IDP, ['b@example.com'], ['mail'])
+
+    def test_expired_entry(self):
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        adapter = CachingAdapter(backend, ttl=0)
+
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert backend.get_perun_user.call_count == 2
+
+    def test_stale_user_on_failure(self):
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        adapter = CachingAdapter(backend, ttl=0, stale_ttl=60)
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        backend.get_perun_user.side_effect = Exception('Perun unavailable')
+        user = adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert user.id == 1
+        assert adapter.stale_hits == 1
+
+    def test_failure_without_stale_user(self):
+        backend = mock.Mock()
+        backend.get_perun_user.side_effect = Exception('Perun unavailable')
+        adapter = CachingAdapter(backend)
+
+        with pytest.raises(Exception):
+            adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+    def test_background_revalidation(self):
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        adapter = CachingAdapter(backend, ttl=0, stale_ttl=60, background_revalidation=True)
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        backend.get_perun_user.return_value = User(1, 'Renamed user')
+        user = adapter.get_perun_user(self.IDP, ['a@example.com'])
+        adapter._executor.shutdown(wait=True)
+
+        assert user.name == 'Test user'
+        assert backend.get_perun_user.call_count == 2
+        assert adapter.cache.get(adapter.get_key(self.IDP, 'a@example.com'))['user']['name'] == 'Renamed user'
+
+    def test_bulk_lookup_cached(self):
+        backend = mock.Mock()
+        backend.get_perun_users.return_value = {'a@example.com': User(1, 'Test user')}
+        adapter = CachingAdapter(backend)
+
+        users = adapter.get_perun_users(self.IDP, [['a@example.com', 'b@example.com'], ['c@example.com']])
+
+        assert users['a@example.com'].id == users['b@example.com'].id == 1
+        assert 'c@example.com' not in users
+        assert adapter.get_perun_user(self.IDP, ['b@example.com']).id == 1
+        assert adapter.get_perun_user(self.IDP, ['c@example.com']) is None
+        assert not backend.get_perun_user.called
+
+    def test_bulk_lookup_only_missing(self):
+        adapter, backend = self.create_adapter(User(1, 'Test user'))
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+        backend.get_perun_users.return_value = {'b@example.com': User(2, 'Other user')}
+
+        users = adapter.get_perun_users(self.IDP, [['a@example.com'], ['b@example.com']])
+
+        assert users['a@example.com'].id == 1
+        assert users['b@example.com'].id == 2
+        backend.get_perun_users.assert_called_once_with(self.IDP, [['b@example.com']], None)
+
+    def test_snapshot_answers_misses(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key('*', 'b@example.com'), User(1, 'Test user'))])
+        adapter, backend = self.create_adapter(None)
+        adapter.snapshot = CacheSnapshot(path)
+
+        user = adapter.get_perun_user(self.IDP, ['a@example.com', 'b@example.com'])
+        cached = adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert user.id == cached.id == '1'
+        assert adapter.get_perun_user(self.IDP, ['c@example.com']) is None
+        assert backend.get_perun_user.call_count == 1
+        assert (adapter.hits, adapter.misses, adapter.snapshot_hits) == (1, 1, 1)
+
+    def test_snapshot_not_used_after_expiry(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key('*', 'a@example.com'), User(1, 'Test user'))])
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = User(1, 'Renamed user')
+        adapter = CachingAdapter(backend, ttl=60, snapshot=CacheSnapshot(path))
+
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).name == 'Test user'
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + 61)
+        # the expired user cached from the snapshot is looked up in Perun
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).name == 'Renamed user'
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).name == 'Renamed user'
+        assert backend.get_perun_user.call_count == 1
+
+    def test_snapshot_not_used_for_cached_uid(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key('*', 'a@example.com'), User(1, 'Test user'))])
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = None
+        adapter = CachingAdapter(backend, negative_ttl=0, snapshot=CacheSnapshot(path))
+
+        assert adapter.refresh(self.IDP, ['a@example.com']) is None
+        # the expired miss is kept while the snapshot is used, the lookup goes to Perun
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']) is None
+        assert backend.get_perun_user.call_count == 2
+        assert adapter.snapshot_hits == 0
+
+    def test_snapshot_answers_bulk_misses(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key(self.IDP, 'a@example.com'), User(1, 'Test user'))])
+        backend = mock.Mock()
+        backend.get_perun_users.return_value = {}
+        adapter = CachingAdapter(backend, snapshot=CacheSnapshot(path))
+
+        users = adapter.get_perun_users(self.IDP, [['a@example.com'], ['b@example.com']])
+
+        assert users['a@example.com'].id == '1'
+        backend.get_perun_users.assert_called_once_with(self.IDP, [['b@example.com']], None)
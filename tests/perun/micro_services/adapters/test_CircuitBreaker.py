@@ -0,0 +1,47 @@
+from perun.micro_services.adapters.CircuitBreaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        breaker.record_failure(0)
+        assert breaker.allow_request()
+
+        breaker.record_failure(0)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.rejected == 1
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        breaker.record_failure(0)
+        breaker.record_success(0)
+        breaker.record_failure(0)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_slow_call_is_failure(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, slow_call_threshold=1)
+        breaker.record_success(2)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure(0)
+
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+
+        breaker.record_success(0)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_trial_failure(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure(0)
+        breaker.allow_request()
+        breaker.record_failure(0)
+
+        assert breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,59 @@
+import mock
+import pytest
+from perun.micro_services.adapters.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from perun.micro_services.adapters.CircuitBreakerAdapter import CircuitBreakerAdapter
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
+from perun.micro_services.models.User import User
+
+
+class TestCircuitBreakerAdapter:
+
+    IDP = 'https://idp.example.com'
+
+    def test_pass_through(self):
+        backend = mock.Mock()
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        adapter = CircuitBreakerAdapter(backend)
+
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+
+    def test_open_circuit(self):
+        backend = mock.Mock()
+        backend.get_perun_user.side_effect = Exception('Perun unavailable')
+        adapter = CircuitBreakerAdapter(backend, CircuitBreaker('test', failure_threshold=1))
+
+        with pytest.raises(Exception):
+            adapter.get_perun_user(self.IDP, ['a@example.com'])
+        with pytest.raises(CircuitOpenError):
+            adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert backend.get_perun_user.call_count == 1
+
+    def test_deadline_exceeded_not_counted(self):
+        backend = mock.Mock()
+        backend.get_perun_user.side_effect = DeadlineExceeded('time budget is spent')
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        adapter = CircuitBreakerAdapter(backend, breaker)
+
+        for _ in range(3):
+            with pytest.raises(DeadlineExceeded):
+                adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+
+    def test_deadline_exceeded_ends_trial(self):
+        backend = mock.Mock()
+        backend.get_perun_user.side_effect = DeadlineExceeded('time budget is spent')
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure(0)
+        adapter = CircuitBreakerAdapter(backend, breaker)
+
+        with pytest.raises(DeadlineExceeded):
+            adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+        # another trial call is let through
+        backend.get_perun_user.side_effect = None
+        backend.get_perun_user.return_value = User(1, 'Test user')
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+        assert breaker.state == CircuitBreaker.CLOSED
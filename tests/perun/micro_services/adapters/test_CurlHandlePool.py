@@ -0,0 +1,61 @@
+from perun.micro_services.adapters.CurlHandlePool import CurlHandlePool
+
+
+class TestCurlHandlePool:
+
+    def test_reuse_handle(self):
+        pool = CurlHandlePool()
+
+        with pool.handle() as first:
+            pass
+        with pool.handle() as second:
+            pass
+
+        assert first is second
+        assert pool.idle == 1
+
+    def test_max_idle_handles(self):
+        pool = CurlHandlePool(max_size=1)
+
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        assert pool.idle == 1
+
+    def test_idle_eviction(self):
+        pool = CurlHandlePool(idle_timeout=-1)
+
+        with pool.handle() as first:
+            pass
+        with pool.handle() as second:
+            pass
+
+        assert first is not second
+        assert pool.idle == 1
+
+    def test_close(self):
+        pool = CurlHandlePool()
+
+        with pool.handle():
+            pass
+        pool.close()
+
+        assert pool.idle == 0
+
+    def test_handle_released_on_generator_exit(self):
+        pool = CurlHandlePool()
+
+        def requests():
+            with pool.handle() as handle:
+                yield handle
+
+        generator = requests()
+        next(generator)
+        assert pool.in_use == 1
+        generator.close()
+
+        # the interrupted handle is discarded, not leaked
+        assert pool.in_use == 0
+        assert pool.idle == 0
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+
+
+class TestDeadline:
+
+    def test_timeout_without_deadline(self):
+        assert Deadline.current() is None
+        assert Deadline.timeout() is None
+        assert Deadline.timeout(5) == 5
+
+    def test_timeout_capped_by_deadline(self):
+        with Deadline.start(1) as deadline:
+            assert Deadline.current() is deadline
+            assert Deadline.timeout(5) <= 1
+            assert Deadline.timeout(0.5) == 0.5
+
+        assert Deadline.current() is None
+
+    def test_start_without_seconds(self):
+        with Deadline.start(None) as deadline:
+            assert deadline is None
+            assert Deadline.timeout(5) == 5
+
+    def test_spent_deadline(self):
+        with Deadline.start(0.01) as deadline:
+            time.sleep(0.02)
+            assert deadline.exceeded
+            with pytest.raises(DeadlineExceeded):
+                Deadline.timeout(5)
+
+    def test_submit_propagates_deadline(self):
+        with ThreadPoolExecutor(1) as executor:
+            with Deadline.start(1) as deadline:
+                assert Deadline.submit(executor, Deadline.current).result() is deadline
+            assert executor.submit(Deadline.current).result() is None
+
+    def test_bind(self):
+        async def current():
+            return Deadline.current()
+
+        deadline = Deadline(1)
+        assert asyncio.run(Deadline.bind(current(), deadline)) is deadline
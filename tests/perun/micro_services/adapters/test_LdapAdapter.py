@@ -1,6 +1,8 @@
 import os
 
+import mock
 import pytest
+from ldap3 import Connection, MOCK_SYNC, Server
 from perun.micro_services.adapters.LdapAdapter import LdapAdapter
 
 
@@ -20,3 +22,94 @@ class TestLdapAdapter:
 
         with pytest.raises(Exception):
             LdapAdapter(path + self.TEST_BADCONF_FILE_NAME)
+
+    def test_identifier_attributes(self):
+        path = os.getcwd()
+        perun_adapter = LdapAdapter(path + self.TEST_CONF_FILE_NAME)
+
+        assert perun_adapter.filter_builder.build(['a@example.com'], ['mail']) == '(mail=a@example.com)'
+
+    def test_get_perun_users(self):
+        path = os.getcwd()
+        perun_adapter = LdapAdapter(path + self.TEST_CONF_FILE_NAME)
+        perun_adapter.bulk_filter_size = 2
+        server = Server('perun.example.com')
+
+        def create_connection():
+            conn = Connection(server, user='cn=admin,base', password='password', client_strategy=MOCK_SYNC)
+            conn.strategy.add_entry('cn=admin,base', {'userPassword': 'password', 'sn': 'admin'})
+            for id in range(1, 4):
+                conn.strategy.add_entry(f'perunUserId={id},ou=People,base', {
+                    'perunUserId': str(id),
+                    'displayName': f'User {id}',
+                    'cn': f'User {id}',
+                    'mail': f'mail{id}@example.com',
+                    'eduPersonPrincipalNames': [f'user{id}@example.com'],
+                })
+            conn.bind()
+            return conn
+
+        perun_adapter.connector.pools['ldaps://hostname.com'].factory = create_connection
+        users = perun_adapter.get_perun_users('https://idp.example.com', [
+            ['none@example.com', 'user1@example.com'],
+            ['mail2@example.com'],
+            ['none@example.com'],
+            ['User3@example.com'],
+        ], [
+            ['edupersonprincipalname', 'edupersonprincipalname'],
+            ['mail'],
+            ['edupersonprincipalname'],
+            ['edupersonprincipalname'],
+        ])
+
+        assert sorted(users) == ['User3@example.com', 'mail2@example.com', 'none@example.com', 'user1@example.com']
+        assert users['user1@example.com'].id == users['none@example.com'].id == '1'
+        assert users['mail2@example.com'].name == 'User 2'
+        assert users['User3@example.com'].id == '3'
+
+    def test_get_perun_user_details(self):
+        path = os.getcwd()
+        perun_adapter = LdapAdapter(path + self.TEST_CONF_FILE_NAME, ['email'], memberships=True)
+        perun_adapter.base = 'dc=perun'
+        server = Server('perun.example.com')
+
+        def create_connection():
+            conn = Connection(server, user='cn=admin,base', password='password', client_strategy=MOCK_SYNC)
+            conn.strategy.add_entry('cn=admin,base', {'userPassword': 'password', 'sn': 'admin'})
+            conn.strategy.add_entry('perunUserId=1,ou=People,dc=perun', {
+                'perunUserId': '1',
+                'displayName': 'User 1',
+                'cn': 'User 1',
+                'preferredMail': 'user1@example.com',
+                'eduPersonPrincipalNames': ['user1@example.com'],
+                'memberOf': ['perunGroupId=10,perunVoId=1,dc=perun', 'perunGroupId=11,perunVoId=1,dc=perun'],
+            })
+            conn.strategy.add_entry('perunVoId=1,dc=perun', {
+                'objectClass': 'perunVO', 'perunVoId': '1', 'o': 'vo', 'description': 'Test VO',
+            })
+            for id, name in [(10, 'members'), (11, 'group')]:
+                conn.strategy.add_entry(f'perunGroupId={id},perunVoId=1,dc=perun', {
+                    'objectClass': 'perunGroup', 'perunGroupId': str(id), 'perunVoId': '1', 'cn': name,
+                    'perunUniqueGroupName': f'vo:{name}',
+                })
+            conn.bind()
+            return conn
+
+        perun_adapter.connector.pools['ldaps://hostname.com'].factory = create_connection
+        search = mock.Mock(wraps=perun_adapter.connector.search)
+        perun_adapter.connector.search = search
+
+        user = perun_adapter.get_perun_user('https://idp.example.com', ['user1@example.com'])
+        again = perun_adapter.get_perun_user('https://idp.example.com', ['user1@example.com'])
+
+        assert user.attributes == again.attributes == {'email': ['user1@example.com']}
+        assert [(vo.id, vo.short_name) for vo in user.vos] == [('1', 'vo')]
+        assert [group.unique_name for group in again.groups] == ['vo:members', 'vo:group']
+        # groups and VOs are searched only once
+        assert search.call_count == 4
+
+    def test_parse_member_of(self):
+        assert LdapAdapter.parse_member_of([
+            'perunGroupId=10,perunVoId=1,dc=perun,dc=cesnet,dc=cz',
+            'perunVoId=1,dc=perun,dc=cesnet,dc=cz',
+        ]) == [('10', '1')]
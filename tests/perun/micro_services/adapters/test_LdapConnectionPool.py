@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+from perun.micro_services.adapters.LdapConnectionPool import LdapConnectionPool, PoolExhaustedError
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+        self.bound = True
+
+    def unbind(self):
+        self.closed = True
+        self.bound = False
+
+
+class TestLdapConnectionPool:
+
+    @staticmethod
+    def create_pool(**kwargs):
+        created = []
+
+        def factory():
+            conn = FakeConnection()
+            created.append(conn)
+            return conn
+
+        return LdapConnectionPool(factory, **kwargs), created
+
+    def test_reuse_connection(self):
+        pool, created = self.create_pool()
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        assert len(created) == 1
+        assert pool.idle == 1
+
+    def test_discard_connection_on_error(self):
+        pool, created = self.create_pool()
+
+        with pytest.raises(ValueError):
+            with pool.connection():
+                raise ValueError()
+
+        assert created[0].closed
+        assert pool.size == 0
+
+    def test_unhealthy_connection_replaced(self):
+        pool, created = self.create_pool()
+
+        with pool.connection() as conn:
+            pass
+        conn.bound = False
+
+        with pool.connection() as new_conn:
+            assert new_conn is not conn
+
+        assert conn.closed
+        assert pool.size == 1
+
+    def test_idle_eviction(self):
+        pool, created = self.create_pool(idle_timeout=-1)
+
+        with pool.connection():
+            pass
+        with pool.connection():
+            pass
+
+        assert len(created) == 2
+        assert created[0].closed
+
+    def test_bounded_size(self):
+        pool, created = self.create_pool(max_size=1, acquire_timeout=0.05)
+
+        conn = pool.acquire()
+        with pytest.raises(PoolExhaustedError):
+            pool.acquire()
+
+        pool.release(conn)
+        assert pool.acquire() is conn
+
+    def test_wait_ended_by_deadline(self):
+        pool, created = self.create_pool(max_size=1, acquire_timeout=5)
+        pool.acquire()
+
+        with Deadline.start(0.05):
+            with pytest.raises(DeadlineExceeded):
+                pool.acquire()
+
+    def test_waiting_thread_gets_released_connection(self):
+        pool, created = self.create_pool(max_size=1, acquire_timeout=5)
+        conn = pool.acquire()
+        acquired = []
+
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        thread.start()
+        pool.release(conn)
+        thread.join(5)
+
+        assert acquired == [conn]
+
+    def test_close(self):
+        pool, created = self.create_pool()
+
+        with pool.connection():
+            pass
+        pool.close()
+
+        assert created[0].closed
+        assert pool.size == 0
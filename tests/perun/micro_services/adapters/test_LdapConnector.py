@@ -0,0 +1,124 @@
+import json
+
+from ldap3 import Connection, MOCK_SYNC, Server
+from ldap3.core.exceptions import LDAPSocketOpenError
+from perun.micro_services.adapters.LdapConnector import LdapConnector
+
+
+class TestLdapConnector:
+
+    HOSTNAME = 'ldap://perun.example.com'
+    BASE = 'ou=People,dc=perun'
+    ATTRIBUTES = ['perunUserId', 'displayName', 'cn', 'mail']
+
+    @staticmethod
+    def create_connector(hostnames=None):
+        connector = LdapConnector(hostnames or [TestLdapConnector.HOSTNAME], 'cn=admin,dc=perun', 'password')
+        server = Server('perun.example.com')
+
+        def create_connection():
+            conn = Connection(server, user='cn=admin,dc=perun', password='password', client_strategy=MOCK_SYNC)
+            conn.strategy.add_entry('cn=admin,dc=perun', {'userPassword': 'password', 'sn': 'admin'})
+            for id in range(1, 4):
+                conn.strategy.add_entry(f'perunUserId={id},ou=People,dc=perun', {
+                    'perunUserId': str(id),
+                    'displayName': f'User {id}',
+                    'cn': f'User {id}',
+                    'eduPersonPrincipalNames': [f'user{id}@example.com', f'user{id}@other.example.com'],
+                    'objectClass': 'perunUser',
+                })
+            conn.bind()
+            return conn
+
+        for pool in connector.pools.values():
+            pool.factory = create_connection
+        return connector
+
+    def test_warm_up(self):
+        connector = self.create_connector()
+        connector.warm_up()
+
+        assert (connector.pools[self.HOSTNAME].size, connector.pools[self.HOSTNAME].idle) == (1, 1)
+
+    def test_search_for_entity(self):
+        connector = self.create_connector()
+        entry = connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=user1@example.com)', self.ATTRIBUTES)
+
+        assert entry == {'perunUserId': ['1'], 'displayName': ['User 1'], 'cn': ['User 1'], 'mail': []}
+
+    def test_search_for_entity_not_found(self):
+        connector = self.create_connector()
+
+        assert connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=none@example.com)') is None
+
+    def test_search_for_entities(self):
+        connector = self.create_connector()
+        entries = connector.search_for_entities(self.BASE, '(objectClass=perunUser)', ['perunUserId'])
+
+        assert sorted(entry['perunUserId'][0] for entry in entries) == ['1', '2', '3']
+
+    def test_simplified_entries_match_entry_json(self):
+        connector = self.create_connector()
+
+        with connector.pools[self.HOSTNAME].connection() as conn:
+            conn.search(self.BASE, '(objectClass=perunUser)', attributes=self.ATTRIBUTES)
+            expected = [json.loads(entry.entry_to_json())['attributes'] for entry in conn.entries]
+            simplified = LdapConnector.get_simplified_entries(conn.response)
+
+        assert simplified == expected
+
+    def test_simplified_entries_wrap_single_values(self):
+        response = [
+            {'type': 'searchResEntry', 'attributes': {'perunUserId': 1, 'cn': ['User 1']}},
+            {'type': 'searchResRef', 'uri': ['ldap://other.example.com']},
+        ]
+
+        assert LdapConnector.get_simplified_entries(response) == [{'perunUserId': [1], 'cn': ['User 1']}]
+
+    def test_search_paged(self):
+        connector = self.create_connector()
+        entries = connector.search_paged(self.BASE, '(objectClass=perunUser)', ['perunUserId'], page_size=2)
+
+        assert sorted(entry['perunUserId'][0] for entry in entries) == ['1', '2', '3']
+        assert connector.pools[self.HOSTNAME].idle == 1
+
+    def test_search_paged_releases_connection_when_closed_early(self):
+        connector = self.create_connector()
+        entries = connector.search_paged(self.BASE, '(objectClass=perunUser)', ['perunUserId'], page_size=1)
+
+        assert next(entries)['perunUserId']
+        assert connector.pools[self.HOSTNAME].idle == 0
+        entries.close()
+
+        assert connector.pools[self.HOSTNAME].idle == 1
+        assert connector.pools[self.HOSTNAME].size == 1
+
+    def test_search_fails_over_to_another_host(self):
+        hostnames = ['ldap://down.example.com', self.HOSTNAME]
+        connector = self.create_connector(hostnames)
+        connector.selector.strategy = connector.selector.FIRST
+
+        def refuse_connection():
+            raise LDAPSocketOpenError('Connection refused')
+
+        connector.pools[hostnames[0]].factory = refuse_connection
+        entry = connector.search_for_entity(self.BASE, '(eduPersonPrincipalNames=user1@example.com)', self.ATTRIBUTES)
+
+        assert entry['perunUserId'] == ['1']
+        assert connector.selector.get(hostnames[0]).failures == 1
+        assert connector.pools[self.HOSTNAME].idle == 1
+
+    def test_probe_keeps_pool_size(self):
+        connector = self.create_connector()
+        connector.probe(self.HOSTNAME)
+
+        assert (connector.pools[self.HOSTNAME].size, connector.pools[self.HOSTNAME].idle) == (0, 0)
+
+    def test_search_paged_closed_early_is_not_outstanding(self):
+        connector = self.create_connector()
+        entries = connector.search_paged(self.BASE, '(objectClass=perunUser)', ['perunUserId'], page_size=1)
+        next(entries)
+        assert connector.selector.get(self.HOSTNAME).outstanding == 1
+
+        entries.close()
+        assert connector.selector.get(self.HOSTNAME).outstanding == 0
@@ -0,0 +1,49 @@
+from perun.micro_services.adapters.LdapFilterBuilder import LdapFilterBuilder
+
+
+class TestLdapFilterBuilder:
+
+    @staticmethod
+    def create_builder():
+        return LdapFilterBuilder({'eduPersonUniqueId': 'eduPersonUniqueIds', 'mail': 'mail'})
+
+    def test_single_identifier(self):
+        builder = self.create_builder()
+
+        assert builder.build(['a@example.com']) == '(eduPersonPrincipalNames=a@example.com)'
+
+    def test_identifier_attributes(self):
+        builder = self.create_builder()
+        ldap_filter = builder.build(['id@example.com', 'a@example.com', 'b@example.com'],
+                                    ['edupersonuniqueid', 'edupersonprincipalname', 'mail'])
+
+        assert ldap_filter == '(|(eduPersonUniqueIds=id@example.com)(eduPersonPrincipalNames=a@example.com)' \
+                              '(mail=b@example.com))'
+
+    def test_escaping(self):
+        builder = self.create_builder()
+
+        assert builder.build(['*)(cn=*', 'a\\b\x00']) == \
+            '(|(eduPersonPrincipalNames=\\2a\\29\\28cn=\\2a)(eduPersonPrincipalNames=a\\5cb\\00))'
+
+    def test_duplicates_and_empty_values(self):
+        builder = self.create_builder()
+        ldap_filter = builder.build(['a@example.com', '', 'a@example.com', 'a@example.com'],
+                                    ['edupersonprincipalname', 'mail', 'edupersonprincipalname', 'mail'])
+
+        assert ldap_filter == '(|(eduPersonPrincipalNames=a@example.com)(mail=a@example.com))'
+
+    def test_nothing_to_search(self):
+        builder = self.create_builder()
+
+        assert builder.build([]) is None
+        assert builder.build([' ']) is None
+
+    def test_template_cached(self):
+        builder = self.create_builder()
+        builder.build(['a@example.com', 'b@example.com'])
+        builder.build(['c@example.com', 'd@example.com'])
+
+        assert builder.get_template(('eduPersonPrincipalNames', 'eduPersonPrincipalNames')) == \
+            '(|(eduPersonPrincipalNames={})(eduPersonPrincipalNames={}))'
+        assert len(builder._templates) == 1
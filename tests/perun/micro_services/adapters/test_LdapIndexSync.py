@@ -0,0 +1,88 @@
+import os
+
+from ldap3 import Connection, MOCK_SYNC, Server
+from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+from perun.micro_services.adapters.LdapIndexSync import LdapIndexSync
+from perun.micro_services.cache.IdentityIndex import IdentityIndex
+
+
+class TestLdapIndexSync:
+
+    TEST_CONF_FILE_NAME = '/tests/perun/micro_services/adapters/perun_config_test.yml'
+
+    @staticmethod
+    def create_adapter(users):
+        perun_adapter = LdapAdapter(os.getcwd() + TestLdapIndexSync.TEST_CONF_FILE_NAME)
+        perun_adapter.base = 'dc=perun'
+        server = Server('perun.example.com')
+
+        def create_connection():
+            conn = Connection(server, user='cn=admin,dc=perun', password='password', client_strategy=MOCK_SYNC)
+            conn.strategy.add_entry('cn=admin,dc=perun', {'userPassword': 'password', 'sn': 'admin'})
+            for id, modified in users.items():
+                conn.strategy.add_entry(f'perunUserId={id},ou=People,dc=perun', {
+                    'objectClass': 'perunUser',
+                    'perunUserId': str(id),
+                    'displayName': f'User {id}',
+                    'cn': f'User {id}',
+                    'mail': f'mail{id}@example.com',
+                    'eduPersonPrincipalNames': [f'user{id}@example.com'],
+                    'modifyTimestamp': modified,
+                })
+            conn.bind()
+            return conn
+
+        perun_adapter.connector.pools['ldaps://hostname.com'].factory = create_connection
+        return perun_adapter
+
+    @staticmethod
+    def create_sync(perun_adapter, path):
+        return LdapIndexSync(perun_adapter.connector, perun_adapter.base, IdentityIndex(path),
+                             perun_adapter.filter_builder.attributes)
+
+    def test_sync(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        index_sync = self.create_sync(self.create_adapter({1: '20240101000000Z', 2: '20240102000000Z'}), path)
+
+        assert not index_sync.ready
+        assert index_sync.sync() == 2
+        assert index_sync.ready
+        assert index_sync.index.get('mail', 'MAIL2@example.com').name == 'User 2'
+        assert index_sync.index.get_meta(LdapIndexSync.LAST_MODIFIED) == '20240102000000Z'
+
+        # claimed by the sync above
+        assert index_sync.sync() is None
+
+        index_sync = self.create_sync(self.create_adapter({1: '20240101000000Z', 2: '20240102000000Z',
+                                                           3: '20240103000000Z'}), path)
+        index_sync.index.set_meta(LdapIndexSync.SYNC_CLAIM, 0)
+        # only entries modified since the last sync
+        assert index_sync.sync() == 2
+        assert index_sync.index.get('eduPersonPrincipalNames', 'user3@example.com').id == '3'
+        assert index_sync.index.get_meta(LdapIndexSync.LAST_MODIFIED) == '20240103000000Z'
+
+    def test_full_sync_drops_deleted_users(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        self.create_sync(self.create_adapter({1: '20240101000000Z', 2: '20240102000000Z'}), path).sync()
+
+        index_sync = self.create_sync(self.create_adapter({1: '20240101000000Z'}), path)
+        assert index_sync.sync(full=True) == 1
+        assert index_sync.index.get('mail', 'mail2@example.com') is None
+
+    def test_adapter_answers_from_index(self, tmp_path, monkeypatch):
+        perun_adapter = self.create_adapter({1: '20240101000000Z', 2: '20240102000000Z'})
+        perun_adapter.index_sync = self.create_sync(perun_adapter, str(tmp_path / 'index.sqlite'))
+        perun_adapter.index_sync.sync()
+        perun_adapter.index_sync.index.replace([])
+
+        user = LdapAdapter.create_user({'perunUserId': ['7'], 'displayName': ['Indexed'], 'cn': ['']})
+        perun_adapter.index_sync.index.update([(user, [('eduPersonPrincipalNames', 'user1@example.com')])])
+
+        assert perun_adapter.get_perun_user('https://idp.example.com', ['user1@example.com']).id == '7'
+        # not indexed, found in the LDAP
+        assert perun_adapter.get_perun_user('https://idp.example.com', ['user2@example.com']).id == '2'
+
+        users = perun_adapter.get_perun_users('https://idp.example.com', [['user1@example.com'],
+                                                                          ['mail2@example.com']], [[None], ['mail']])
+        assert users['user1@example.com'].id == '7'
+        assert users['mail2@example.com'].id == '2'
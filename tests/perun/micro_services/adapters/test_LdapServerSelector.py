@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
+from perun.micro_services.adapters.LdapConnectionPool import PoolExhaustedError
+from perun.micro_services.adapters.LdapServerSelector import LdapServerSelector
+
+
+class TestLdapServerSelector:
+
+    HOSTNAMES = ['ldap://a.example.com', 'ldap://b.example.com', 'ldap://c.example.com']
+
+    @staticmethod
+    def complete(selector, hostname, elapsed, failed=False):
+        server = selector.get(hostname)
+        server.outstanding += 1
+        selector._finish(server, elapsed, failed)
+
+    @staticmethod
+    def fail(selector, hostname, times):
+        for _ in range(times):
+            with pytest.raises(Exception):
+                with selector.request(hostname):
+                    raise Exception('Connection refused')
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            LdapServerSelector(self.HOSTNAMES, 'random')
+
+    def test_least_outstanding_prefers_fast_host(self):
+        selector = LdapServerSelector(self.HOSTNAMES)
+        self.complete(selector, self.HOSTNAMES[0], 0.5)
+        self.complete(selector, self.HOSTNAMES[1], 0.01)
+
+        # the host without measurement is tried first
+        assert selector.select() == self.HOSTNAMES[2]
+        self.complete(selector, self.HOSTNAMES[2], 0.1)
+        assert selector.select() == self.HOSTNAMES[1]
+
+    def test_least_outstanding_weights_requests_in_flight(self):
+        selector = LdapServerSelector(self.HOSTNAMES[:2])
+        self.complete(selector, self.HOSTNAMES[0], 0.01)
+        self.complete(selector, self.HOSTNAMES[1], 0.02)
+
+        with selector.request(self.HOSTNAMES[0]):
+            assert selector.select() == self.HOSTNAMES[0]
+            with selector.request(self.HOSTNAMES[0]):
+                assert selector.select() == self.HOSTNAMES[1]
+
+    def test_round_robin(self):
+        selector = LdapServerSelector(self.HOSTNAMES, LdapServerSelector.ROUND_ROBIN)
+
+        assert sorted(selector.select() for _ in range(3)) == self.HOSTNAMES
+
+    def test_first_excludes_failed_host(self):
+        selector = LdapServerSelector(self.HOSTNAMES, LdapServerSelector.FIRST)
+
+        assert selector.select() == self.HOSTNAMES[0]
+        assert selector.select(exclude=self.HOSTNAMES[0]) == self.HOSTNAMES[1]
+
+    def test_ejection(self):
+        selector = LdapServerSelector(self.HOSTNAMES[:2], LdapServerSelector.FIRST, failure_threshold=2)
+        self.fail(selector, self.HOSTNAMES[0], 1)
+        assert selector.select() == self.HOSTNAMES[0]
+
+        self.fail(selector, self.HOSTNAMES[0], 1)
+        assert selector.get(self.HOSTNAMES[0]).ejected
+        assert selector.select() == self.HOSTNAMES[1]
+
+    def test_all_hosts_ejected(self):
+        selector = LdapServerSelector(self.HOSTNAMES[:2], failure_threshold=1)
+        self.fail(selector, self.HOSTNAMES[0], 1)
+        self.fail(selector, self.HOSTNAMES[1], 1)
+
+        # the host ejected first comes back first
+        assert selector.select() == self.HOSTNAMES[0]
+
+    def test_deadline_exceeded_is_not_failure(self):
+        selector = LdapServerSelector(self.HOSTNAMES[:2], failure_threshold=1)
+        with pytest.raises(DeadlineExceeded):
+            with selector.request(self.HOSTNAMES[0]):
+                raise DeadlineExceeded('time budget is spent')
+
+        server = selector.get(self.HOSTNAMES[0])
+        assert (server.failures, server.outstanding, server.ejected) == (0, 0, False)
+
+    def test_pool_exhausted_is_not_failure(self):
+        selector = LdapServerSelector(self.HOSTNAMES[:2], failure_threshold=1)
+        with pytest.raises(PoolExhaustedError):
+            with selector.request(self.HOSTNAMES[0]):
+                raise PoolExhaustedError('no free connection')
+
+        server = selector.get(self.HOSTNAMES[0])
+        assert (server.failures, server.outstanding, server.ejected) == (0, 0, False)
+
+    def test_probe(self):
+        probed = threading.Event()
+        results = [Exception('Connection refused'), None]
+
+        def probe(hostname):
+            result = results.pop(0)
+            probed.set()
+            if result is not None:
+                raise result
+
+        selector = LdapServerSelector(self.HOSTNAMES[:2], LdapServerSelector.FIRST, probe=probe,
+                                      failure_threshold=1, ejection_time=0)
+        self.fail(selector, self.HOSTNAMES[0], 1)
+        server = selector.get(self.HOSTNAMES[0])
+
+        # the failed probe ejects the host again
+        assert selector.select() == self.HOSTNAMES[1]
+        assert probed.wait(5)
+        while server.probing:
+            threading.Event().wait(0.01)
+        assert server.ejected and server.ejections == 2
+
+        server.ejected_until = 0
+        probed.clear()
+        selector.select()
+        assert probed.wait(5)
+        while server.probing:
+            threading.Event().wait(0.01)
+        assert not server.ejected
+        assert selector.select() == self.HOSTNAMES[0]
@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
+import pytest
+from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+from perun.micro_services.adapters.MultiAdapter import MultiAdapter
+from perun.micro_services.adapters.RpcAdapter import RpcAdapter
+from perun.micro_services.models.User import User
+
+
+class TestMultiAdapter:
+
+    TEST_CONF_FILE_NAME = '/tests/perun/micro_services/adapters/perun_config_test.yml'
+    IDP = 'https://idp.example.com'
+
+    def create_adapter(self, *results, mode=MultiAdapter.FALLBACK):
+        perun_adapter = MultiAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.mode = mode
+
+        for adapter, result in zip(perun_adapter.adapters, results):
+            adapter.get_perun_user = mock.Mock(side_effect=result)
+
+        return perun_adapter
+
+    @staticmethod
+    def delayed(user, delay):
+        def get_perun_user(idp_entity_id, uids, identifiers=None):
+            time.sleep(delay)
+            return user
+        return get_perun_user
+
+    def test_get_adapter(self):
+        perun_adapter = MultiAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+
+        assert isinstance(perun_adapter.adapters[0], LdapAdapter)
+        assert isinstance(perun_adapter.adapters[1], RpcAdapter)
+
+    def test_close(self):
+        perun_adapter = MultiAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        ldap_adapter, rpc_adapter = perun_adapter.adapters
+        perun_adapter.close()
+
+        assert ldap_adapter.connector.pools['ldaps://hostname.com']._closed
+        assert rpc_adapter.connector.pool._closed
+        assert rpc_adapter.executor._shutdown
+
+    def test_fallback_on_miss(self):
+        perun_adapter = self.create_adapter([None], [User(1, 'Test user')])
+
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+
+    def test_fallback_on_error(self):
+        perun_adapter = self.create_adapter(Exception('LDAP unavailable'), [User(1, 'Test user')])
+
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+
+    def test_first_adapter_answers(self):
+        perun_adapter = self.create_adapter([User(1, 'Test user')], [User(2, 'Other user')])
+
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+        assert not perun_adapter.adapters[1].get_perun_user.called
+
+    def test_all_failed(self):
+        perun_adapter = self.create_adapter(Exception('LDAP unavailable'), Exception('RPC unavailable'))
+
+        with pytest.raises(Exception):
+            perun_adapter.get_perun_user(self.IDP, ['a@example.com'])
+
+    def test_bulk_fallback(self):
+        perun_adapter = MultiAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        ldap, rpc = perun_adapter.adapters
+        ldap.get_perun_users = mock.Mock(return_value={'a@example.com': User(1, 'Test user')})
+        rpc.get_perun_users = mock.Mock(return_value={'c@example.com': User(2, 'Other user')})
+
+        users = perun_adapter.get_perun_users(self.IDP, [['a@example.com', 'b@example.com'], ['c@example.com']])
+
+        assert users['a@example.com'].id == 1
+        assert users['c@example.com'].id == 2
+        rpc.get_perun_users.assert_called_once_with(self.IDP, [['c@example.com']], None)
+
+    def test_hedge_slow_adapter(self):
+        perun_adapter = self.create_adapter(self.delayed(None, 0.5), self.delayed(User(2, 'Other user'), 0.3),
+                                            mode=MultiAdapter.HEDGE)
+
+        start_time = time.monotonic()
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 2
+        # the second adapter was asked while the first one was still running
+        assert time.monotonic() - start_time < 0.75
+
+    def test_hedge_slow_adapter_finding_user(self):
+        perun_adapter = self.create_adapter(self.delayed(User(1, 'Slow user'), 2), [User(2, 'Other user')],
+                                            mode=MultiAdapter.HEDGE)
+
+        start_time = time.monotonic()
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 2
+        # the hedge answered without waiting for the first adapter
+        assert time.monotonic() - start_time < 0.5
+
+    def test_hedge_concurrent_lookups(self):
+        perun_adapter = self.create_adapter(self.delayed(User(1, 'Test user'), 0.1), [User(2, 'Other user')],
+                                            mode=MultiAdapter.HEDGE)
+        perun_adapter.hedge_min_delay = 1
+
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(32) as executor:
+            users = list(executor.map(lambda _: perun_adapter.get_perun_user(self.IDP, ['a@example.com']),
+                                      range(32)))
+
+        assert all(user.id == 1 for user in users)
+        assert time.monotonic() - start_time < 0.5
+
+    def test_hedge_fast_adapter(self):
+        perun_adapter = self.create_adapter([User(1, 'Fast user')], [User(2, 'Other user')],
+                                            mode=MultiAdapter.HEDGE)
+
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+        assert not perun_adapter.adapters[1].get_perun_user.called
+
+    def test_hedge_miss(self):
+        perun_adapter = self.create_adapter([None], [User(2, 'Test user')], mode=MultiAdapter.HEDGE)
+
+        assert perun_adapter.get_perun_user(self.IDP, ['a@example.com']).id == 2
+
+    def test_hedge_delay_percentile(self):
+        perun_adapter = MultiAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.latencies[0].extend([0.1 * i for i in range(1, 11)])
+
+        assert perun_adapter.get_hedge_delay(0) == pytest.approx(1.0)
+        assert perun_adapter.get_hedge_delay(1) == perun_adapter.hedge_min_delay
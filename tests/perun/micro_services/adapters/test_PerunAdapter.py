@@ -1,7 +1,10 @@
 import os
 import pytest
 
+from perun.micro_services.adapters.AsyncLdapAdapter import AsyncLdapAdapter
+from perun.micro_services.adapters.AsyncRpcAdapter import AsyncRpcAdapter
 from perun.micro_services.adapters.LdapAdapter import LdapAdapter
+from perun.micro_services.adapters.MultiAdapter import MultiAdapter
 from perun.micro_services.adapters.PerunAdapter import PerunAdapter
 from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
 from perun.micro_services.adapters.RpcAdapter import RpcAdapter
@@ -23,6 +26,25 @@ class TestPerunAdapter:
 
         assert isinstance(perun_adapter, LdapAdapter)
 
+    def test_get_instance_multi(self):
+        path = os.getcwd()
+        perun_adapter = PerunAdapter.get_instance(path + self.TEST_CONF_FILE_NAME, PerunAdapterAbstract.MULTI)
+
+        assert isinstance(perun_adapter, MultiAdapter)
+
     def test_get_instance_no_conf_file(self):
         with pytest.raises(FileNotFoundError):
             PerunAdapter.get_instance('/testfile.yml', PerunAdapterAbstract.LDAP)
+
+    def test_get_async_instance(self):
+        path = os.getcwd()
+
+        assert isinstance(PerunAdapter.get_async_instance(path + self.TEST_CONF_FILE_NAME), AsyncRpcAdapter)
+        assert isinstance(PerunAdapter.get_async_instance(path + self.TEST_CONF_FILE_NAME, PerunAdapterAbstract.LDAP),
+                          AsyncLdapAdapter)
+
+    def test_get_async_instance_multi(self):
+        path = os.getcwd()
+
+        with pytest.raises(Exception):
+            PerunAdapter.get_async_instance(path + self.TEST_CONF_FILE_NAME, PerunAdapterAbstract.MULTI)
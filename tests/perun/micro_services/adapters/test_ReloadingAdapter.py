@@ -0,0 +1,57 @@
+import os
+import time
+
+import mock
+from perun.micro_services.adapters.ReloadingAdapter import ReloadingAdapter
+from perun.micro_services.models.User import User
+
+
+class TestReloadingAdapter:
+
+    IDP = 'https://idp.example.com'
+
+    @staticmethod
+    def touch(path):
+        os.utime(path, ns=(time.time_ns() + 10 ** 9,) * 2)
+
+    @staticmethod
+    def create_factory():
+        adapters = []
+
+        def factory(config_file):
+            adapter = mock.Mock(spec=['get_perun_user', 'get_perun_users', 'close'])
+            adapter.get_perun_user.return_value = User(len(adapters) + 1, config_file)
+            adapters.append(adapter)
+            return adapter
+
+        return factory, adapters
+
+    def test_reload_changed_config(self, tmp_path):
+        config_file = tmp_path / 'perun_configuration.yml'
+        config_file.write_text('ldap.base: dc=perun\n')
+        factory, adapters = self.create_factory()
+        adapter = ReloadingAdapter(factory, str(config_file), reload_interval=0.01, close_delay=0)
+
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+        time.sleep(0.02)
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
+
+        self.touch(config_file)
+        time.sleep(0.02)
+
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 2
+        time.sleep(0.1)
+        adapters[0].close.assert_called_once()
+        adapters[1].close.assert_not_called()
+
+    def test_keep_adapter_when_reload_fails(self, tmp_path):
+        config_file = tmp_path / 'perun_configuration.yml'
+        config_file.write_text('ldap.base: dc=perun\n')
+        factory, adapters = self.create_factory()
+        adapter = ReloadingAdapter(factory, str(config_file), reload_interval=3600)
+
+        adapter.factory = mock.Mock(side_effect=Exception('Invalid configuration'))
+        self.touch(config_file)
+
+        assert not adapter.reload()
+        assert adapter.get_perun_user(self.IDP, ['a@example.com']).id == 1
@@ -0,0 +1,75 @@
+import logging
+
+from perun.micro_services.adapters.RequestLogger import RequestLogger
+
+
+class TestRequestLogger:
+
+    QUERY = {'base': 'ou=People,dc=perun', 'filter': '(|(eduPersonPrincipalNames=user1@example.com)(mail=a*))'}
+
+    @staticmethod
+    def create_logger(**kwargs):
+        return RequestLogger(logging.getLogger('test_RequestLogger'), 'ldap', personal_attributes=['mail'], **kwargs)
+
+    def test_redact(self):
+        request_logger = self.create_logger()
+        redacted = request_logger.redact({
+            'params': {'extSourceName': 'https://idp.example.com', 'extLogin': 'user1@example.com'},
+            'password': 'secret',
+            'response': [{'perunUserId': ['1'], 'displayName': ['User 1'], 'mail': ['user1@example.com']}],
+        })
+
+        pseudonym = RequestLogger.pseudonymize('user1@example.com')
+        assert redacted['params'] == {'extSourceName': 'https://idp.example.com', 'extLogin': pseudonym}
+        assert redacted['password'] == RequestLogger.REDACTED
+        assert redacted['response'] == [{'perunUserId': ['1'], 'displayName': [RequestLogger.pseudonymize('User 1')],
+                                         'mail': [pseudonym]}]
+
+    def test_redact_map_values(self):
+        request_logger = RequestLogger(logging.getLogger('test_RequestLogger'), 'rpc', personal_attributes=['value'])
+        redacted = request_logger.redact([{'friendlyName': 'preferredMail', 'value': 'user1@example.com'},
+                                          {'friendlyName': 'phones', 'value': {'work': '+420123'}}])
+
+        assert redacted[0] == {'friendlyName': 'preferredMail',
+                               'value': RequestLogger.pseudonymize('user1@example.com')}
+        assert redacted[1]['value'] == {'work': RequestLogger.pseudonymize('+420123')}
+
+    def test_redact_filter(self):
+        request_logger = self.create_logger()
+
+        assert request_logger.redact_filter('(&(objectClass=perunUser)(eduPersonPrincipalNames=*))') == \
+            '(&(objectClass=perunUser)(eduPersonPrincipalNames=*))'
+        assert request_logger.redact(self.QUERY)['filter'] == \
+            f'(|(eduPersonPrincipalNames={RequestLogger.pseudonymize("user1@example.com")})' \
+            f'(mail={RequestLogger.pseudonymize("a*")}))'
+
+    def test_slow_request_logged_redacted(self, caplog):
+        request_logger = self.create_logger(slow_threshold=0.5)
+
+        with caplog.at_level(logging.WARNING):
+            request_logger.log('search', 0.1, self.QUERY, [{'perunUserId': ['1']}])
+            request_logger.log('search', 0.7, self.QUERY, [{'perunUserId': ['1']}])
+
+        assert len(caplog.records) == 1
+        record = caplog.records[0]
+        assert record.levelno == logging.WARNING
+        assert record.perun_request['duration_ms'] == 700
+        assert 'response' not in record.perun_request
+        assert 'user1@example.com' not in record.getMessage()
+
+    def test_slow_requests_sampled(self, caplog):
+        request_logger = self.create_logger(slow_threshold=0, sample_rate=0)
+
+        with caplog.at_level(logging.DEBUG):
+            request_logger.log('search', 1, self.QUERY)
+
+        assert not caplog.records
+
+    def test_debug_only_when_enabled(self, caplog, monkeypatch):
+        request_logger = self.create_logger()
+        monkeypatch.setattr(RequestLogger, 'redact', lambda *args: (_ for _ in ()).throw(AssertionError()))
+
+        with caplog.at_level(logging.INFO):
+            request_logger.log('search', 0.1, self.QUERY, [{'perunUserId': ['1']}])
+
+        assert not caplog.records
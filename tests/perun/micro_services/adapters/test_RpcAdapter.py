@@ -1,6 +1,10 @@
 import os
+import threading
+import time
 
+import mock
 import pytest
+from perun.micro_services.adapters.Deadline import DeadlineExceeded
 from perun.micro_services.adapters.RpcAdapter import RpcAdapter
 
 
@@ -20,3 +24,121 @@ class TestRpcAdapter:
 
         with pytest.raises(Exception):
             RpcAdapter(path + self.TEST_BADCONF_FILE_NAME)
+
+    @staticmethod
+    def create_user_result(id):
+        return {'id': id, 'titleBefore': None, 'firstName': 'Test', 'middleName': '', 'lastName': 'User',
+                'titleAfter': None}
+
+    def test_get_perun_user(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = [Exception('User not found'), self.create_user_result(1)]
+
+        user = perun_adapter.get_perun_user('https://idp.example.com', ['a@example.com', 'b@example.com'])
+
+        assert user.id == 1
+        assert user.name == 'Test User'
+        assert perun_adapter.connector.get.call_count == 2
+
+    def test_get_perun_user_deadline(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = DeadlineExceeded('time budget is spent')
+
+        with pytest.raises(DeadlineExceeded):
+            perun_adapter.get_perun_user('https://idp.example.com', ['a@example.com', 'b@example.com'])
+
+        # the remaining uids are not looked up after the budget is spent
+        assert perun_adapter.connector.get.call_count == 1
+
+    def test_get_perun_user_parallel(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.parallel_lookups = True
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get(manager, method, params):
+            # all lookups have to run at the same time to pass the barrier
+            barrier.wait()
+            if params['extLogin'] == 'a@example.com':
+                raise Exception('User not found')
+            if params['extLogin'] == 'c@example.com':
+                time.sleep(0.1)
+            return self.create_user_result(params['extLogin'])
+
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = get
+
+        user = perun_adapter.get_perun_user('https://idp.example.com',
+                                            ['a@example.com', 'b@example.com', 'c@example.com'])
+
+        assert user.id == 'b@example.com'
+
+    def test_get_perun_user_parallel_priority(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        perun_adapter.parallel_lookups = True
+
+        def get(manager, method, params):
+            if params['extLogin'] == 'a@example.com':
+                time.sleep(0.1)
+            return self.create_user_result(params['extLogin'])
+
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = get
+
+        user = perun_adapter.get_perun_user('https://idp.example.com', ['a@example.com', 'b@example.com'])
+
+        assert user.id == 'a@example.com'
+
+    def test_get_perun_users(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME)
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get(manager, method, params):
+            # the batches have to be resolved at the same time to pass the barrier
+            if params['extLogin'] in ['a@example.com', 'c@example.com', 'd@example.com']:
+                barrier.wait()
+            if params['extLogin'] in ['a@example.com', 'd@example.com']:
+                raise Exception('User not found')
+            return self.create_user_result(params['extLogin'])
+
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = get
+
+        uid_batches = [['a@example.com', 'b@example.com'], ['c@example.com'], ['d@example.com']]
+        users = perun_adapter.get_perun_users('https://idp.example.com', uid_batches)
+
+        assert users == {'a@example.com': users['b@example.com'], 'b@example.com': users['b@example.com'],
+                         'c@example.com': users['c@example.com']}
+        assert users['b@example.com'].id == 'b@example.com'
+        assert users['c@example.com'].id == 'c@example.com'
+
+    def test_get_perun_user_details(self):
+        perun_adapter = RpcAdapter(os.getcwd() + self.TEST_CONF_FILE_NAME, ['email'], memberships=True)
+        responses = {
+            'usersManager.getUserByExtSourceNameAndExtLogin': self.create_user_result(1),
+            'usersManager.getVosWhereUserIsMember': [{'id': 1, 'name': 'Test VO', 'shortName': 'vo'},
+                                                     {'id': 2, 'name': 'Other VO', 'shortName': 'other'}],
+            'attributesManager.getAttributes': [{'namespace': 'urn:perun:user:attribute-def:def',
+                                                 'friendlyName': 'preferredMail', 'value': 'user@example.com'}],
+        }
+
+        def call(manager, method, params):
+            if method == 'getMemberByUser':
+                return {'id': params['vo'] * 10}
+            if method == 'getMemberGroups':
+                return [{'id': params['member'] + 1, 'name': 'group', 'description': None}]
+            return responses[f'{manager}.{method}']
+
+        perun_adapter.connector = mock.Mock()
+        perun_adapter.connector.get.side_effect = call
+        perun_adapter.connector.post.side_effect = call
+
+        user = perun_adapter.get_perun_user('https://idp.example.com', ['a@example.com'])
+
+        assert user.attributes == {'email': 'user@example.com'}
+        assert [vo.short_name for vo in user.vos] == ['vo', 'other']
+        assert [(group.id, group.vo_id, group.unique_name) for group in user.groups] == \
+            [(11, 1, 'vo:group'), (21, 2, 'other:group')]
+        assert perun_adapter.connector.post.call_args[0][2]['attrNames'] == \
+            ['urn:perun:user:attribute-def:def:preferredMail']
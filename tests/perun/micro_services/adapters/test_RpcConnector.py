@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from perun.micro_services.adapters.RpcConnector import RpcConnector
+from perun.micro_services.metrics.Metrics import Metrics
+
+
+class FakePerunRpcHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def authenticate(self):
+        """
+        Accepts a session cookie or basic authentication, which starts a new session
+        """
+        cookie = self.headers.get('Cookie', '')
+        session = cookie.partition('JSESSIONID=')[2].split(';')[0]
+        if session in self.server.sessions:
+            self.server.authentications.append('session')
+            return True
+        if self.headers.get('Authorization', '').startswith('Basic '):
+            self.server.authentications.append('basic')
+            self.new_session = str(uuid.uuid4())
+            self.server.sessions.add(self.new_session)
+            return True
+
+        self.server.authentications.append('rejected')
+        self.send_response(401)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return False
+
+    def do_GET(self):
+        self.new_session = None
+        if not self.authenticate():
+            return
+        if 'getError' in self.path:
+            self.send_json({'errorId': 1, 'message': 'Error from Perun'})
+        else:
+            self.send_json({'id': 1, 'path': self.path})
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        self.new_session = None
+        length = int(self.headers.get('Content-Length', 0))
+        if not self.authenticate():
+            self.rfile.read(length)
+            return
+        self.send_json(json.loads(self.rfile.read(length)))
+
+    def send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.new_session is not None:
+            self.send_header('Set-Cookie', f'JSESSIONID={self.new_session}; Path=/; HttpOnly')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePerunRpcServer(ThreadingHTTPServer):
+
+    request_queue_size = 64
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sessions = set()
+        self.authentications = []
+
+
+class TestRpcConnector:
+
+    @pytest.fixture
+    def server(self):
+        server = FakePerunRpcServer(('127.0.0.1', 0), FakePerunRpcHandler)
+        server.connections = 0
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def create_connector(server, session_file=None):
+        return RpcConnector(f'http://127.0.0.1:{server.server_port}/', 'user', 'password', session_file=session_file)
+
+    def test_get(self, server):
+        connector = self.create_connector(server)
+        result = connector.get('usersManager', 'getUserById', {'id': 1})
+
+        assert result['path'] == '/json/usersManager/getUserById?id=1'
+
+    def test_post(self, server):
+        connector = self.create_connector(server)
+        result = connector.post('usersManager', 'getUserById', {'id': 1})
+
+        assert result == {'id': 1}
+
+    def test_perun_error(self, server):
+        connector = self.create_connector(server)
+
+        with pytest.raises(Exception):
+            connector.get('usersManager', 'getError')
+
+    def test_session_replaces_basic_auth(self, server):
+        connector = self.create_connector(server)
+
+        for _ in range(3):
+            connector.get('usersManager', 'getUserById', {'id': 1})
+        connector.post('usersManager', 'getUserById', {'id': 1})
+
+        assert server.authentications == ['basic', 'session', 'session', 'session']
+        assert len(server.sessions) == 1
+
+    def test_expired_session_renewed(self, server):
+        connector = self.create_connector(server)
+        connector.get('usersManager', 'getUserById', {'id': 1})
+        server.sessions.clear()
+
+        assert connector.post('usersManager', 'getUserById', {'id': 1}) == {'id': 1}
+        connector.get('usersManager', 'getUserById', {'id': 1})
+
+        assert server.authentications == ['basic', 'rejected', 'basic', 'session']
+
+    def test_session_persisted(self, server, tmp_path):
+        session_file = str(tmp_path / 'rpc_session')
+        self.create_connector(server, session_file).get('usersManager', 'getUserById', {'id': 1})
+
+        assert os.path.exists(f'{session_file}.{os.getpid()}')
+
+        self.create_connector(server, session_file).get('usersManager', 'getUserById', {'id': 1})
+        assert server.authentications == ['basic', 'session']
+
+    def test_connection_kept_alive(self, server):
+        connector = self.create_connector(server)
+
+        for _ in range(5):
+            connector.get('usersManager', 'getUserById', {'id': 1})
+            connector.post('usersManager', 'getUserById', {'id': 1})
+
+        assert server.connections == 1
+
+    def test_warm_up_keeps_connection(self, server):
+        connector = self.create_connector(server)
+        connector.warm_up()
+
+        assert server.connections == 1
+        assert connector.pool.idle == 1
+
+        connector.get('usersManager', 'getUserById', {'id': 1})
+        assert server.connections == 1
+
+    def test_metrics(self, server):
+        registry = Metrics.enable()
+        try:
+            connector = self.create_connector(server)
+            connector.get('usersManager', 'getUserById', {'id': 1})
+            with pytest.raises(Exception):
+                connector.get('usersManager', 'getError')
+        finally:
+            Metrics.disable()
+
+        request_seconds = registry.get(Metrics.BACKEND_REQUEST_SECONDS)
+        assert request_seconds.get_count(('rpc', 'usersManager.getUserById')) == 1
+        assert registry.get(Metrics.BACKEND_ERRORS).get(('rpc', 'usersManager.getError', 'perun')) == 1
+        assert registry.get(Metrics.POOL_CONNECTIONS).get(('rpc', 'idle')) == 1
+        assert registry.get(Metrics.POOL_CONNECTIONS).get(('rpc', 'in_use')) == 0
@@ -0,0 +1,114 @@
+import atexit
+import os
+import subprocess
+import sys
+import time
+
+from perun.micro_services.adapters.RpcSession import RpcSession
+
+
+class TestRpcSession:
+
+    def test_cookie_header(self):
+        session = RpcSession()
+        assert session.header is None
+
+        session.update([b'HTTP/1.1 200 OK\r\n', b'Set-Cookie: JSESSIONID=abc; Path=/; HttpOnly\r\n',
+                        b'set-cookie: route=1\r\n'])
+
+        assert session.header == 'Cookie: JSESSIONID=abc; route=1'
+
+    def test_expired_cookie(self, monkeypatch):
+        session = RpcSession()
+        session.update([b'Set-Cookie: JSESSIONID=abc; Max-Age=60\r\n', b'Set-Cookie: route=1\r\n'])
+        now = time.time()
+
+        monkeypatch.setattr(time, 'time', lambda: now + 61)
+        assert session.header == 'Cookie: route=1'
+
+    def test_rejected_session_renewed(self):
+        session = RpcSession()
+        session.update([b'Set-Cookie: JSESSIONID=abc\r\n'])
+        session.update([], authenticated=True)
+
+        session.rejected()
+        assert session.header is None
+
+        session.update([b'Set-Cookie: JSESSIONID=def\r\n'])
+        assert session.header == 'Cookie: JSESSIONID=def'
+
+    def test_new_session_rejected(self):
+        session = RpcSession()
+        for _ in range(RpcSession.MAX_REJECTIONS):
+            assert session.enabled
+            session.update([b'Set-Cookie: JSESSIONID=abc\r\n'])
+            session.rejected()
+
+        session.update([b'Set-Cookie: JSESSIONID=def\r\n'])
+        assert not session.enabled
+        assert session.header is None
+
+    def test_concurrent_rejections_counted_once(self):
+        session = RpcSession()
+        for _ in range(RpcSession.MAX_REJECTIONS - 1):
+            session.update([b'Set-Cookie: JSESSIONID=abc\r\n'])
+            header = session.header
+            # requests sent with the same session rejected at once
+            for _ in range(RpcSession.MAX_REJECTIONS):
+                session.rejected(header)
+            assert session.header is None
+
+        session.update([b'Set-Cookie: JSESSIONID=def\r\n'])
+        assert session.enabled
+        session.rejected('Cookie: JSESSIONID=abc')
+        assert session.header == 'Cookie: JSESSIONID=def'
+
+    def test_persisted_session(self, tmp_path):
+        path = str(tmp_path / 'rpc_session')
+        RpcSession(path).update([b'Set-Cookie: JSESSIONID=abc; Max-Age=3600\r\n'])
+
+        assert RpcSession(path).header == 'Cookie: JSESSIONID=abc'
+        assert RpcSession(str(tmp_path / 'other')).header is None
+
+    def test_close_removes_file(self, tmp_path):
+        path = str(tmp_path / 'rpc_session')
+        session = RpcSession(path)
+        session.update([b'Set-Cookie: JSESSIONID=abc; Max-Age=3600\r\n'])
+        assert os.path.exists(f'{path}.{os.getpid()}')
+
+        session.close()
+        assert not os.path.exists(f'{path}.{os.getpid()}')
+        assert RpcSession(path).header is None
+
+    def test_close_keeps_file_of_newer_session(self, tmp_path):
+        path = str(tmp_path / 'rpc_session')
+        old = RpcSession(path)
+        old.update([b'Set-Cookie: JSESSIONID=abc; Max-Age=3600\r\n'])
+        new = RpcSession(path)
+
+        # e.g. the adapter replaced by a reload is closed after the new one has started
+        old.close()
+        assert new.header == 'Cookie: JSESSIONID=abc'
+        assert os.path.exists(f'{path}.{os.getpid()}')
+
+    def test_stale_file_resumed_and_removed(self, tmp_path):
+        path = str(tmp_path / 'rpc_session')
+        process = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                 stdout=subprocess.PIPE, check=True)
+        stale_path = f'{path}.{int(process.stdout)}'
+        with open(stale_path, 'w') as f:
+            f.write('[["JSESSIONID", "abc", null]]')
+
+        assert RpcSession(path).header == 'Cookie: JSESSIONID=abc'
+        assert not os.path.exists(stale_path)
+        assert os.path.exists(f'{path}.{os.getpid()}')
+
+    def test_close_unregisters_exit_handler(self, tmp_path, monkeypatch):
+        registered = []
+        monkeypatch.setattr(atexit, 'register', registered.append)
+        monkeypatch.setattr(atexit, 'unregister', registered.remove)
+
+        session = RpcSession(str(tmp_path / 'rpc_session'))
+        assert registered == [session.close]
+        session.close()
+        assert registered == []
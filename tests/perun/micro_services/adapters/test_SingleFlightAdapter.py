@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+from perun.micro_services.adapters.PerunAdapterAbstract import PerunAdapterAbstract
+from perun.micro_services.adapters.SingleFlightAdapter import SingleFlightAdapter
+from perun.micro_services.metrics.Metrics import Metrics
+from perun.micro_services.models.User import User
+
+
+class BlockingAdapter(PerunAdapterAbstract):
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_perun_user(self, idp_entity_id, uids, identifiers=None):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return User(1, uids[0])
+
+
+class TestSingleFlightAdapter:
+
+    IDP = 'https://idp.example.com'
+    CALLERS = 8
+
+    @staticmethod
+    def call_concurrently(adapter, backend, uids):
+        with ThreadPoolExecutor(TestSingleFlightAdapter.CALLERS) as executor:
+            futures = [executor.submit(adapter.get_perun_user, TestSingleFlightAdapter.IDP, uids)
+                       for _ in range(TestSingleFlightAdapter.CALLERS)]
+            # all callers but the leader wait for the in-flight lookup
+            while adapter.coalesced < TestSingleFlightAdapter.CALLERS - 1:
+                threading.Event().wait(0.01)
+            backend.release.set()
+            return futures
+
+    @pytest.fixture
+    def metrics(self):
+        yield Metrics.enable()
+        Metrics.disable()
+
+    def test_concurrent_lookups_coalesced(self, metrics):
+        backend = BlockingAdapter()
+        adapter = SingleFlightAdapter(backend)
+
+        futures = self.call_concurrently(adapter, backend, ['a@example.com'])
+
+        assert {future.result().name for future in futures} == {'a@example.com'}
+        assert backend.calls == 1
+        assert adapter.in_flight == 0
+        assert metrics.get(Metrics.COALESCED_CALLS).get() == self.CALLERS - 1
+
+    def test_error_shared(self):
+        backend = BlockingAdapter(Exception('Perun unavailable'))
+        adapter = SingleFlightAdapter(backend)
+
+        futures = self.call_concurrently(adapter, backend, ['a@example.com'])
+
+        for future in futures:
+            with pytest.raises(Exception, match='Perun unavailable'):
+                future.result()
+        assert backend.calls == 1
+
+    def test_different_lookups_not_coalesced(self):
+        backend = BlockingAdapter()
+        backend.release.set()
+        adapter = SingleFlightAdapter(backend)
+
+        adapter.get_perun_user(self.IDP, ['a@example.com'])
+        adapter.get_perun_user(self.IDP, ['b@example.com'])
+        adapter.get_perun_user('https://other.example.com', ['a@example.com'])
+
+        assert backend.calls == 3
+        assert adapter.coalesced == 0
+
+    def test_follower_deadline(self):
+        backend = BlockingAdapter()
+        adapter = SingleFlightAdapter(backend)
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(adapter.get_perun_user, self.IDP, ['uid'])
+            while adapter.in_flight == 0:
+                threading.Event().wait(0.01)
+
+            with Deadline.start(0.05):
+                with pytest.raises(DeadlineExceeded):
+                    adapter.get_perun_user(self.IDP, ['uid'])
+
+            backend.release.set()
+            assert leader.result().id == 1
@@ -0,0 +1,30 @@
+import pytest
+from perun.micro_services.cache.CacheBackend import CacheBackend
+from perun.micro_services.cache.MemcachedCache import MemcachedCache
+from perun.micro_services.cache.MemoryCache import MemoryCache
+from perun.micro_services.cache.SqliteCache import SqliteCache
+
+
+class TestCacheBackend:
+
+    def test_get_instance_memory(self):
+        assert isinstance(CacheBackend.get_instance({}), MemoryCache)
+
+    def test_get_instance_sqlite(self, tmp_path):
+        cache = CacheBackend.get_instance({'backend': 'sqlite', 'path': str(tmp_path / 'cache.sqlite')})
+
+        assert isinstance(cache, SqliteCache)
+
+    def test_get_instance_memcached(self):
+        cache = CacheBackend.get_instance({'backend': 'memcached', 'server': '127.0.0.1:11211'})
+
+        assert isinstance(cache, MemcachedCache)
+        assert cache.address == ('127.0.0.1', 11211)
+
+    def test_get_instance_missing_option(self):
+        with pytest.raises(Exception):
+            CacheBackend.get_instance({'backend': 'sqlite'})
+
+    def test_get_instance_unknown(self):
+        with pytest.raises(Exception):
+            CacheBackend.get_instance({'backend': 'unknown'})
@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+from perun.micro_services.cache.SnapshotLoader import SnapshotLoader
+from perun.micro_services.models.User import User
+
+
+class TestCacheSnapshot:
+
+    IDP = 'https://idp.example.com'
+
+    @staticmethod
+    def write(path, mappings, created_at=None):
+        CacheSnapshot.write(str(path), mappings, created_at)
+        return CacheSnapshot(str(path))
+
+    def test_get(self, tmp_path):
+        snapshot = self.write(tmp_path / 'snapshot', [
+            (CacheSnapshot.get_key(self.IDP, 'a@example.com'), User(1, 'Test user')),
+            (CacheSnapshot.get_key('*', 'b@example.com'), User('2', None)),
+            (CacheSnapshot.get_key('*', 'žluťoučký@example.com'), User(3, 'Kůň')),
+        ])
+
+        assert len(snapshot) == 3
+        user = snapshot.get(self.IDP, 'a@example.com')
+        assert (user.id, user.name) == ('1', 'Test user')
+        assert snapshot.get('https://other.example.com', 'a@example.com') is None
+        assert snapshot.get('https://other.example.com', 'b@example.com').name is None
+        assert snapshot.get(self.IDP, 'žluťoučký@example.com').name == 'Kůň'
+        assert snapshot.get(self.IDP, 'c@example.com') is None
+        snapshot.close()
+
+    def test_many_records(self, tmp_path):
+        mappings = ((CacheSnapshot.get_key('*', f'user{id}'), User(id, f'User {id}')) for id in range(1000))
+        snapshot = self.write(tmp_path / 'snapshot', mappings)
+
+        assert all(snapshot.get(self.IDP, f'user{id}').id == str(id) for id in range(1000))
+        assert snapshot.get(self.IDP, 'user1000') is None
+
+    def test_empty(self, tmp_path):
+        snapshot = self.write(tmp_path / 'snapshot', [])
+
+        assert len(snapshot) == 0
+        assert snapshot.get(self.IDP, 'a@example.com') is None
+
+    def test_not_snapshot(self, tmp_path):
+        path = tmp_path / 'snapshot'
+        path.write_bytes(b'\0' * 64)
+
+        with pytest.raises(Exception):
+            CacheSnapshot(str(path))
+
+    def test_loader_reloads_replaced_file(self, tmp_path):
+        path = tmp_path / 'snapshot'
+        CacheSnapshot.write(str(path), [(CacheSnapshot.get_key('*', 'a@example.com'), User(1, 'Test user'))])
+        loader = SnapshotLoader(str(path)).start()
+
+        assert loader.get(self.IDP, 'a@example.com').id == '1'
+        assert not loader.load()
+
+        CacheSnapshot.write(str(path), [(CacheSnapshot.get_key('*', 'a@example.com'), User(2, 'Test user'))])
+        os.utime(str(path), ns=(time.time_ns() + 10 ** 9,) * 2)
+
+        assert loader.load()
+        assert loader.get(self.IDP, 'a@example.com').id == '2'
+
+    def test_loader_ignores_old_or_missing_snapshot(self, tmp_path):
+        path = tmp_path / 'snapshot'
+        loader = SnapshotLoader(str(path), max_age=60).start()
+
+        assert loader.get(self.IDP, 'a@example.com') is None
+
+        CacheSnapshot.write(str(path), [(CacheSnapshot.get_key('*', 'a@example.com'), User(1, 'Test user'))],
+                            created_at=time.time() - 120)
+
+        assert loader.load()
+        assert loader.get(self.IDP, 'a@example.com') is None
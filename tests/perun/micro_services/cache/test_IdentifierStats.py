@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from perun.micro_services.cache.IdentifierStats import IdentifierStats
+
+
+class TestIdentifierStats:
+
+    IDP = 'https://idp.example.com'
+    IDENTIFIERS = ['edupersonuniqueid', 'edupersonprincipalname', 'mail']
+
+    def test_order(self):
+        stats = IdentifierStats()
+        assert stats.order(self.IDP, self.IDENTIFIERS) == self.IDENTIFIERS
+
+        stats.record(self.IDP, 'edupersonuniqueid', False)
+        # identifiers not looked up yet are tried before the missing one
+        assert stats.order(self.IDP, self.IDENTIFIERS)[-1] == 'edupersonuniqueid'
+
+        for _ in range(3):
+            stats.record(self.IDP, 'mail', True)
+        assert stats.order(self.IDP, self.IDENTIFIERS) == ['mail', 'edupersonprincipalname', 'edupersonuniqueid']
+        assert stats.order('https://other.example.com', self.IDENTIFIERS) == self.IDENTIFIERS
+
+    def test_counts_decay(self):
+        stats = IdentifierStats()
+        for _ in range(IdentifierStats.MAX_LOOKUPS + 1):
+            stats.record(self.IDP, 'mail', True)
+
+        assert stats.get(self.IDP, 'mail') == ((IdentifierStats.MAX_LOOKUPS + 1) // 2,) * 2
+
+    def test_persistence(self, tmp_path):
+        path = str(tmp_path / 'stats.json')
+        first = IdentifierStats(path)
+        second = IdentifierStats(path)
+        first.record(self.IDP, 'mail', True)
+        second.record(self.IDP, 'mail', False)
+        second.record(self.IDP, 'edupersonuniqueid', True)
+
+        first.save()
+        second.save()
+
+        assert second.get(self.IDP, 'mail') == (1, 2)
+        restarted = IdentifierStats(path)
+        assert restarted.get(self.IDP, 'mail') == (1, 2)
+        assert restarted.get(self.IDP, 'edupersonuniqueid') == (1, 1)
+
+    def test_save_interval(self, tmp_path):
+        path = tmp_path / 'stats.json'
+        stats = IdentifierStats(str(path), save_interval=0)
+        stats.record(self.IDP, 'mail', True)
+
+        assert path.exists()
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'stats.json'
+        path.write_text('not json')
+
+        assert IdentifierStats(str(path)).get(self.IDP, 'mail') == (0, 0)
+
+    def test_close_saves_pending_counts(self, tmp_path):
+        path = str(tmp_path / 'stats.json')
+        stats = IdentifierStats(path)
+        stats.record(self.IDP, 'mail', True)
+        stats.close()
+
+        assert IdentifierStats(path).get(self.IDP, 'mail') == (1, 1)
+
+    def test_concurrent_saves(self, tmp_path):
+        path = str(tmp_path / 'stats.json')
+        workers = [IdentifierStats(path) for _ in range(4)]
+
+        def record(stats):
+            for _ in range(25):
+                stats.record(self.IDP, 'mail', True)
+                stats.save()
+
+        with ThreadPoolExecutor(len(workers)) as executor:
+            list(executor.map(record, workers))
+
+        assert IdentifierStats(path).get(self.IDP, 'mail') == (100, 100)
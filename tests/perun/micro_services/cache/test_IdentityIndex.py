@@ -0,0 +1,65 @@
+from perun.micro_services.cache.IdentityIndex import IdentityIndex
+from perun.micro_services.models.User import User
+
+
+class TestIdentityIndex:
+
+    def test_replace(self, tmp_path):
+        index = IdentityIndex(str(tmp_path / 'index.sqlite'))
+        index.update([(User('1', 'Old user'), [('mail', 'old@example.com')])])
+
+        count = index.replace([
+            (User('1', 'User 1'), [('eduPersonPrincipalNames', 'User1@example.com'), ('mail', 'mail1@example.com')]),
+            (User('2', None), [('eduPersonPrincipalNames', 'user2@example.com')]),
+        ])
+
+        assert count == len(index) == 2
+        assert index.get('eduPersonPrincipalNames', 'user1@EXAMPLE.com').name == 'User 1'
+        assert index.get('mail', 'mail1@example.com').id == '1'
+        assert index.get('mail', 'old@example.com') is None
+        assert index.get('mail', 'user2@example.com') is None
+
+    def test_update(self, tmp_path):
+        index = IdentityIndex(str(tmp_path / 'index.sqlite'))
+        index.replace([(User('1', 'User 1'), [('mail', 'a@example.com')]),
+                       (User('2', 'User 2'), [('mail', 'b@example.com')])])
+
+        index.update([(User('1', 'Renamed'), [('mail', 'c@example.com')])])
+
+        assert index.get('mail', 'a@example.com') is None
+        assert index.get('mail', 'c@example.com').name == 'Renamed'
+        assert index.get('mail', 'b@example.com').id == '2'
+
+    def test_shared_by_processes(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        IdentityIndex(path).replace([(User('1', 'User 1'), [('mail', 'a@example.com')])])
+
+        assert IdentityIndex(path).get('mail', 'a@example.com').id == '1'
+
+    def test_claim(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        index = IdentityIndex(path)
+
+        assert index.claim('sync', 1000, 60)
+        assert not IdentityIndex(path).claim('sync', 1030, 60)
+        assert IdentityIndex(path).claim('sync', 1060, 60)
+        assert index.get_meta('sync') == 1060
+
+    def test_replace_does_not_block_writers(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        index = IdentityIndex(path)
+        index.replace([(User('1', 'Old user'), [('mail', 'old@example.com')])])
+        other = IdentityIndex(path)
+        other.BUSY_TIMEOUT = 0
+
+        def users():
+            for i in range(IdentityIndex.STAGE_BATCH_SIZE + 1):
+                yield User(str(i), f'User {i}'), [('mail', f'{i}@example.com')]
+            # other processes still read the previous index and write to it while users are read
+            assert other.get('mail', 'old@example.com').id == '1'
+            other.set_meta('last_sync', 1)
+
+        assert index.replace(users()) == IdentityIndex.STAGE_BATCH_SIZE + 1
+        assert len(index) == IdentityIndex.STAGE_BATCH_SIZE + 1
+        assert index.get('mail', 'old@example.com') is None
+        assert index.get_meta('last_sync') == 1
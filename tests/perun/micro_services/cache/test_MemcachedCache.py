@@ -0,0 +1,76 @@
+import socketserver
+import threading
+import time
+
+import pytest
+from perun.micro_services.cache.MemcachedCache import MemcachedCache
+
+
+class FakeMemcachedHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        store = self.server.store
+        for line in self.rfile:
+            command, *args = line.decode().split()
+            if command == 'get':
+                value = store.get(args[0])
+                if value is not None and value[1] > time.time():
+                    self.wfile.write(f'VALUE {args[0]} 0 {len(value[0])}\r\n'.encode() + value[0] + b'\r\n')
+                self.wfile.write(b'END\r\n')
+            elif command == 'set':
+                data = self.rfile.read(int(args[3]) + 2)[:-2]
+                store[args[0]] = (data, time.time() + int(args[2]))
+                self.wfile.write(b'STORED\r\n')
+            elif command == 'delete':
+                self.wfile.write(b'DELETED\r\n' if store.pop(args[0], None) else b'NOT_FOUND\r\n')
+            elif command == 'flush_all':
+                store.clear()
+                self.wfile.write(b'OK\r\n')
+
+
+class TestMemcachedCache:
+
+    @pytest.fixture
+    def server(self):
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeMemcachedHandler)
+        server.daemon_threads = True
+        server.store = {}
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def address(server):
+        return f'127.0.0.1:{server.server_address[1]}'
+
+    def test_get_set(self, server):
+        cache = MemcachedCache(self.address(server))
+        cache.set('https://idp.example.com|a@example.com', {'user': {'id': 1, 'name': 'Test user'}}, 60)
+
+        assert cache.get('https://idp.example.com|a@example.com') == {'user': {'id': 1, 'name': 'Test user'}}
+        assert cache.get('other') is None
+
+    def test_shared_between_clients(self, server):
+        MemcachedCache(self.address(server)).set('key', {'user': None}, 60)
+
+        assert MemcachedCache(self.address(server)).get('key') == {'user': None}
+
+    def test_delete_clear(self, server):
+        cache = MemcachedCache(self.address(server))
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.delete('a')
+
+        assert cache.get('a') is None
+        cache.clear()
+        assert cache.get('b') is None
+
+    def test_unavailable_server(self, server):
+        cache = MemcachedCache(self.address(server))
+        server.shutdown()
+        server.server_close()
+
+        cache.set('key', 1, 60)
+        assert cache.get('key') is None
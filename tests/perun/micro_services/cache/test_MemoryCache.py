@@ -0,0 +1,44 @@
+import pytest
+from perun.micro_services.cache.MemoryCache import MemoryCache
+
+
+class TestMemoryCache:
+
+    def test_get_set(self):
+        cache = MemoryCache()
+        cache.set('key', 'value', 60)
+
+        assert cache.get('key') == 'value'
+        assert cache.get('other') is None
+
+    def test_ttl(self):
+        cache = MemoryCache()
+        cache.set('key', 'value', 0)
+
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_size=2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.get('a')
+        cache.set('c', 3, 60)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_delete_clear(self):
+        cache = MemoryCache()
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.delete('a')
+
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_bad_size(self):
+        with pytest.raises(ValueError):
+            MemoryCache(max_size=0)
@@ -0,0 +1,77 @@
+import base64
+import io
+
+import mock
+import pytest
+
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+from perun.micro_services.cache.SnapshotBuilder import SnapshotBuilder, main
+
+
+class TestSnapshotBuilder:
+
+    IDP = 'https://idp.example.com'
+    LDIF = f"""version: 1
+
+# Test user
+dn: perunUserId=1,ou=People,dc=perun
+objectClass: perunUser
+perunUserId: 1
+displayName: Test user
+cn: Test user
+eduPersonPrincipalNames: a@example.com
+eduPersonPrincipalNames: b@exam
+ ple.com
+
+dn: perunUserId=2,ou=People,dc=perun
+perunuserid: 2
+displayName:: {base64.b64encode('Žluťoučký kůň'.encode('utf-8')).decode()}
+edupersonprincipalnames: c@example.com
+mail: c@example.com
+
+dn: ou=People,dc=perun
+ou: People
+"""
+
+    def test_read_ldif(self):
+        entries = list(SnapshotBuilder(['eduPersonPrincipalNames']).read_ldif(io.StringIO(self.LDIF)))
+
+        assert entries[0] == {
+            'perunUserId': ['1'],
+            'displayName': ['Test user'],
+            'cn': ['Test user'],
+            'eduPersonPrincipalNames': ['a@example.com', 'b@example.com'],
+        }
+        assert entries[1]['displayName'] == ['Žluťoučký kůň']
+        assert len(entries) == 2
+
+    def test_build(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        builder = SnapshotBuilder(['eduPersonPrincipalNames', 'mail'], self.IDP)
+
+        assert builder.build(path, builder.read_ldif(io.StringIO(self.LDIF))) == 3
+
+        snapshot = CacheSnapshot(path)
+        assert snapshot.get(self.IDP, 'b@example.com').id == '1'
+        assert snapshot.get(self.IDP, 'c@example.com').name == 'Žluťoučký kůň'
+        assert snapshot.get('https://other.example.com', 'a@example.com') is None
+
+    def test_main(self, tmp_path):
+        ldif = tmp_path / 'dump.ldif'
+        ldif.write_text(self.LDIF, encoding='utf-8')
+        path = str(tmp_path / 'snapshot')
+
+        assert main(['--ldif', str(ldif), '--output', path]) == 0
+        assert CacheSnapshot(path).get(self.IDP, 'a@example.com').name == 'Test user'
+
+    @mock.patch('perun.micro_services.cache.SnapshotBuilder.LdapAdapter')
+    def test_main_closes_adapter(self, mock_adapter, tmp_path):
+        adapter = mock_adapter.return_value
+        adapter.filter_builder.attributes = ['eduPersonPrincipalNames']
+        adapter.base = 'dc=perun,dc=example,dc=com'
+        adapter.connector.search_paged.side_effect = Exception('LDAP unavailable')
+
+        with pytest.raises(Exception):
+            main(['--perun-config', 'perun_configuration.yml', '--output', str(tmp_path / 'snapshot')])
+
+        adapter.close.assert_called_once()
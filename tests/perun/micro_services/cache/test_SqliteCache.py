@@ -0,0 +1,54 @@
+import multiprocessing
+
+from perun.micro_services.cache.SqliteCache import SqliteCache
+
+
+def warm_cache(path):
+    SqliteCache(path).set('key', {'user': {'id': 1, 'name': 'Test user'}}, 60)
+
+
+class TestSqliteCache:
+
+    def test_get_set(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / 'cache.sqlite'))
+        cache.set('key', {'user': None}, 60)
+
+        assert cache.get('key') == {'user': None}
+        assert cache.get('other') is None
+
+    def test_ttl(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / 'cache.sqlite'))
+        cache.set('key', 'value', 0)
+
+        assert cache.get('key') is None
+
+    def test_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+        cache = SqliteCache(path)
+
+        process = multiprocessing.get_context('spawn').Process(target=warm_cache, args=(path,))
+        process.start()
+        process.join(30)
+
+        assert cache.get('key') == {'user': {'id': 1, 'name': 'Test user'}}
+
+    def test_purge(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / 'cache.sqlite'), max_size=2, purge_interval=1)
+        cache.set('expired', 0, 0)
+        cache.set('a', 1, 10)
+        cache.set('b', 2, 20)
+        cache.set('c', 3, 30)
+
+        assert len(cache) == 2
+        assert cache.get('a') is None
+        assert cache.get('c') == 3
+
+    def test_delete_clear(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / 'cache.sqlite'))
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.delete('a')
+
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
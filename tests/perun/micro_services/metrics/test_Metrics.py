@@ -0,0 +1,52 @@
+import pytest
+from perun.micro_services.metrics.Metrics import Metrics
+from perun.micro_services.metrics.MetricsExporterAbstract import MetricsExporterAbstract
+from perun.micro_services.metrics.PrometheusExporter import PrometheusExporter
+
+
+class FakeExporter(MetricsExporterAbstract):
+
+    def __init__(self, registry, config):
+        self.registry = registry
+        self.config = config
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def close(self):
+        self.started = False
+
+
+class TestMetrics:
+
+    @pytest.fixture(autouse=True)
+    def disable_metrics(self):
+        yield
+        Metrics.disable()
+
+    def test_disabled_by_default(self):
+        Metrics.backend_errors().inc(('ldap', 'search', 'error'))
+
+        assert not Metrics.registry.enabled
+        assert Metrics.registry.collect() == []
+
+    def test_configure(self):
+        registry = Metrics.configure({})
+        Metrics.backend_errors().inc(('ldap', 'search', 'error'))
+
+        assert registry.enabled
+        assert isinstance(Metrics.exporter, PrometheusExporter)
+        assert registry.get(Metrics.BACKEND_ERRORS).get(('ldap', 'search', 'error')) == 1
+        assert Metrics.configure({}) is registry
+
+    def test_custom_exporter(self):
+        Metrics.configure({'exporter': f'{__name__}.FakeExporter', 'option': 'value'})
+
+        assert isinstance(Metrics.exporter, FakeExporter)
+        assert Metrics.exporter.started
+        assert Metrics.exporter.config['option'] == 'value'
+
+    def test_unknown_exporter(self):
+        with pytest.raises(Exception):
+            Metrics.configure({'exporter': 'unknown'})
@@ -0,0 +1,59 @@
+import pytest
+from perun.micro_services.metrics.Histogram import Histogram
+from perun.micro_services.metrics.MetricsRegistry import MetricsRegistry
+from perun.micro_services.metrics.NullMetric import NullMetric
+from perun.micro_services.metrics.NullRegistry import NullRegistry
+
+
+class TestMetricsRegistry:
+
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('requests_total', 'Requests.', ('backend',))
+        counter.inc(('ldap',))
+        counter.inc(('ldap',), 2)
+
+        assert registry.counter('requests_total', 'Requests.', ('backend',)) is counter
+        assert counter.get(('ldap',)) == 3
+        assert list(counter.samples()) == [('requests_total', (('backend', 'ldap'),), 3)]
+
+    def test_gauge_function(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge('connections', 'Connections.', ('state',))
+        gauge.set(1, ('idle',))
+        gauge.set_function(lambda: 4, ('in_use',))
+
+        assert sorted(gauge.samples()) == [
+            ('connections', (('state', 'idle'),), 1),
+            ('connections', (('state', 'in_use'),), 4),
+        ]
+
+    def test_histogram(self):
+        histogram = MetricsRegistry().histogram('seconds', 'Duration.', buckets=(0.1, 1))
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value)
+
+        assert histogram.get_count() == 4
+        assert histogram.get_sum() == pytest.approx(2.65)
+        assert list(histogram.samples()) == [
+            ('seconds_bucket', (('le', 0.1),), 2),
+            ('seconds_bucket', (('le', 1),), 3),
+            ('seconds_bucket', (('le', float('inf')),), 4),
+            ('seconds_sum', (), pytest.approx(2.65)),
+            ('seconds_count', (), 4),
+        ]
+
+    def test_type_conflict(self):
+        registry = MetricsRegistry()
+        registry.counter('seconds', 'Duration.')
+
+        with pytest.raises(Exception):
+            registry.histogram('seconds', 'Duration.')
+
+    def test_null_registry(self):
+        registry = NullRegistry()
+        histogram = registry.histogram('seconds', 'Duration.', buckets=Histogram.DEFAULT_BUCKETS)
+        histogram.observe(1)
+
+        assert histogram is NullMetric.INSTANCE
+        assert registry.collect() == []
@@ -0,0 +1,42 @@
+import urllib.request
+
+from perun.micro_services.metrics.MetricsRegistry import MetricsRegistry
+from perun.micro_services.metrics.PrometheusExporter import PrometheusExporter
+
+
+class TestPrometheusExporter:
+
+    @staticmethod
+    def create_registry():
+        registry = MetricsRegistry()
+        registry.counter('perun_errors_total', 'Failed requests.', ('method',)).inc(('say "hi"\n',))
+        registry.histogram('perun_seconds', 'Duration.', buckets=(0.5,)).observe(0.25)
+        return registry
+
+    def test_render(self):
+        text = PrometheusExporter(self.create_registry()).render()
+
+        assert text == (
+            '# HELP perun_errors_total Failed requests.\n'
+            '# TYPE perun_errors_total counter\n'
+            'perun_errors_total{method="say \\"hi\\"\\n"} 1\n'
+            '# HELP perun_seconds Duration.\n'
+            '# TYPE perun_seconds histogram\n'
+            'perun_seconds_bucket{le="0.5"} 1\n'
+            'perun_seconds_bucket{le="+Inf"} 1\n'
+            'perun_seconds_sum 0.25\n'
+            'perun_seconds_count 1\n'
+        )
+
+    def test_serve(self):
+        exporter = PrometheusExporter(self.create_registry(), port=0)
+        exporter.start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{exporter.server.server_port}/metrics') as response:
+                body = response.read().decode('utf-8')
+                content_type = response.headers['Content-Type']
+        finally:
+            exporter.close()
+
+        assert content_type == PrometheusExporter.CONTENT_TYPE
+        assert 'perun_seconds_count 1' in body
@@ -1,8 +1,22 @@
 import os
+import subprocess
+import sys
 
 import mock
 import pytest
+from perun.micro_services.adapters.AdapterRegistry import AdapterRegistry
+from perun.micro_services.adapters.AsyncAdapterShim import AsyncAdapterShim
+from perun.micro_services.adapters.AsyncLdapAdapter import AsyncLdapAdapter
+from perun.micro_services.adapters.CachingAdapter import CachingAdapter
+from perun.micro_services.adapters.Deadline import Deadline, DeadlineExceeded
+from perun.micro_services.adapters.ReloadingAdapter import ReloadingAdapter
+from perun.micro_services.adapters.SingleFlightAdapter import SingleFlightAdapter
+from perun.micro_services.cache.CacheSnapshot import CacheSnapshot
+from perun.micro_services.cache.IdentifierStats import IdentifierStats
+from perun.micro_services.metrics.Metrics import Metrics
+from perun.micro_services.models.Group import Group
 from perun.micro_services.models.User import User
+from perun.micro_services.models.Vo import Vo
 from perun.micro_services.perun_identity import PerunIdentity
 from satosa.internal import InternalData, AuthenticationInformation
 
@@ -38,13 +52,116 @@ class TestPerunIdentity:
         with pytest.raises(Exception):
             PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
 
+    def test_cache_conf(self):
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            cache=dict(max_size=10, ttl=60, negative_ttl=10)
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        assert isinstance(service.adapter, CachingAdapter)
+        assert service.adapter.cache.max_size == 10
+        assert service.adapter.negative_ttl == 10
+
+    def test_single_flight_conf(self):
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=os.getcwd() + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            single_flight=True,
+            cache=dict()
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        assert isinstance(service.adapter, CachingAdapter)
+        assert isinstance(service.adapter.adapter, SingleFlightAdapter)
+
+    def test_lazy_imports(self):
+        code = ('import sys; import perun.micro_services.perun_identity; '
+                'print(" ".join(sorted(set(sys.modules) & {"ldap3", "pycurl", "yaml", "asyncio"})))')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == ''
+
+    def test_warm_up_failure_ignored(self):
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=os.getcwd() + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            warm_up=True
+        )
+        with mock.patch('perun.micro_services.adapters.LdapAdapter.LdapAdapter.warm_up',
+                        side_effect=Exception('Perun unavailable')) as warm_up:
+            PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        warm_up.assert_called_once()
+
+    def test_shared_adapter_conf(self):
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=os.getcwd() + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            shared_adapter=True,
+            reload_interval=30,
+            cache=dict()
+        )
+        try:
+            first = PerunIdentity(config=config, name='first_service', base_url='https://satosa.example.com')
+            second = PerunIdentity(config=dict(config, uids_identifiers=['edupersonprincipalname']),
+                                   name='second_service', base_url='https://satosa.example.com')
+            other = PerunIdentity(config=dict(config, cache=dict(ttl=60)),
+                                  name='other_service', base_url='https://satosa.example.com')
+        finally:
+            AdapterRegistry.clear()
+
+        assert first.adapter is second.adapter
+        assert first.adapter is not other.adapter
+        assert isinstance(first.adapter.adapter, ReloadingAdapter)
+
+    def test_snapshot_conf(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key('*', 'principalname@example.com'), User(1, 'Test user'))])
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=os.getcwd() + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            cache=dict(snapshot=dict(path=path))
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+        service.next = lambda ctx, data: data
+
+        data = InternalData(auth_info=AuthenticationInformation(issuer='https://idp.example.com'))
+        data.attributes = self.ATTRIBUTES.copy()
+        data = service.process(None, data)
+
+        assert data.attributes['perun_id'] == ['1']
+        assert service.adapter.snapshot_hits == 1
+
+    def test_asyncio_conf(self):
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            asyncio=True,
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname']
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        assert isinstance(service.adapter, AsyncAdapterShim)
+        assert isinstance(service.adapter.adapter, AsyncLdapAdapter)
+        service.adapter.close()
+
     @mock.patch('perun.micro_services.adapters.RpcAdapter')
     def test_perun_identity_none_user(self, mock_adapter):
         mock_adapter.get_perun_user.return_value = None
         service = self.create_perun_identity_service()
         service.adapter = mock_adapter
         resp = InternalData(auth_info=AuthenticationInformation())
-        resp.attributes = self.ATTRIBUTES
+        resp.attributes = dict(self.ATTRIBUTES)
 
         returned_service = service.process(None, resp)
         assert 'perun_id' not in returned_service.attributes.keys()
@@ -56,8 +173,190 @@ class TestPerunIdentity:
         service = self.create_perun_identity_service()
         service.adapter = mock_adapter
         resp = InternalData(auth_info=AuthenticationInformation())
-        resp.attributes = self.ATTRIBUTES
+        resp.attributes = dict(self.ATTRIBUTES)
 
         returned_service = service.process(None, resp)
         assert 'perun_id' in returned_service.attributes.keys()
         assert returned_service.attributes.get('perun_id') == [user.id]
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_perun_identity_user_details(self, mock_adapter):
+        mock_adapter.get_perun_user.return_value = User(1, 'Test user', {'email': 'user@example.com', 'phone': None},
+                                                        [Vo(1, 'Test VO', 'vo')],
+                                                        [Group(10, 1, 'group', None, 'vo:group')])
+        service = self.create_perun_identity_service()
+        service.adapter = mock_adapter
+        resp = InternalData(auth_info=AuthenticationInformation())
+        resp.attributes = dict(self.ATTRIBUTES)
+
+        attributes = service.process(None, resp).attributes
+        assert attributes['perun_id'] == [1]
+        assert attributes['email'] == ['user@example.com']
+        assert 'phone' not in attributes
+        assert attributes['perun_vos'] == ['vo']
+        assert attributes['perun_groups'] == ['vo:group']
+
+    def test_user_details_conf(self):
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            user_attributes=['email'],
+            memberships=True
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        assert service.adapter.user_attributes == {'email': 'preferredMail'}
+        assert service.adapter.attributes[-1] == 'memberOf'
+        # values of the mapped attributes are redacted in logs
+        assert 'preferredmail' in service.adapter.connector.request_logger.personal_keys
+
+    def test_snapshot_not_used_with_user_details(self, tmp_path):
+        path = str(tmp_path / 'snapshot')
+        CacheSnapshot.write(path, [(CacheSnapshot.get_key('*', 'principalname@example.com'), User(1, 'Test user'))])
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=os.getcwd() + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            user_attributes=['email'],
+            cache=dict(snapshot=dict(path=path))
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+
+        assert service.adapter.snapshot is None
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_perun_identity_adapter_failure(self, mock_adapter):
+        mock_adapter.get_perun_user.side_effect = Exception('Perun unavailable')
+        service = self.create_perun_identity_service()
+        service.adapter = mock_adapter
+        resp = InternalData(auth_info=AuthenticationInformation())
+        resp.attributes = dict(self.ATTRIBUTES)
+
+        returned_service = service.process(None, resp)
+        assert 'perun_id' not in returned_service.attributes.keys()
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_process_metrics(self, mock_adapter):
+        mock_adapter.get_perun_user.return_value = User(1, 'Test user')
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            metrics=dict(exporter='prometheus')
+        )
+        try:
+            service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+            service.next = lambda ctx, data: data
+            service.adapter = mock_adapter
+            resp = InternalData(auth_info=AuthenticationInformation())
+            resp.attributes = dict(self.ATTRIBUTES)
+            service.process(None, resp)
+
+            text = Metrics.exporter.render()
+        finally:
+            Metrics.disable()
+
+        assert 'perun_identity_process_seconds_count{result="found"} 1' in text
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_deadline(self, mock_adapter):
+        deadlines = []
+
+        def get_perun_user(idp_entity_id, uids, identifiers=None):
+            deadlines.append(Deadline.current())
+            raise DeadlineExceeded('time budget is spent')
+
+        mock_adapter.get_perun_user.side_effect = get_perun_user
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            deadline=0.5,
+            metrics=dict(exporter='prometheus')
+        )
+        try:
+            service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+            service.next = lambda ctx, data: data
+            service.adapter = mock_adapter
+            resp = InternalData(auth_info=AuthenticationInformation())
+            resp.attributes = dict(self.ATTRIBUTES)
+            returned_service = service.process(None, resp)
+
+            text = Metrics.exporter.render()
+        finally:
+            Metrics.disable()
+
+        assert deadlines[0].seconds == 0.5
+        assert Deadline.current() is None
+        assert 'perun_id' not in returned_service.attributes.keys()
+        assert 'perun_deadline_exceeded_total 1' in text
+        assert 'perun_identity_process_seconds_count{result="deadline"} 1' in text
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_adaptive_identifier_order(self, mock_adapter, tmp_path):
+        def get_perun_user(idp_entity_id, uids, identifiers=None):
+            return User(1, 'Test user') if 'principalname@example.com' in uids else None
+
+        mock_adapter.get_perun_user.side_effect = get_perun_user
+        path = os.getcwd()
+        config = dict(
+            interface='ldap',
+            perun_config_file_name=path + TestPerunAdapter.TEST_CONF_FILE_NAME,
+            uids_identifiers=['edupersonuniqueid', 'edupersonprincipalname'],
+            identifier_order=dict(adaptive=True, stats_path=str(tmp_path / 'stats.json'))
+        )
+        service = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+        service.next = lambda ctx, data: data
+        service.adapter = mock_adapter
+
+        for _ in range(2):
+            resp = InternalData(auth_info=AuthenticationInformation(issuer='https://idp.example.com'))
+            resp.attributes = dict(self.ATTRIBUTES)
+            assert service.process(None, resp).attributes['perun_id'] == [1]
+
+        assert mock_adapter.get_perun_user.call_args_list == [
+            mock.call('https://idp.example.com', ['uniqueid@example.com'], ['edupersonuniqueid']),
+            mock.call('https://idp.example.com', ['principalname@example.com'], ['edupersonprincipalname']),
+            # the identifier which found the user is looked up first
+            mock.call('https://idp.example.com', ['principalname@example.com'], ['edupersonprincipalname']),
+        ]
+
+        # the identifier finding the user in the second lookup is learned
+        assert service.identifier_stats.get('https://idp.example.com', 'edupersonprincipalname') == (2, 2)
+        service.close()
+        restarted = PerunIdentity(config=config, name='test_service', base_url='https://satosa.example.com')
+        identifiers = restarted.get_identifiers('https://idp.example.com')
+        assert identifiers == ['edupersonprincipalname', 'edupersonuniqueid']
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_adaptive_identifier_order_single_query(self, mock_adapter):
+        mock_adapter.get_perun_user.return_value = User(1, 'Test user')
+        mock_adapter.queries_per_uid = False
+        service = self.create_perun_identity_service()
+        service.identifier_stats = IdentifierStats()
+        service.adapter = mock_adapter
+        resp = InternalData(auth_info=AuthenticationInformation(issuer='https://idp.example.com'))
+        resp.attributes = dict(self.ATTRIBUTES)
+        service.process(None, resp)
+
+        # all uids are searched by one query
+        mock_adapter.get_perun_user.assert_called_once_with(
+            'https://idp.example.com', ['uniqueid@example.com', 'principalname@example.com'],
+            ['edupersonuniqueid', 'edupersonprincipalname']
+        )
+
+    @mock.patch('perun.micro_services.adapters.RpcAdapter')
+    def test_issuer_identifiers(self, mock_adapter):
+        mock_adapter.get_perun_user.return_value = User(1, 'Test user')
+        service = self.create_perun_identity_service()
+        service.issuer_identifiers = {'https://idp.example.com': ['edupersonprincipalname']}
+        service.adapter = mock_adapter
+        resp = InternalData(auth_info=AuthenticationInformation(issuer='https://idp.example.com'))
+        resp.attributes = dict(self.ATTRIBUTES)
+        service.process(None, resp)
+
+        mock_adapter.get_perun_user.assert_called_once_with('https://idp.example.com', ['principalname@example.com'],
+                                                            ['edupersonprincipalname'])